@@ -1,12 +1,25 @@
 # api.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from database import db
-from models import Adherent, Livre, Emprunt
+from models import Adherent, Livre, Emprunt, Penalite, Referentiel, Reservation, Statistiques
 from services.emprunt_service import EmpruntService
+from services.reservation_service import ReservationService
 from datetime import datetime
+from config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, QUOTA_ETUDIANT, QUOTA_ENSEIGNANT
+
+class BiblioJSONProvider(DefaultJSONProvider):
+    """Sérialise aussi les instances de modèles (Livre, Adherent, Emprunt)"""
+
+    @staticmethod
+    def default(o):
+        if hasattr(o, 'to_dict'):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = BiblioJSONProvider(app)
 
 # Configuration CORS pour React
 CORS(app, resources={
@@ -21,6 +34,60 @@ CORS(app, resources={
 def initialize():
     if not db.connect():
         print("❌ Erreur de connexion à la base de données")
+        return
+    # Données en mémoire : catégories, bibliothécaires, index des adhérents,
+    # files d'attente des réservations
+    Referentiel.charger()
+    Adherent.charger_index()
+    Reservation.charger_index()
+    # Recomptage des retards et recalcul des statistiques, hors des requêtes
+    Statistiques.demarrer_recalcul()
+
+# Une connexion du pool par requête HTTP
+@app.before_request
+def ouvrir_connexion():
+    if db.pool:
+        db.acquire()
+
+@app.teardown_request
+def liberer_connexion(exception=None):
+    db.release()
+
+# Réponse JSON en flux pour les listes volumineuses
+def json_stream(rows, chunk_size=500):
+    """Sérialiser un itérable de lignes en tableau JSON, par paquets"""
+    def generate():
+        yield '['
+        chunk = []
+        first = True
+        for row in rows:
+            chunk.append(app.json.dumps(row))
+            if len(chunk) >= chunk_size:
+                yield ('' if first else ',') + ','.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield ('' if first else ',') + ','.join(chunk)
+        yield ']'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+# Pagination par curseur : ?limit=50&after=<jeton>
+def page_args():
+    """(limit, after) si la pagination est demandée, sinon None (liste complète)"""
+    if 'limit' not in request.args and 'after' not in request.args:
+        return None
+    limit = request.args.get('limit', PAGE_SIZE_DEFAULT, type=int)
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    return limit, request.args.get('after') or None
+
+def paged(fetch_page, *args, **kwargs):
+    """Réponse paginée : {'items': [...], 'next': jeton ou null}"""
+    limit, after = page_args()
+    try:
+        items, next_after = fetch_page(*args, limit=limit, after=after, **kwargs)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': items, 'next': next_after}), 200
 
 # Gestion des erreurs
 @app.errorhandler(404)
@@ -72,18 +139,10 @@ def login():
 
 @app.route('/api/adherents', methods=['GET'])
 def get_adherents():
-    """Récupérer tous les adhérents"""
-    adherents = Adherent.get_all()
-    
-    # Ajouter le quota pour chaque adhérent
-    for adh in adherents:
-        emprunts_en_cours = Adherent.get_emprunts_en_cours(adh['idAdherent'])
-        quota_max = 5 if adh['typeAdherent'] == 'ENSEIGNANT' else 3
-        adh['empruntsEnCours'] = emprunts_en_cours
-        adh['quotaMax'] = quota_max
-        adh['quotaDisponible'] = quota_max - emprunts_en_cours
-    
-    return jsonify(adherents), 200
+    """Récupérer tous les adhérents (avec leur quota)"""
+    if page_args():
+        return paged(Adherent.get_page_with_quota)
+    return json_stream(Adherent.get_all_with_quota()), 200
 
 @app.route('/api/adherents/search', methods=['GET'])
 def search_adherents():
@@ -93,33 +152,20 @@ def search_adherents():
     if not keyword:
         return jsonify([]), 200
     
-    results = Adherent.search(keyword)
-    
-    # Ajouter le quota
-    for adh in results:
-        emprunts_en_cours = Adherent.get_emprunts_en_cours(adh['idAdherent'])
-        quota_max = 5 if adh['typeAdherent'] == 'ENSEIGNANT' else 3
-        adh['empruntsEnCours'] = emprunts_en_cours
-        adh['quotaMax'] = quota_max
-        adh['quotaDisponible'] = quota_max - emprunts_en_cours
+    if page_args():
+        return paged(Adherent.search_page_with_quota, keyword)
     
+    results = Adherent.search_with_quota(keyword)
     return jsonify(results), 200
 
 @app.route('/api/adherents/<int:id>', methods=['GET'])
 def get_adherent(id):
     """Récupérer un adhérent par ID"""
-    adherent = Adherent.get_by_id(id)
+    adherent = Adherent.get_with_quota(id)
     
     if not adherent:
         return jsonify({'error': 'Adhérent non trouvé'}), 404
     
-    # Ajouter infos supplémentaires
-    emprunts_en_cours = Adherent.get_emprunts_en_cours(id)
-    quota_max = 5 if adherent['typeAdherent'] == 'ENSEIGNANT' else 3
-    adherent['empruntsEnCours'] = emprunts_en_cours
-    adherent['quotaMax'] = quota_max
-    adherent['quotaDisponible'] = quota_max - emprunts_en_cours
-    
     return jsonify(adherent), 200
 
 @app.route('/api/adherents', methods=['POST'])
@@ -193,12 +239,16 @@ def delete_adherent(id):
 @app.route('/api/livres', methods=['GET'])
 def get_livres():
     """Récupérer tous les livres"""
+    if page_args():
+        return paged(Livre.get_page)
     livres = Livre.get_all()
-    return jsonify(livres), 200
+    return json_stream(livres), 200
 
 @app.route('/api/livres/disponibles', methods=['GET'])
 def get_livres_disponibles():
     """Récupérer les livres disponibles"""
+    if page_args():
+        return paged(Livre.get_disponibles_page)
     livres = Livre.get_disponibles()
     return jsonify(livres), 200
 
@@ -210,6 +260,9 @@ def search_livres():
     if not keyword:
         return jsonify([]), 200
     
+    if page_args():
+        return paged(Livre.search_page, keyword)
+    
     results = Livre.search(keyword)
     return jsonify(results), 200
 
@@ -304,25 +357,34 @@ def delete_livre(id):
 @app.route('/api/emprunts', methods=['GET'])
 def get_emprunts():
     """Récupérer tous les emprunts"""
+    if page_args():
+        return paged(Emprunt.get_page)
     emprunts = Emprunt.get_all()
-    return jsonify(emprunts), 200
+    return json_stream(emprunts), 200
 
 @app.route('/api/emprunts/en-cours', methods=['GET'])
 def get_emprunts_en_cours():
     """Récupérer les emprunts en cours"""
+    if page_args():
+        return paged(Emprunt.get_en_cours_page)
     emprunts = Emprunt.get_en_cours()
     return jsonify(emprunts), 200
 
 @app.route('/api/emprunts/retards', methods=['GET'])
 def get_emprunts_retards():
     """Récupérer les emprunts en retard"""
+    if page_args():
+        return paged(Emprunt.get_en_retard_page)
     retards = Emprunt.get_en_retard()
     return jsonify(retards), 200
 
 @app.route('/api/emprunts/adherent/<int:id>', methods=['GET'])
 def get_emprunts_adherent(id):
-    """Récupérer les emprunts d'un adhérent"""
-    emprunts = Emprunt.get_by_adherent(id)
+    """Récupérer les emprunts d'un adhérent (?archives=1 : historique archivé compris)"""
+    archives = request.args.get('archives', '').lower() in ('1', 'true', 'oui')
+    if page_args():
+        return paged(Emprunt.get_by_adherent_page, id, archives=archives)
+    emprunts = Emprunt.get_by_adherent(id, archives)
     return jsonify(emprunts), 200
 
 @app.route('/api/emprunts', methods=['POST'])
@@ -350,6 +412,44 @@ def create_emprunt():
     
     return jsonify({'error': message}), 400
 
+@app.route('/api/emprunts/batch', methods=['POST'])
+def create_emprunts_batch():
+    """
+    Emprunter plusieurs livres pour un adhérent (panier)
+    Corps : {idLivres: [...], idAdherent, idBibliothecaire, partiel: false}
+    partiel=true : enregistrer les livres empruntables même si d'autres sont refusés
+    """
+    data = request.json
+    
+    # Validation
+    required = ['idLivres', 'idAdherent', 'idBibliothecaire']
+    if not all(field in data for field in required):
+        return jsonify({'error': 'Champs requis manquants'}), 400
+    
+    ids_livres = data['idLivres']
+    if not isinstance(ids_livres, list) or not ids_livres \
+            or not all(isinstance(i, int) for i in ids_livres):
+        return jsonify({'error': 'idLivres : liste d\'identifiants de livres attendue'}), 400
+    panier_max = max(QUOTA_ETUDIANT, QUOTA_ENSEIGNANT)
+    if len(ids_livres) > panier_max:
+        return jsonify({'error': f'Panier limité à {panier_max} livres'}), 400
+    
+    success, message, resultats = EmpruntService.emprunter_livres(
+        ids_livres,
+        data['idAdherent'],
+        data['idBibliothecaire'],
+        partiel=bool(data.get('partiel', False))
+    )
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': message,
+            'resultats': resultats
+        }), 201
+    
+    return jsonify({'error': message, 'resultats': resultats}), 400
+
 @app.route('/api/emprunts/retour', methods=['POST'])
 def retourner_livre():
     """Retourner un livre"""
@@ -369,16 +469,119 @@ def retourner_livre():
     
     return jsonify({'error': message}), 400
 
+@app.route('/api/emprunts/retour/batch', methods=['POST'])
+def retourner_livres():
+    """
+    Retourner une série de livres (boîte de retour)
+    Corps : {isbns: [...]} en JSON, ou un ISBN par ligne (text/plain, lu en flux)
+    """
+    if request.is_json:
+        isbns = (request.json or {}).get('isbns')
+        if not isinstance(isbns, list):
+            return jsonify({'error': 'isbns : liste d\'ISBN attendue'}), 400
+    else:
+        isbns = (ligne.decode('utf-8', 'replace') for ligne in request.stream)
+    
+    resultats = EmpruntService.retourner_livres(isbns)
+    retournes = [r for r in resultats if r['success']]
+    
+    return jsonify({
+        'retournes': len(retournes),
+        'refuses': len(resultats) - len(retournes),
+        'penalites': float(sum(r['penalite'] for r in retournes)),
+        'resultats': resultats
+    }), 200
+
+# ============================================================
+# ROUTES RÉSERVATIONS
+# ============================================================
+
+@app.route('/api/reservations/livre/<int:id>', methods=['GET'])
+def get_reservations_livre(id):
+    """File d'attente d'un livre (exemplaires de côté puis réservations en attente)"""
+    reservations = Reservation.get_by_livre(id)
+    return jsonify(reservations), 200
+
+@app.route('/api/reservations/adherent/<int:id>', methods=['GET'])
+def get_reservations_adherent(id):
+    """Réservations en cours d'un adhérent"""
+    reservations = Reservation.get_by_adherent(id)
+    return jsonify(reservations), 200
+
+@app.route('/api/reservations/disponibles', methods=['GET'])
+def get_reservations_disponibles():
+    """Exemplaires mis de côté en attente de retrait"""
+    reservations = Reservation.get_disponibles()
+    return jsonify(reservations), 200
+
+@app.route('/api/reservations', methods=['POST'])
+def create_reservation():
+    """Réserver un livre dont aucun exemplaire n'est disponible"""
+    data = request.json
+    
+    # Validation
+    required = ['idLivre', 'idAdherent']
+    if not all(field in data for field in required):
+        return jsonify({'error': 'Champs requis manquants'}), 400
+    try:
+        idLivre, idAdherent = int(data['idLivre']), int(data['idAdherent'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'idLivre et idAdherent : identifiants numériques attendus'}), 400
+    
+    success, message, reservation_id = ReservationService.reserver(
+        idLivre,
+        idAdherent
+    )
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': message,
+            'id': reservation_id
+        }), 201
+    
+    return jsonify({'error': message}), 400
+
+@app.route('/api/reservations/<int:id>/annuler', methods=['PUT'])
+def annuler_reservation(id):
+    """Annuler une réservation (l'exemplaire de côté passe au suivant)"""
+    success, message = ReservationService.annuler(id)
+    
+    if success:
+        return jsonify({'success': True, 'message': message}), 200
+    
+    return jsonify({'error': message}), 400
+
+@app.route('/api/reservations/<int:id>/honorer', methods=['POST'])
+def honorer_reservation(id):
+    """Emprunter l'exemplaire mis de côté pour une réservation"""
+    data = request.json
+    
+    if 'idBibliothecaire' not in data:
+        return jsonify({'error': 'Champs requis manquants'}), 400
+    
+    success, message, emprunt_id = EmpruntService.emprunter_reservation(
+        id,
+        data['idBibliothecaire']
+    )
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': message,
+            'id': emprunt_id
+        }), 201
+    
+    return jsonify({'error': message}), 400
+
 # ============================================================
 # ROUTES CATÉGORIES
 # ============================================================
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
-    """Récupérer toutes les catégories"""
-    query = "SELECT * FROM Categorie ORDER BY nomCategorie"
-    categories = db.fetch_all(query)
-    return jsonify(categories), 200
+    """Récupérer toutes les catégories (référentiel en mémoire)"""
+    return jsonify(Referentiel.get_categories()), 200
 
 # ============================================================
 # ROUTES PÉNALITÉS
@@ -387,49 +590,35 @@ def get_categories():
 @app.route('/api/penalites', methods=['GET'])
 def get_penalites():
     """Récupérer toutes les pénalités"""
-    query = """
-        SELECT 
-            p.*,
-            CONCAT(a.nom, ' ', a.prenom) as adherent,
-            l.titre as livre
-        FROM Penalite p
-        JOIN Emprunt e ON p.idEmprunt = e.idEmprunt
-        JOIN Adherent a ON e.idAdherent = a.idAdherent
-        JOIN Livre l ON e.idLivre = l.idLivre
-        ORDER BY p.dateCreation DESC
-    """
-    penalites = db.fetch_all(query)
+    if page_args():
+        return paged(Penalite.get_page)
+    
+    penalites = Penalite.get_all()
     return jsonify(penalites), 200
 
 @app.route('/api/penalites/impayees', methods=['GET'])
 def get_penalites_impayees():
     """Récupérer les pénalités impayées"""
-    query = """
-        SELECT 
-            p.*,
-            CONCAT(a.nom, ' ', a.prenom) as adherent,
-            l.titre as livre
-        FROM Penalite p
-        JOIN Emprunt e ON p.idEmprunt = e.idEmprunt
-        JOIN Adherent a ON e.idAdherent = a.idAdherent
-        JOIN Livre l ON e.idLivre = l.idLivre
-        WHERE p.statut = 'IMPAYEE'
-        ORDER BY p.dateCreation DESC
-    """
-    penalites = db.fetch_all(query)
+    if page_args():
+        return paged(Penalite.get_impayees_page)
+    
+    penalites = Penalite.get_impayees()
     return jsonify(penalites), 200
 
 @app.route('/api/penalites/<int:id>/payer', methods=['PUT'])
 def payer_penalite(id):
     """Marquer une pénalité comme payée"""
-    query = "UPDATE Penalite SET statut = 'PAYEE' WHERE idPenalite = %s"
-    
-    if db.execute_query(query, (id,)):
+    if Penalite.payer(id):
         return jsonify({
             'success': True,
             'message': 'Pénalité marquée comme payée'
         }), 200
     
+    penalite = Penalite.get_by_id(id)
+    if not penalite:
+        return jsonify({'error': 'Pénalité non trouvée'}), 404
+    if penalite['statut'] == 'PAYEE':
+        return jsonify({'error': 'Pénalité déjà payée'}), 409
     return jsonify({'error': 'Erreur lors du paiement'}), 400
 
 # ============================================================
@@ -438,25 +627,40 @@ def payer_penalite(id):
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Récupérer les statistiques globales"""
-    stats = Emprunt.get_statistiques()
-    
-    # Stats supplémentaires
-    retards = db.fetch_one("SELECT COUNT(*) as count FROM Emprunt WHERE statut = 'EN_COURS' AND dateRetourPrevue < NOW()")
-    livres_dispo = db.fetch_one("SELECT SUM(nombreDisponibles) as count FROM Livre")
-    adherents_actifs = db.fetch_one("SELECT COUNT(*) as count FROM Adherent WHERE statut = 'ACTIF'")
-    penalites_impayees = db.fetch_one("SELECT COALESCE(SUM(montant), 0) as total FROM Penalite WHERE statut = 'IMPAYEE'")
+    """Récupérer les statistiques globales (compteurs tenus à jour à chaque écriture)"""
+    stats = Statistiques.get()
     
     return jsonify({
-        'empruntsTotal': stats['total'],
-        'empruntsEnCours': stats['en_cours'],
-        'empruntsEnRetard': retards['count'],
-        'empruntsRetournes': stats['retournes'],
-        'livresDisponibles': livres_dispo['count'],
-        'adherentsActifs': adherents_actifs['count'],
-        'penalitesImpayees': float(penalites_impayees['total'])
+        'empruntsTotal': stats['empruntsTotal'],
+        'empruntsEnCours': stats['empruntsEnCours'],
+        'empruntsEnRetard': stats['empruntsEnRetard'],
+        'empruntsRetournes': stats['empruntsRetournes'],
+        'livresDisponibles': stats['livresDisponibles'],
+        'adherentsActifs': stats['adherentsActifs'],
+        'penalitesImpayees': stats['penalitesImpayees']
     }), 200
 
+# ============================================================
+# ROUTES MÉTRIQUES
+# ============================================================
+
+@app.route('/api/metrics/queries', methods=['GET'])
+def get_query_metrics():
+    """Latences et volumes par requête SQL, état du pool et du cache de requêtes"""
+    metrics = db.metrics.snapshot()
+    metrics['pool'] = db.pool_status()
+    metrics['replicas'] = db.replica_status()
+    metrics['cacheRequetesPreparees'] = db.statement_cache_stats()
+    metrics['cacheLivres'] = Livre.cache_stats()
+    return jsonify(metrics), 200
+
+@app.route('/api/metrics/queries', methods=['DELETE'])
+def reset_query_metrics():
+    """Remettre les compteurs de requêtes à zéro"""
+    db.metrics.reset()
+    Livre.cache_stats(reset=True)
+    return jsonify({'success': True}), 200
+
 # ============================================================
 # ROUTE DE TEST
 # ============================================================
@@ -1,6 +1,12 @@
 # config.py
 # Configuration de l'application
 
+# Moteur de base de données :
+# - 'mysql'  : serveur MySQL (DB_CONFIG)
+# - 'sqlite' : fichier local sans serveur (bornes, petites annexes, tests)
+DB_BACKEND = 'mysql'
+SQLITE_PATH = 'biblio_simple.db'
+
 # Configuration de la base de données
 DB_CONFIG = {
     'host': 'localhost',
@@ -10,6 +16,72 @@ DB_CONFIG = {
     'port': 3306
 }
 
+# Pool de connexions (partagé par les threads de l'API)
+DB_POOL_SIZE = 5  # connexions gardées ouvertes
+DB_POOL_MAX_OVERFLOW = 10  # connexions supplémentaires autorisées en pic
+DB_POOL_TIMEOUT = 30  # secondes d'attente max d'une connexion libre
+DB_POOL_PRE_PING = True  # vérifier une connexion inactive avant de la prêter
+
+# Réplicas MySQL en lecture (vide = tout sur le primaire)
+# Chaque entrée complète DB_CONFIG, ex. {'host': 'localhost', 'port': 3307}
+DB_REPLICAS = []
+DB_REPLICA_MAX_LAG = 5  # secondes de retard tolérées avant d'écarter un réplica
+DB_REPLICA_CHECK_INTERVAL = 2  # secondes entre deux mesures du retard
+DB_READ_YOUR_WRITES = True  # après une écriture, relire sur le primaire jusqu'à la fin de la requête
+
+# Lecture en flux (fetch_iter) : nombre de lignes demandées par lot
+DB_FETCH_BATCH_SIZE = 500
+
+# Requêtes préparées côté serveur gardées par connexion (0 = désactivé)
+DB_STATEMENT_CACHE_SIZE = 100
+
+# Instrumentation des requêtes (latences, lignes, requêtes lentes)
+DB_METRICS_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = 200  # au-delà, la requête est journalisée
+SLOW_QUERY_LOG = 'slow_queries.log'  # None = pas de fichier
+
+# Recherche catalogue (Livre.search)
+# En MySQL, recherche plein texte classée par pertinence sur titre/auteur
+# (index FULLTEXT : database/migrations/001_livre_fulltext.sql) ;
+# False = ancienne recherche LIKE '%mot%'. SQLite utilise toujours LIKE.
+LIVRE_SEARCH_FULLTEXT = True
+LIVRE_SEARCH_LIMIT = 100  # résultats max d'une recherche non paginée
+
+# Cache mémoire des livres lus par id / ISBN (Livre.get_by_id, get_by_isbn)
+LIVRE_CACHE_SIZE = 2000  # livres gardés (0 = désactivé)
+LIVRE_CACHE_TTL = 60  # secondes : borne la durée d'une donnée modifiée par un autre processus
+
+# Référentiel en mémoire (catégories, bibliothécaires)
+REFERENTIEL_REFRESH = 600  # secondes avant relecture des deux tables
+
+# Recherche des adhérents (Adherent.search) : index trigrammes en mémoire
+ADHERENT_SEARCH_LIMIT = 50  # résultats max, les plus proches d'abord
+ADHERENT_INDEX_REFRESH = 300  # secondes avant rechargement complet de l'index
+
+# Statistiques du tableau de bord (table Statistique, cf. models/statistiques.py)
+STATS_CACHE_TTL = 2  # secondes pendant lesquelles un processus réutilise sa lecture
+STATS_RETARDS_INTERVAL = 60  # secondes entre deux recomptages des retards
+STATS_RECOMPUTE_INTERVAL = 3600  # secondes entre deux recalculs complets (dérive)
+
+# Import en masse du catalogue (services/catalogue_service.py)
+CATALOGUE_IMPORT_BATCH = 1000  # notices écrites par transaction
+
+# Synchronisation des adhérents avec l'export de la scolarité
+# (services/synchronisation_service.py)
+SYNCHRO_ADHERENTS_BATCH = 1000  # adhérents écrits par transaction
+
+# Archivage des emprunts rendus (services/archivage_service.py)
+ARCHIVAGE_AGE_JOURS = 365  # emprunts rendus depuis plus longtemps : archivés
+ARCHIVAGE_BATCH = 500  # emprunts déplacés par transaction (verrous courts)
+ARCHIVAGE_PAUSE = 0.05  # secondes entre deux lots, pour laisser passer le guichet
+
+# Retours en lot (boîte de retour scannée, EmpruntService.retourner_livres)
+RETOUR_BATCH = 200  # ISBN traités par transaction
+
+# Réservations (services/reservation_service.py)
+RESERVATION_DELAI_RETRAIT = 3  # jours pendant lesquels l'exemplaire rendu reste de côté
+RESERVATION_INDEX_REFRESH = 300  # secondes avant rechargement des files d'attente en mémoire
+
 # Règles métier
 QUOTA_ETUDIANT = 3
 QUOTA_ENSEIGNANT = 5
@@ -19,6 +91,10 @@ DUREE_EMPRUNT_ENSEIGNANT = 30  # jours
 
 PENALITE_PAR_JOUR = 50  # FCFA
 
+# Pagination des listes de l'API (?limit=...&after=...)
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 500
+
 # Configuration de l'interface
 APP_TITLE = "Système de Gestion de Bibliothèque"
 APP_WIDTH = 1000
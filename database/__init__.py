@@ -1,4 +1,6 @@
 # database/__init__.py
-from .connection import db, DatabaseConnection
+from .connection import db, DatabaseConnection, Transaction
+from .pagination import keyset_page
+from .cache import LRUCache
 
-__all__ = ['db', 'DatabaseConnection']
+__all__ = ['db', 'DatabaseConnection', 'Transaction', 'keyset_page', 'LRUCache']
@@ -0,0 +1,319 @@
+# database/backends.py
+"""
+Moteurs de base de données utilisables par DatabaseConnection
+- mysql  : serveur MySQL (mysql-connector-python)
+- sqlite : fichier local, sans serveur (bornes, petites annexes, tests)
+Le moteur est choisi par DB_BACKEND dans config.py.
+"""
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from config import DB_BACKEND, DB_CONFIG, SQLITE_PATH, DB_STATEMENT_CACHE_SIZE
+
+SCHEMA_SQLITE = os.path.join(os.path.dirname(__file__), 'schema_sqlite.sql')
+
+
+class MySQLBackend:
+    """Serveur MySQL"""
+
+    name = 'mysql'
+    label = 'MySQL'
+    supports_prepared = True
+    supports_fulltext = True
+
+    def connect(self, **overrides):
+        import mysql.connector
+        return mysql.connector.connect(**{**DB_CONFIG, **overrides})
+
+    def ping(self, raw):
+        return raw.is_connected()
+
+    def replica_lag(self, raw):
+        """
+        Retard de réplication en secondes (None si la réplication est arrêtée)
+        Un serveur qui n'est pas configuré en réplica est considéré à jour.
+        """
+        cursor = raw.cursor(dictionary=True, buffered=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Exception:
+                # MySQL < 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if not row:
+            return 0
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        return int(lag) if lag is not None else None
+
+    def explain(self, raw, query, params):
+        """
+        Plan d'exécution : une entrée par table lue (cf. DatabaseConnection.explain)
+        Tout accès ALL est un parcours complet, même si un index était
+        utilisable (possible_keys) : l'optimiseur qui l'écarte est justement
+        la régression à détecter. Sur de petites tables, c'est aux tests de
+        peupler la base (cf. tests/test_plans_requetes.py).
+        """
+        cursor = raw.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute("EXPLAIN " + query, params or ())
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        plan = []
+        for row in rows:
+            if not row.get('table'):
+                continue
+            plan.append({
+                'table': row['table'],
+                'acces': row['type'],
+                'index': row['key'],
+                'parcoursComplet': row['type'] == 'ALL',
+                'detail': row.get('Extra') or '',
+            })
+        return plan
+
+
+# ------------------------------------------------------------
+# SQLite
+# ------------------------------------------------------------
+
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_RE_PLAN = re.compile(
+    r"^(SCAN|SEARCH) (\S+)(?: USING (?:COVERING )?INDEX (\w+)| USING (INTEGER PRIMARY KEY))?"
+)
+_RE_INTERVAL = re.compile(
+    r"INTERVAL\s+(%s|\?|[\w.]+)\s+(DAY|HOUR|MINUTE|SECOND)\b", re.IGNORECASE
+)
+_RE_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE(\s+OF\s+\w+)?\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def translate_mysql(query):
+    """
+    Adapter une requête écrite pour MySQL au dialecte SQLite
+    CONCAT, NOW, DATEDIFF et DATE_ADD sont fournis comme fonctions SQLite ;
+    il reste à réécrire `INTERVAL n DAY` et les paramètres %s. `FOR UPDATE
+    [OF t]` est retiré : une transaction SQLite verrouille déjà toute la base en
+    écriture dès son BEGIN IMMEDIATE.
+    """
+    query = _RE_INTERVAL.sub(r"\1, '\2'", query)
+    query = _RE_FOR_UPDATE.sub('', query)
+    return query.replace('%s', '?')
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value)
+    for fmt in (_DATETIME_FORMAT, '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _sql_now():
+    return datetime.now().strftime(_DATETIME_FORMAT)
+
+
+def _sql_concat(*args):
+    if any(arg is None for arg in args):
+        return None
+    return ''.join(str(arg) for arg in args)
+
+
+def _sql_datediff(a, b):
+    a, b = _to_datetime(a), _to_datetime(b)
+    if a is None or b is None:
+        return None
+    return (a.date() - b.date()).days
+
+
+def _sql_date_add(value, amount, unit='DAY'):
+    value = _to_datetime(value)
+    if value is None or amount is None:
+        return None
+    unit = unit.upper()
+    delta = {
+        'DAY': timedelta(days=int(amount)),
+        'HOUR': timedelta(hours=int(amount)),
+        'MINUTE': timedelta(minutes=int(amount)),
+        'SECOND': timedelta(seconds=int(amount)),
+    }[unit]
+    return (value + delta).strftime(_DATETIME_FORMAT)
+
+
+sqlite3.register_adapter(datetime, lambda d: d.strftime(_DATETIME_FORMAT))
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DATETIME', lambda b: _to_datetime(b.decode()))
+sqlite3.register_converter('DECIMAL', lambda b: Decimal(b.decode()))
+
+
+class SQLiteCursor:
+    """Curseur SQLite exposant l'interface utilisée de mysql.connector"""
+
+    def __init__(self, conn, dictionary=False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate_mysql(query), params or ())
+
+    def executemany(self, query, params_list):
+        self._cursor.executemany(translate_mysql(query), params_list)
+
+    def _convert(self, rows):
+        if not self._dictionary or not rows:
+            return rows
+        names = [col[0] for col in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._convert([row])[0] if row is not None else None
+
+    def fetchall(self):
+        return self._convert(self._cursor.fetchall())
+
+    def fetchmany(self, size):
+        return self._convert(self._cursor.fetchmany(size))
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connexion SQLite exposant l'interface utilisée de mysql.connector"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(
+            path,
+            check_same_thread=False,  # le pool passe la connexion d'un thread à l'autre
+            isolation_level=None,  # transactions pilotées par start_transaction()
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=max(DB_STATEMENT_CACHE_SIZE, 128),
+            timeout=30
+        )
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+
+        self._conn.create_function('NOW', 0, _sql_now)
+        self._conn.create_function('CONCAT', -1, _sql_concat, deterministic=True)
+        self._conn.create_function('DATEDIFF', 2, _sql_datediff, deterministic=True)
+        self._conn.create_function('DATE_ADD', 3, _sql_date_add, deterministic=True)
+        self._conn.create_function('DATABASE', 0, lambda: os.path.basename(path))
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def start_transaction(self):
+        # db.transaction() regroupe des écritures : le verrou d'écriture est
+        # pris dès le BEGIN (attendu jusqu'à `timeout`), sinon une transaction
+        # qui commence par lire échoue aussitôt (« database is locked ») si une
+        # autre écrit déjà
+        self._conn.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def cursor(self, dictionary=False, buffered=False, prepared=False):
+        return SQLiteCursor(self._conn, dictionary=dictionary)
+
+    def is_connected(self):
+        try:
+            self._conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteBackend:
+    """Fichier SQLite local (même schéma et mêmes requêtes que MySQL)"""
+
+    name = 'sqlite'
+    label = 'SQLite'
+    # sqlite3 garde déjà ses propres requêtes préparées par connexion
+    supports_prepared = False
+    # pas d'index FULLTEXT : la recherche reste en LIKE
+    supports_fulltext = False
+
+    def __init__(self, path):
+        self.path = path
+        self._schema_ready = False
+
+    def connect(self, **overrides):
+        raw = SQLiteConnection(overrides.get('path', self.path))
+        if not self._schema_ready:
+            with open(SCHEMA_SQLITE, encoding='utf-8') as f:
+                raw._conn.executescript(f.read())
+            self._schema_ready = True
+        return raw
+
+    def ping(self, raw):
+        return raw.is_connected()
+
+    def explain(self, raw, query, params):
+        """
+        Plan d'exécution (EXPLAIN QUERY PLAN), au format de MySQLBackend.explain
+        Un parcours complet est un « SCAN table » sans index : sans
+        statistiques (ANALYZE), SQLite suppose les tables volumineuses et
+        utilise tout index disponible.
+        """
+        cursor = raw._conn.execute("EXPLAIN QUERY PLAN " + translate_mysql(query),
+                                   params or ())
+        plan = []
+        for _, _, _, detail in cursor.fetchall():
+            match = _RE_PLAN.match(detail)
+            if not match or match.group(2).startswith('('):
+                continue
+            acces, table, index, rowid = match.groups()
+            if table == 'CONSTANT':
+                continue
+            plan.append({
+                'table': table,
+                'acces': acces,
+                'index': index or ('PRIMARY' if rowid else None),
+                # Index AUTOMATIC : construit à la volée en lisant toute la table
+                'parcoursComplet': (acces == 'SCAN' and not index and not rowid)
+                                   or 'AUTOMATIC' in detail,
+                'detail': detail,
+            })
+        return plan
+
+
+if DB_BACKEND == 'sqlite':
+    Error = sqlite3.Error
+    backend = SQLiteBackend(SQLITE_PATH)
+else:
+    from mysql.connector import Error
+    backend = MySQLBackend()
@@ -0,0 +1,135 @@
+# database/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache mémoire borné (LRU) avec durée de vie (TTL), thread-safe
+    Chaque entrée peut porter une étiquette (ex. l'id du livre) : toutes les
+    clés d'une même étiquette sont invalidées ensemble par invalidate_tag(),
+    ce qui couvre un même objet mis en cache sous plusieurs clés (id, ISBN).
+    Une valeur lue en base puis rangée par put() peut dater d'avant une
+    invalidation survenue pendant la lecture : generation(), noté avant la
+    lecture et passé à put(), fait écarter une telle valeur.
+    """
+
+    def __init__(self, maxsize=1000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # clé -> (valeur, expiration, étiquette)
+        self._tags = {}  # étiquette -> clés
+        # Numéro de la dernière invalidation de chaque étiquette (les plus
+        # anciennes sont oubliées : au-delà, _oubli sert de borne)
+        self._sequence = 0
+        self._invalidees = OrderedDict()
+        self._oubli = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    _MISSING = object()
+
+    def get(self, key, default=None):
+        """Valeur en cache, ou `default` (absente ou expirée)"""
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is self._MISSING:
+                self.misses += 1
+                return default
+            value, expires, _ = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self):
+        """Numéro de la dernière invalidation, à noter avant de lire la valeur à ranger"""
+        with self._lock:
+            return self._sequence
+
+    def put(self, key, value, tag=None, generation=None):
+        """
+        Ranger une valeur ; avec `generation`, elle est écartée si son
+        étiquette a été invalidée depuis
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if (generation is not None and tag is not None
+                    and self._invalidees.get(tag, self._oubli) > generation):
+                return
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._remove(key):
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag):
+        """Retirer toutes les clés portant cette étiquette"""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                if self._remove(key):
+                    self.invalidations += 1
+            self._sequence += 1
+            self._invalidees.pop(tag, None)
+            self._invalidees[tag] = self._sequence
+            while len(self._invalidees) > max(self.maxsize, 1):
+                _, self._oubli = self._invalidees.popitem(last=False)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        tag = entry[2]
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._sequence += 1
+            self._invalidees.clear()
+            self._oubli = self._sequence
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+            self.evictions = self.expirations = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / total, 4) if total else 0.0,
+                'entrees': len(self._entries),
+                'capacite': self.maxsize,
+                'ttlSecondes': self.ttl,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -1,67 +1,569 @@
 # database/connection.py
-import mysql.connector
-from mysql.connector import Error
-from config import DB_CONFIG
+import threading
+import time
+from contextlib import contextmanager
+from config import (DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW,
+                    DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_FETCH_BATCH_SIZE,
+                    DB_STATEMENT_CACHE_SIZE, DB_METRICS_ENABLED,
+                    SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG, DB_REPLICAS,
+                    DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_INTERVAL,
+                    DB_READ_YOUR_WRITES)
+from .backends import backend, Error
+from .pool import ConnectionPool, PoolError
+from .metrics import QueryMetrics
+from .replicas import Replica, ReplicaSet
+
+class Transaction:
+    """État d'une transaction ouverte par db.transaction()"""
+
+    def __init__(self):
+        self.failed = False
+        self.committed = False
+        self.before_commit = []  # fonctions appelées dans la transaction, juste avant le COMMIT
+        self.after_commit = []  # fonctions appelées une fois la transaction validée
+
+    def rollback_only(self):
+        """Annuler la transaction à la sortie du bloc au lieu de la valider"""
+        self.failed = True
+
 
 class DatabaseConnection:
-    """Gestion de la connexion à la base de données MySQL"""
-    
+    """
+    Gestion des connexions à la base de données (MySQL ou SQLite, cf. DB_BACKEND)
+    Les connexions viennent d'un pool partagé : chaque thread emprunte la
+    sienne pour une requête isolée, ou pour toute une unité de travail
+    (requête HTTP, transaction) via acquire()/release() ou connection().
+    Si des réplicas sont configurés (DB_REPLICAS), les lectures hors
+    transaction y sont envoyées ; après une écriture, le reste de l'unité de
+    travail relit sur le primaire (DB_READ_YOUR_WRITES).
+    """
+
     def __init__(self):
-        self.connection = None
-        self.cursor = None
-    
+        self.pool = None
+        self.replicas = None
+        self._local = threading.local()
+        self._stmt_lock = threading.Lock()
+        self._stmt_hits = 0
+        self._stmt_misses = 0
+        self.metrics = QueryMetrics(
+            slow_threshold_ms=SLOW_QUERY_THRESHOLD_MS,
+            slow_log_path=SLOW_QUERY_LOG,
+            enabled=DB_METRICS_ENABLED
+        )
+
+    def _create_pool(self, **overrides):
+        return ConnectionPool(
+            lambda: backend.connect(**overrides),
+            size=DB_POOL_SIZE,
+            max_overflow=DB_POOL_MAX_OVERFLOW,
+            timeout=DB_POOL_TIMEOUT,
+            pre_ping=DB_POOL_PRE_PING,
+            ping=backend.ping
+        )
+
     def connect(self):
-        """Établir la connexion à MySQL"""
+        """Créer le pool et vérifier qu'une connexion s'ouvre"""
+        if self.pool:
+            return True
         try:
-            self.connection = mysql.connector.connect(**DB_CONFIG)
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(dictionary=True)
-                print("✓ Connexion à MySQL réussie")
-                return True
-        except Error as e:
+            pool = self._create_pool()
+            pool.checkin(pool.checkout())
+            self.pool = pool
+            self.metrics.open_slow_log()
+            print(f"✓ Connexion à {backend.label} réussie")
+        except (Error, PoolError) as e:
             print(f"✗ Erreur de connexion : {e}")
             return False
-    
+
+        if DB_REPLICAS and hasattr(backend, 'replica_lag'):
+            replicas = []
+            for i, overrides in enumerate(DB_REPLICAS, start=1):
+                name = overrides.get('host', f'replica{i}') + f":{overrides.get('port', '')}"
+                replicas.append(Replica(name.rstrip(':'), self._create_pool(**overrides)))
+            self.replicas = ReplicaSet(
+                replicas,
+                backend.replica_lag,
+                max_lag=DB_REPLICA_MAX_LAG,
+                check_interval=DB_REPLICA_CHECK_INTERVAL
+            )
+            print(f"✓ {len(replicas)} réplica(s) en lecture configuré(s)")
+        return True
+
     def disconnect(self):
-        """Fermer la connexion"""
-        if self.connection and self.connection.is_connected():
-            if self.cursor:
-                self.cursor.close()
-            self.connection.close()
-            print("✓ Connexion MySQL fermée")
-    
+        """Fermer toutes les connexions du pool"""
+        if self.replicas:
+            self.replicas.close()
+            self.replicas = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+            print(f"✓ Connexion {backend.label} fermée")
+
+    # ------------------------------------------------------------
+    # Emprunt / restitution des connexions
+    # ------------------------------------------------------------
+
+    def acquire(self):
+        """
+        Ouvrir une unité de travail pour le thread courant jusqu'au release()
+        La connexion au primaire n'est empruntée qu'à sa première utilisation,
+        puis gardée jusqu'à la fin de l'unité de travail.
+        """
+        if getattr(self._local, 'depth', 0) == 0:
+            if self.pool is None:
+                raise PoolError("Base de données non connectée")
+            self._local.conn = None
+            self._local.sticky = False
+            self._local.depth = 0
+        self._local.depth += 1
+
+    def release(self):
+        """Fermer l'unité de travail ouverte par acquire()"""
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            return
+        self._local.depth = depth - 1
+        if self._local.depth == 0:
+            pooled = self._local.conn
+            self._local.conn = None
+            self._local.sticky = False
+            if pooled is not None:
+                self._checkin(pooled)
+
+    @contextmanager
+    def connection(self):
+        """Unité de travail : toutes les requêtes du bloc utilisent la même connexion"""
+        self.acquire()
+        try:
+            if self._local.conn is None:
+                self._local.conn = self.pool.checkout()
+            yield self._local.conn
+        finally:
+            self.release()
+
+    def _use_replica(self):
+        """Réplica à utiliser pour une lecture, ou None pour le primaire"""
+        if self.replicas is None or getattr(self._local, 'tx', None) is not None:
+            return None
+        if getattr(self._local, 'sticky', False):
+            return None
+        return self.replicas.choose()
+
+    @contextmanager
+    def _read_connection(self, primary=False):
+        """Connexion pour une lecture : un réplica à jour si possible (sauf primary=True), sinon le primaire"""
+        replica = None if primary else self._use_replica()
+        if replica is not None:
+            try:
+                pooled = replica.pool.checkout()
+            except (Error, PoolError) as e:
+                replica.mark_down(e, DB_REPLICA_CHECK_INTERVAL)
+            else:
+                try:
+                    yield pooled
+                finally:
+                    self._checkin(pooled, replica.pool)
+                return
+
+        with self.connection() as pooled:
+            yield pooled
+
+    def _mark_write(self):
+        """Après une écriture, relire sur le primaire jusqu'à la fin de l'unité de travail"""
+        if DB_READ_YOUR_WRITES:
+            self._local.sticky = True
+
+    @contextmanager
+    def transaction(self):
+        """
+        Regrouper plusieurs écritures en un seul COMMIT
+        La transaction est annulée si le bloc lève une exception, si une
+        requête du bloc échoue ou si tx.rollback_only() est appelé ; tester
+        tx.committed après le bloc. Les blocs imbriqués rejoignent la
+        transaction englobante.
+        """
+        with self.connection() as pooled:
+            tx = getattr(self._local, 'tx', None)
+            if tx is not None:
+                try:
+                    yield tx
+                except BaseException:
+                    tx.failed = True
+                    raise
+                return
+
+            tx = Transaction()
+            if pooled.raw.in_transaction:
+                pooled.raw.rollback()
+            pooled.raw.start_transaction()
+            self._local.tx = tx
+            try:
+                yield tx
+                for callback in tx.before_commit:
+                    if tx.failed:
+                        break
+                    callback()
+            except BaseException:
+                tx.failed = True
+                raise
+            finally:
+                self._local.tx = None
+                try:
+                    if tx.failed:
+                        pooled.raw.rollback()
+                    else:
+                        pooled.raw.commit()
+                        tx.committed = True
+                except Error as e:
+                    print(f"✗ Erreur de validation de la transaction : {e}")
+                    pooled.raw.rollback()
+            if tx.committed:
+                for callback in tx.after_commit:
+                    callback()
+
+    def in_transaction(self):
+        """Le thread courant est-il dans un bloc db.transaction() ?"""
+        return getattr(self._local, 'tx', None) is not None
+
+    def current_transaction(self):
+        """Transaction ouverte par le thread courant (None hors transaction)"""
+        return getattr(self._local, 'tx', None)
+
+    def before_commit(self, callback):
+        """
+        Appeler `callback` à la fin du bloc db.transaction() en cours, avant le
+        COMMIT et seulement si la transaction doit être validée (tout de suite
+        hors transaction) ; une écriture en échec dans `callback` l'annule
+        """
+        tx = getattr(self._local, 'tx', None)
+        if tx is None:
+            callback()
+        else:
+            tx.before_commit.append(callback)
+
+    def after_commit(self, callback):
+        """
+        Appeler `callback` une fois les écritures visibles des autres connexions :
+        à la validation de la transaction en cours, ou tout de suite hors transaction
+        """
+        tx = getattr(self._local, 'tx', None)
+        if tx is None:
+            callback()
+        else:
+            tx.after_commit.append(callback)
+
+    def _checkin(self, pooled, pool=None):
+        """Rendre une connexion à son pool en terminant la transaction de lecture ouverte"""
+        pool = pool or self.pool
+        try:
+            if pooled.raw.in_transaction:
+                pooled.raw.rollback()
+        except Error:
+            pool.checkin(pooled, discard=True)
+            return
+        pool.checkin(pooled)
+
+    # ------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------
+
+    def _prepared_cursor(self, pooled, query, dictionary=True):
+        """
+        Curseur préparé pour `query` sur cette connexion (cache LRU)
+        Retourne (curseur, texte SQL à exécuter). Le connecteur ne réutilise la
+        requête préparée que si on lui repasse le même objet chaîne : on garde
+        donc celui vu au premier appel.
+        """
+        cache = pooled.statements
+        key = (query, dictionary)
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+            with self._stmt_lock:
+                self._stmt_hits += 1
+            return entry
+
+        with self._stmt_lock:
+            self._stmt_misses += 1
+        entry = (pooled.raw.cursor(prepared=True, dictionary=dictionary), query)
+        cache[key] = entry
+        if len(cache) > DB_STATEMENT_CACHE_SIZE:
+            _, (old_cursor, _) = cache.popitem(last=False)
+            self._close_cursor(old_cursor)
+        return entry
+
+    def _execute(self, pooled, query, params, dictionary=True):
+        """Exécuter `query` et retourner un curseur positionné sur le résultat"""
+        if DB_STATEMENT_CACHE_SIZE <= 0 or not backend.supports_prepared:
+            cursor = pooled.raw.cursor(dictionary=dictionary, buffered=True)
+            try:
+                cursor.execute(query, params or ())
+            except Error:
+                cursor.close()
+                raise
+            return cursor, False
+
+        cursor, sql = self._prepared_cursor(pooled, query, dictionary)
+        try:
+            cursor.execute(sql, params or ())
+        except Error:
+            # Requête invalide ou connexion perdue : on ne la garde pas en cache
+            pooled.statements.pop((query, dictionary), None)
+            self._close_cursor(cursor)
+            raise
+        return cursor, True
+
+    def _close_cursor(self, cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
     def execute_query(self, query, params=None):
         """Exécuter une requête INSERT, UPDATE, DELETE"""
+        tx = getattr(self._local, 'tx', None)
+        start = time.perf_counter()
+        rows = 0
+        error = True
         try:
-            self.cursor.execute(query, params or ())
-            self.connection.commit()
+            with self.connection() as pooled:
+                try:
+                    cursor, cached = self._execute(pooled, query, params)
+                except Error:
+                    if tx is None:
+                        pooled.raw.rollback()
+                    raise
+                try:
+                    if tx is None:
+                        pooled.raw.commit()
+                    self._local.last_insert_id = cursor.lastrowid
+                    self._local.row_count = rows = cursor.rowcount
+                    self._mark_write()
+                    error = False
+                    return True
+                finally:
+                    if not cached:
+                        cursor.close()
+        except (Error, PoolError) as e:
+            print(f"✗ Erreur d'exécution : {e}")
+            if tx is not None:
+                tx.rollback_only()
+            return False
+        finally:
+            self.metrics.record(query, params, time.perf_counter() - start, rows, error)
+
+    def execute_many(self, query, params_list):
+        """
+        Exécuter la même écriture pour une liste de paramètres
+        Les INSERT ... VALUES sont envoyés en une seule requête multi-lignes,
+        le tout validé par un seul COMMIT (ou par la transaction englobante).
+        """
+        params_list = list(params_list)
+        if not params_list:
+            self._local.row_count = 0
             return True
-        except Error as e:
+
+        tx = getattr(self._local, 'tx', None)
+        start = time.perf_counter()
+        rows = 0
+        error = True
+        try:
+            with self.connection() as pooled:
+                cursor = pooled.raw.cursor()
+                try:
+                    cursor.executemany(query, params_list)
+                    if tx is None:
+                        pooled.raw.commit()
+                    self._local.row_count = rows = cursor.rowcount
+                    self._mark_write()
+                    error = False
+                    return True
+                except Error:
+                    if tx is None:
+                        pooled.raw.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except (Error, PoolError) as e:
             print(f"✗ Erreur d'exécution : {e}")
-            self.connection.rollback()
+            if tx is not None:
+                tx.rollback_only()
             return False
-    
-    def fetch_one(self, query, params=None):
-        """Récupérer une seule ligne"""
+        finally:
+            self.metrics.record(query, None, time.perf_counter() - start, rows, error)
+
+    def fetch_one(self, query, params=None, primary=False):
+        """
+        Récupérer une seule ligne
+        primary=True : lire sur le primaire même hors transaction (ligne
+        destinée à un cache, qu'un réplica en retard rendrait périmée)
+        """
+        start = time.perf_counter()
+        rows = []
+        error = True
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchone()
-        except Error as e:
+            with self._read_connection(primary) as pooled:
+                cursor, cached = self._execute(pooled, query, params)
+                try:
+                    # Tout lire pour libérer la connexion (requêtes à une ligne)
+                    rows = cursor.fetchall()
+                    error = False
+                    return rows[0] if rows else None
+                finally:
+                    if not cached:
+                        cursor.close()
+        except (Error, PoolError) as e:
             print(f"✗ Erreur de lecture : {e}")
             return None
-    
-    def fetch_all(self, query, params=None):
-        """Récupérer toutes les lignes"""
+        finally:
+            self.metrics.record(query, params, time.perf_counter() - start, len(rows), error)
+
+    def fetch_all(self, query, params=None, as_tuples=False):
+        """Récupérer toutes les lignes (dictionnaires, ou tuples si as_tuples)"""
+        start = time.perf_counter()
+        rows = []
+        error = True
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchall()
-        except Error as e:
+            with self._read_connection() as pooled:
+                cursor, cached = self._execute(pooled, query, params, dictionary=not as_tuples)
+                try:
+                    rows = cursor.fetchall()
+                    error = False
+                    return rows
+                finally:
+                    if not cached:
+                        cursor.close()
+        except (Error, PoolError) as e:
             print(f"✗ Erreur de lecture : {e}")
             return []
-    
+        finally:
+            self.metrics.record(query, params, time.perf_counter() - start, len(rows), error)
+
+    def fetch_iter(self, query, params=None, batch_size=DB_FETCH_BATCH_SIZE,
+                   as_tuples=False):
+        """
+        Parcourir les lignes au fil de l'eau (générateur)
+        Le curseur n'est pas bufferisé : le serveur envoie les lignes par lots
+        de `batch_size`, la mémoire reste constante quelle que soit la table.
+        Une connexion dédiée est empruntée le temps du parcours.
+        Dans un bloc db.transaction(), la lecture passe par la connexion de
+        la transaction (elle voit ses écritures non validées) avec un curseur
+        bufferisé : l'appelant peut écrire pendant le parcours.
+        Avec as_tuples, les lignes sont des tuples (plus compacts que des dict).
+        """
+        if getattr(self._local, 'tx', None) is not None:
+            yield from self._fetch_iter_transaction(query, params, batch_size, as_tuples)
+            return
+
+        try:
+            if self.pool is None:
+                raise PoolError("Base de données non connectée")
+            replica = self._use_replica()
+            pool = replica.pool if replica is not None else self.pool
+            pooled = pool.checkout()
+        except (Error, PoolError) as e:
+            print(f"✗ Erreur de lecture : {e}")
+            return
+
+        # Seul le temps passé dans le pilote est mesuré (exécution et lots),
+        # pas celui que l'appelant passe à traiter les lignes
+        duration = 0.0
+        count = 0
+        complete = False
+        cursor = None
+        start = time.perf_counter()
+        try:
+            cursor = pooled.raw.cursor(dictionary=not as_tuples)
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                duration += time.perf_counter() - start
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+                start = time.perf_counter()
+            complete = True
+        except Error as e:
+            duration += time.perf_counter() - start
+            print(f"✗ Erreur de lecture : {e}")
+        finally:
+            self.metrics.record(query, params, duration, count, not complete)
+            if complete:
+                cursor.close()
+                self._checkin(pooled, pool)
+            else:
+                # Parcours interrompu : des lignes restent en attente sur la
+                # connexion, il est moins coûteux de la jeter que de les lire
+                pool.checkin(pooled, discard=True)
+
+    def _fetch_iter_transaction(self, query, params, batch_size, as_tuples):
+        """fetch_iter() dans la transaction du thread courant, sur sa connexion (privé)"""
+        duration = 0.0
+        count = 0
+        complete = False
+        try:
+            with self.connection() as pooled:
+                cursor = pooled.raw.cursor(dictionary=not as_tuples, buffered=True)
+                try:
+                    start = time.perf_counter()
+                    cursor.execute(query, params or ())
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        duration += time.perf_counter() - start
+                        if not rows:
+                            break
+                        count += len(rows)
+                        yield from rows
+                        start = time.perf_counter()
+                    complete = True
+                finally:
+                    cursor.close()
+        except (Error, PoolError) as e:
+            print(f"✗ Erreur de lecture : {e}")
+            tx = getattr(self._local, 'tx', None)
+            if tx is not None:
+                tx.rollback_only()
+        finally:
+            self.metrics.record(query, params, duration, count, not complete)
+
+    def explain(self, query, params=None):
+        """
+        Plan d'exécution de `query` sur le primaire (la requête n'est pas exécutée)
+        Liste d'entrées {table, acces, index, parcoursComplet, detail}, une
+        par table lue ; parcoursComplet signale une lecture de toute la table
+        faute d'index utilisable.
+        """
+        with self.connection() as pooled:
+            return backend.explain(pooled.raw, query, params)
+
     def get_last_insert_id(self):
-        """Récupérer le dernier ID inséré"""
-        return self.cursor.lastrowid
+        """Récupérer le dernier ID inséré (par le thread courant)"""
+        return getattr(self._local, 'last_insert_id', None)
+
+    def get_row_count(self):
+        """Nombre de lignes touchées par la dernière écriture du thread courant"""
+        return getattr(self._local, 'row_count', 0)
+
+    def pool_status(self):
+        """État du pool de connexions"""
+        return self.pool.status() if self.pool else None
+
+    def replica_status(self):
+        """État des réplicas en lecture (liste vide si aucun)"""
+        return self.replicas.status() if self.replicas else []
+
+    def statement_cache_stats(self):
+        """Compteurs du cache de requêtes préparées (toutes connexions)"""
+        with self._stmt_lock:
+            hits, misses = self._stmt_hits, self._stmt_misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': round(hits / total, 4) if total else 0.0,
+            'capacite': DB_STATEMENT_CACHE_SIZE,
+        }
 
 
 # Instance globale de connexion
@@ -0,0 +1,156 @@
+# database/metrics.py
+import logging
+import re
+import threading
+
+# Bornes supérieures (ms) des tranches de l'histogramme de latence
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_SPACES = re.compile(r"\s+")
+_RE_PLACEHOLDER = re.compile(r"%s")
+# Listes de longueur variable, construites selon le nombre de lignes visées
+_RE_IN_LIST = re.compile(r"\bIN \(\?(?:, ?\?)*\)", re.IGNORECASE)
+_RE_WHEN_RUN = re.compile(r"\bWHEN \? THEN \?(?: WHEN \? THEN \?)*", re.IGNORECASE)
+
+slow_logger = logging.getLogger('biblio.slow_queries')
+
+
+def normalize(query):
+    """
+    Forme canonique d'une requête : littéraux et %s remplacés par ?, espaces
+    réduits, listes IN (?, ?, ...) et suites WHEN ? THEN ? ramenées à une
+    seule forme quelle que soit leur longueur (sinon une clé par taille de lot)
+    """
+    query = _RE_STRING.sub('?', query)
+    query = _RE_NUMBER.sub('?', query)
+    query = _RE_PLACEHOLDER.sub('?', query)
+    query = _RE_SPACES.sub(' ', query).strip()
+    query = _RE_IN_LIST.sub('IN (...)', query)
+    return _RE_WHEN_RUN.sub('WHEN ? THEN ? ...', query)
+
+
+def redact(params):
+    """Paramètres masqués pour le journal : seul leur type est conservé"""
+    if not params:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+class StatementStats:
+    """Compteurs d'une requête normalisée"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, duration_ms, rows, error):
+        self.count += 1
+        self.rows += rows
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, p):
+        """Estimation d'un percentile (borne haute de la tranche qui le contient)"""
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else round(self.max_ms, 3)
+        return 0
+
+    def to_dict(self):
+        histogram = {f"<={bound}ms": n for bound, n in zip(BUCKETS_MS, self.buckets)}
+        histogram[f">{BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+        return {
+            'appels': self.count,
+            'erreurs': self.errors,
+            'lignes': self.rows,
+            'totalMs': round(self.total_ms, 3),
+            'moyenneMs': round(self.total_ms / self.count, 3) if self.count else 0,
+            'maxMs': round(self.max_ms, 3),
+            'p50Ms': self.percentile(0.50),
+            'p95Ms': self.percentile(0.95),
+            'histogramme': histogram,
+        }
+
+
+class QueryMetrics:
+    """
+    Instrumentation des requêtes SQL
+    Latence par requête normalisée, lignes retournées/touchées, et journal
+    des requêtes lentes (au-delà de `slow_threshold_ms`) sans leurs valeurs.
+    """
+
+    def __init__(self, slow_threshold_ms=200, slow_log_path=None, enabled=True):
+        self.enabled = enabled
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow_log_path = slow_log_path
+        self._stats = {}
+        self._normalized = {}
+        self._lock = threading.Lock()
+
+    def open_slow_log(self):
+        """
+        Attacher le fichier du journal des requêtes lentes (à la connexion,
+        pas à l'import : importer le module ne crée aucun fichier)
+        """
+        if self.slow_log_path and not slow_logger.handlers:
+            handler = logging.FileHandler(self.slow_log_path, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_logger.addHandler(handler)
+            slow_logger.setLevel(logging.INFO)
+
+    def record(self, query, params, duration_s, rows=0, error=False):
+        """Enregistrer une exécution"""
+        if not self.enabled:
+            return
+        duration_ms = duration_s * 1000
+        key = self._normalized.get(query)
+        if key is None:
+            key = normalize(query)
+            if len(self._normalized) < 1000:
+                self._normalized[query] = key
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            stats.add(duration_ms, rows, error)
+
+        if duration_ms >= self.slow_threshold_ms:
+            slow_logger.info(
+                "%.1fms rows=%d params=%s %s",
+                duration_ms, rows, redact(params), key
+            )
+
+    def snapshot(self):
+        """Statistiques courantes, requêtes les plus coûteuses en premier"""
+        with self._lock:
+            items = [(key, stats.to_dict()) for key, stats in self._stats.items()]
+        items.sort(key=lambda item: item[1]['totalMs'], reverse=True)
+        return {
+            'seuilLenteMs': self.slow_threshold_ms,
+            'requetes': [dict(requete=key, **stats) for key, stats in items],
+        }
+
+    def reset(self):
+        """Remettre les compteurs à zéro"""
+        with self._lock:
+            self._stats.clear()
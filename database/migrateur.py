@@ -0,0 +1,125 @@
+# database/migrateur.py
+"""
+Migrations versionnées du schéma MySQL
+Chaque fichier database/migrations/NNN_nom.sql est une version ; la table
+SchemaMigration garde les versions appliquées. migrer() applique, dans
+l'ordre, celles qui manquent, et enregistre chacune dès qu'elle a réussi.
+MySQL valide implicitement chaque instruction DDL : une migration en échec
+n'est pas annulée. La suite est arrêtée et l'instruction fautive affichée ;
+les instructions déjà passées sont à défaire (ou la migration à marquer)
+avant de relancer.
+
+Le schéma SQLite (database/schema_sqlite.sql) est créé complet à la
+connexion : il n'a pas de migrations.
+"""
+import os
+import re
+from .backends import backend
+from .connection import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+_RE_FICHIER = re.compile(r'^(\d+)_(\w+)\.sql$')
+_RE_FIN_INSTRUCTION = re.compile(r';\s*$', re.MULTILINE)
+
+
+class Migration:
+    """Un fichier de migration"""
+
+    def __init__(self, version, nom, chemin):
+        self.version = version
+        self.nom = nom
+        self.chemin = chemin
+
+    def instructions(self):
+        """Instructions SQL du fichier (commentaires « -- » retirés)"""
+        with open(self.chemin, encoding='utf-8') as f:
+            lignes = [l for l in f if not l.lstrip().startswith('--')]
+        texte = ''.join(lignes)
+        return [i.strip() for i in _RE_FIN_INSTRUCTION.split(texte) if i.strip()]
+
+    def __str__(self):
+        return f"{self.version:03d}_{self.nom}"
+
+
+def migrations_disponibles():
+    """Fichiers de migration, par version croissante"""
+    migrations = []
+    for fichier in os.listdir(MIGRATIONS_DIR):
+        match = _RE_FICHIER.match(fichier)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(MIGRATIONS_DIR, fichier)))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Deux migrations portent le même numéro dans {MIGRATIONS_DIR}")
+    return sorted(migrations, key=lambda m: m.version)
+
+
+def _creer_table_versions():
+    return db.execute_query("""
+        CREATE TABLE IF NOT EXISTS SchemaMigration (
+            version INT NOT NULL PRIMARY KEY,
+            nom VARCHAR(100) NOT NULL,
+            dateApplication DATETIME NOT NULL
+        )
+    """)
+
+
+def versions_appliquees():
+    """{version: date d'application}"""
+    rows = db.fetch_all("SELECT version, dateApplication FROM SchemaMigration")
+    return {row['version']: row['dateApplication'] for row in rows}
+
+
+def _enregistrer(migration):
+    return db.execute_query(
+        "INSERT INTO SchemaMigration (version, nom, dateApplication) VALUES (%s, %s, NOW())",
+        (migration.version, migration.nom)
+    )
+
+
+def etat():
+    """Toutes les migrations : [{version, nom, appliquee, dateApplication}]"""
+    appliquees = {}
+    if backend.name == 'mysql' and _creer_table_versions():
+        appliquees = versions_appliquees()
+    return [{
+        'version': m.version,
+        'nom': m.nom,
+        'appliquee': m.version in appliquees,
+        'dateApplication': appliquees.get(m.version),
+    } for m in migrations_disponibles()]
+
+
+def migrer(jusqua=None, simulation=False, marquer=False):
+    """
+    Appliquer les migrations manquantes (jusqu'à la version `jusqua` incluse)
+    - simulation : lister les migrations à appliquer sans rien exécuter
+    - marquer    : les enregistrer comme appliquées sans les exécuter (base
+                   déjà migrée à la main avec `source`, avant ce suivi)
+    Retourne (migrations traitées, migration en échec ou None).
+    """
+    if backend.name != 'mysql':
+        print(f"✓ Schéma {backend.label} créé à jour par schema_sqlite.sql : rien à migrer")
+        return [], None
+    if not _creer_table_versions():
+        raise RuntimeError("Impossible de créer la table SchemaMigration")
+
+    appliquees = versions_appliquees()
+    a_faire = [m for m in migrations_disponibles()
+               if m.version not in appliquees and (jusqua is None or m.version <= jusqua)]
+    if simulation:
+        return a_faire, None
+
+    faites = []
+    for migration in a_faire:
+        if not marquer:
+            for instruction in migration.instructions():
+                if not db.execute_query(instruction):
+                    print(f"✗ Migration {migration} arrêtée sur :\n{instruction}")
+                    return faites, migration
+        if not _enregistrer(migration):
+            return faites, migration
+        faites.append(migration)
+    return faites, None
@@ -0,0 +1,14 @@
+-- database/migrations/001_livre_fulltext.sql
+-- Recherche plein texte du catalogue (MySQL 8.0+)
+--
+-- La collation utf8mb4_0900_ai_ci (accent et casse ignorés) rend la
+-- recherche insensible aux accents : « elegance » trouve « Élégance ».
+-- L'index FULLTEXT porte sur les deux colonnes interrogées ensemble par
+-- Livre.search : MATCH(titre, auteur) doit citer exactement ces colonnes.
+
+ALTER TABLE Livre CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci;
+
+ALTER TABLE Livre ADD FULLTEXT INDEX ft_livre_titre_auteur (titre, auteur);
+
+-- Recherche exacte par ISBN (douchette, saisie au guichet)
+CREATE INDEX idx_livre_isbn ON Livre (isbn);
@@ -0,0 +1,13 @@
+-- database/migrations/002_adherent_emprunts_en_cours.sql
+-- Compteur d'emprunts en cours par adhérent (vérification du quota par clé primaire)
+--
+-- Tenu à jour par EmpruntService dans la transaction de l'emprunt et du
+-- retour ; `python maintenance.py recalculer-compteurs` le reconstruit.
+
+ALTER TABLE Adherent ADD COLUMN empruntsEnCours INT NOT NULL DEFAULT 0;
+
+UPDATE Adherent a
+SET a.empruntsEnCours = (
+    SELECT COUNT(*) FROM Emprunt e
+    WHERE e.idAdherent = a.idAdherent AND e.statut = 'EN_COURS'
+);
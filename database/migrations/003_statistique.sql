@@ -0,0 +1,16 @@
+-- database/migrations/003_statistique.sql
+-- Compteurs du tableau de bord (/api/stats, fenêtre principale)
+--
+-- Ajustés dans la transaction de chaque écriture par models/statistiques.py ;
+-- dateMaj est la date du dernier recalcul complet. Les lignes sont créées
+-- vides : le premier affichage les recalcule.
+
+CREATE TABLE IF NOT EXISTS Statistique (
+    cle VARCHAR(50) NOT NULL PRIMARY KEY,
+    valeur DECIMAL(14,2) NOT NULL DEFAULT 0,
+    dateMaj DATETIME NULL
+);
+
+INSERT IGNORE INTO Statistique (cle) VALUES
+    ('empruntsTotal'), ('empruntsEnCours'), ('empruntsRetournes'), ('empruntsEnRetard'),
+    ('livresDisponibles'), ('adherentsActifs'), ('penalitesImpayees');
@@ -0,0 +1,32 @@
+-- database/migrations/004_index_composites.sql
+-- Index composites des requêtes des modèles
+--
+-- Chaque index suit un filtre ou un tri réellement utilisé ; les plans sont
+-- vérifiés par tests/test_plans_requetes.py (EXPLAIN de chaque requête).
+-- Livre(isbn) est déjà indexé par 001_livre_fulltext.sql. InnoDB ajoute la
+-- clé primaire à chaque index secondaire : (titre) couvre aussi le tri
+-- départagé par idLivre des pages de catalogue.
+
+-- Retards et emprunts en cours : WHERE statut = ... [AND dateRetourPrevue < NOW()]
+-- ORDER BY dateRetourPrevue
+CREATE INDEX idx_emprunt_statut_retour ON Emprunt (statut, dateRetourPrevue);
+
+-- Historique et emprunts en cours d'un adhérent (quota, recalcul des compteurs)
+CREATE INDEX idx_emprunt_adherent_statut ON Emprunt (idAdherent, statut);
+
+-- Emprunt en cours d'un livre (retour par ISBN)
+CREATE INDEX idx_emprunt_livre_statut ON Emprunt (idLivre, statut);
+
+-- Liste de tous les emprunts, plus récents d'abord
+CREATE INDEX idx_emprunt_date ON Emprunt (dateEmprunt);
+
+-- Pénalités impayées, plus récentes d'abord, et liste complète
+CREATE INDEX idx_penalite_statut_date ON Penalite (statut, dateCreation);
+CREATE INDEX idx_penalite_date ON Penalite (dateCreation);
+
+-- File d'attente des réservations d'un livre, dans l'ordre des positions
+CREATE INDEX idx_reservation_livre_statut_position ON Reservation (idLivre, statut, position);
+
+-- Catalogue et adhérents triés par titre / par nom (pagination par curseur)
+CREATE INDEX idx_livre_titre ON Livre (titre);
+CREATE INDEX idx_adherent_nom_prenom ON Adherent (nom, prenom);
@@ -0,0 +1,34 @@
+-- database/migrations/005_archives.sql
+-- Archives des emprunts rendus et de leurs pénalités payées
+--
+-- services/archivage_service.py y déplace les emprunts RETOURNE anciens
+-- (python maintenance.py archiver-emprunts) : Emprunt et Penalite ne gardent
+-- que l'activité récente. Pas de clés étrangères : un livre ou un adhérent
+-- supprimé garde son historique archivé.
+
+CREATE TABLE IF NOT EXISTS EmpruntArchive (
+    idEmprunt INT NOT NULL PRIMARY KEY,
+    dateEmprunt DATETIME NOT NULL,
+    dateRetourPrevue DATETIME NOT NULL,
+    dateRetourEffective DATETIME NULL,
+    statut VARCHAR(20) NOT NULL,
+    idLivre INT NOT NULL,
+    idAdherent INT NOT NULL,
+    idBibliothecaire INT NOT NULL,
+    dateArchivage DATETIME NOT NULL,
+    INDEX idx_emprunt_archive_adherent (idAdherent, dateEmprunt)
+);
+
+CREATE TABLE IF NOT EXISTS PenaliteArchive (
+    idPenalite INT NOT NULL PRIMARY KEY,
+    montant DECIMAL(10,2) NOT NULL,
+    motif VARCHAR(255) NULL,
+    dateCreation DATETIME NOT NULL,
+    statut VARCHAR(20) NOT NULL,
+    idEmprunt INT NOT NULL,
+    dateArchivage DATETIME NOT NULL,
+    INDEX idx_penalite_archive_emprunt (idEmprunt)
+);
+
+-- Sélection des emprunts à archiver : rendus avant une date
+CREATE INDEX idx_emprunt_statut_rendu ON Emprunt (statut, dateRetourEffective);
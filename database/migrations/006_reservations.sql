@@ -0,0 +1,15 @@
+-- database/migrations/006_reservations.sql
+-- Réservations : mise de côté des exemplaires rendus (services/reservation_service.py)
+--
+-- statut : EN_ATTENTE (file), DISPONIBLE (exemplaire de côté jusqu'à
+-- dateExpiration), SATISFAITE (emprunté), ANNULEE, EXPIREE ; colonne
+-- ramenée à VARCHAR pour accepter les nouveaux statuts.
+-- Les positions ne sont jamais renumérotées : chaque réservation prend la
+-- position suivante du livre, le rang dans la file se déduit de l'ordre.
+
+ALTER TABLE Reservation MODIFY statut VARCHAR(20) NOT NULL DEFAULT 'EN_ATTENTE';
+
+ALTER TABLE Reservation ADD COLUMN dateExpiration DATETIME NULL;
+
+-- Exemplaires de côté dont le délai de retrait est passé
+CREATE INDEX idx_reservation_statut_expiration ON Reservation (statut, dateExpiration);
@@ -0,0 +1,8 @@
+-- database/migrations/007_livre_isbn_chiffres.sql
+-- ISBN sans tirets ni espaces (import du catalogue)
+--
+-- Les livres saisis à la main gardent l'ISBN tel quel (« 978-2-07-036024-5 ») ;
+-- l'import les retrouve par les seuls chiffres. Index fonctionnel
+-- (MySQL 8.0.13+) : la requête doit reprendre exactement cette expression.
+
+CREATE INDEX idx_livre_isbn_chiffres ON Livre ((REPLACE(REPLACE(isbn, '-', ''), ' ', '')));
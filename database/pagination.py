@@ -0,0 +1,113 @@
+# database/pagination.py
+"""
+Pagination par curseur (keyset)
+Au lieu d'un OFFSET, qui oblige le serveur à relire toutes les lignes des
+pages précédentes, chaque page reprend juste après la dernière ligne vue :
+WHERE (colonnes de tri) > (valeurs de la dernière ligne). Le coût d'une page
+ne dépend donc pas de sa profondeur. Le jeton `after` rendu au client est
+opaque : il encode les valeurs de tri de la dernière ligne.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from .connection import db
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+    return value
+
+
+def encode_cursor(values):
+    """Jeton opaque à partir des valeurs de tri de la dernière ligne"""
+    data = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, expected_length):
+    """Valeurs de tri contenues dans un jeton (ValueError si invalide)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [_decode_value(v) for v in values]
+    except Exception as e:
+        raise ValueError(f"Curseur de pagination invalide : {token}") from e
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise ValueError(f"Curseur de pagination invalide : {token}")
+    return values
+
+
+def _keyset_condition(order_by, values):
+    """
+    Condition « strictement après `values` » pour un tri multi-colonnes
+    (a, b) > (x, y) s'écrit a > x OR (a = x AND b > y), en respectant le sens
+    de chaque colonne. Une borne simple sur la première colonne est ajoutée
+    pour que l'index serve de point de départ.
+    """
+    first_expr, _, first_dir = order_by[0]
+    bound = f"{first_expr} {'>=' if first_dir == 'ASC' else '<='} %s"
+    params = [values[0]]
+
+    clauses = []
+    for i, (expr, _, direction) in enumerate(order_by):
+        parts = [f"{prev_expr} = %s" for prev_expr, _, _ in order_by[:i]]
+        parts.append(f"{expr} {'>' if direction == 'ASC' else '<'} %s")
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(values[:i])
+        params.append(values[i])
+
+    return f"{bound} AND ({' OR '.join(clauses)})", params
+
+
+def keyset_page(select, order_by, params=(), limit=50, after=None,
+                where=None, group_by=None):
+    """
+    Lire une page de résultats
+    - select   : "SELECT ... FROM ... JOIN ..." sans WHERE ni ORDER BY
+    - order_by : [(expression SQL, clé dans la ligne, 'ASC'|'DESC'), ...]
+                 la dernière colonne doit être unique (clé primaire)
+    - where    : condition existante (ses paramètres en tête de `params`)
+    Retourne (lignes, jeton de la page suivante ou None)
+    """
+    conditions = [where] if where else []
+    params = list(params)
+
+    if after:
+        values = decode_cursor(after, len(order_by))
+        condition, keyset_params = _keyset_condition(order_by, values)
+        conditions.append(condition)
+        params.extend(keyset_params)
+
+    query = select
+    if conditions:
+        query += " WHERE " + " AND ".join(f"({c})" for c in conditions)
+    if group_by:
+        query += " GROUP BY " + group_by
+    query += " ORDER BY " + ", ".join(f"{expr} {direction}" for expr, _, direction in order_by)
+    query += " LIMIT %s"
+    params.append(limit + 1)
+
+    rows = db.fetch_all(query, tuple(params))
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last[key] for _, key, _ in order_by])
@@ -0,0 +1,136 @@
+# database/pool.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class PoolError(Exception):
+    """Erreur du pool de connexions"""
+
+
+class PoolTimeout(PoolError):
+    """Aucune connexion libre dans le délai imparti"""
+
+
+class PooledConnection:
+    """Connexion physique gérée par le pool"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Requêtes préparées côté serveur : texte SQL -> curseur (ordre LRU)
+        self.statements = OrderedDict()
+
+    def close(self):
+        """Fermer la connexion physique sans lever d'erreur"""
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool de connexions thread-safe
+    - `size` connexions sont gardées ouvertes entre deux utilisations
+    - jusqu'à `max_overflow` connexions supplémentaires sont ouvertes en pic,
+      puis fermées dès qu'elles sont rendues
+    - une connexion restée inactive est vérifiée (pre-ping) avant d'être prêtée
+    """
+
+    def __init__(self, factory, size=5, max_overflow=10, timeout=30,
+                 pre_ping=True, ping=None):
+        self.factory = factory
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.ping = ping or (lambda raw: raw.is_connected())
+
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def checkout(self):
+        """Emprunter une connexion (bloque au plus `timeout` secondes)"""
+        deadline = time.monotonic() + self.timeout
+        pooled = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Pool de connexions fermé")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"Aucune connexion libre après {self.timeout}s "
+                        f"({self._total} connexions ouvertes)"
+                    )
+                self._cond.wait(remaining)
+
+        if pooled is not None and self.pre_ping and not self._is_alive(pooled):
+            pooled.close()
+            pooled = None
+
+        if pooled is None:
+            try:
+                pooled = PooledConnection(self.factory())
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+
+        pooled.last_used = time.monotonic()
+        return pooled
+
+    def checkin(self, pooled, discard=False):
+        """Rendre une connexion au pool (fermée si en surplus ou invalide)"""
+        with self._cond:
+            if discard or self._closed or len(self._idle) >= self.size:
+                self._total -= 1
+                keep = False
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                keep = True
+            self._cond.notify()
+
+        if not keep:
+            pooled.close()
+
+    def close(self):
+        """Fermer toutes les connexions inactives et refuser les suivantes"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+
+        for pooled in idle:
+            pooled.close()
+
+    def status(self):
+        """État courant du pool"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'maxOverflow': self.max_overflow,
+                'ouvertes': self._total,
+                'inactives': len(self._idle),
+                'utilisees': self._total - len(self._idle),
+            }
+
+    def _is_alive(self, pooled):
+        try:
+            return bool(self.ping(pooled.raw))
+        except Exception:
+            return False
@@ -0,0 +1,96 @@
+# database/replicas.py
+import itertools
+import threading
+import time
+
+
+class Replica:
+    """Réplica en lecture : son pool et son dernier retard mesuré"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.checked_at = 0.0
+        self.down_until = 0.0
+        self.last_error = None
+        self._check_lock = threading.Lock()
+
+    def mark_down(self, error, retry_after):
+        """Écarter le réplica pendant `retry_after` secondes"""
+        self.last_error = str(error)
+        self.lag = None
+        self.down_until = time.monotonic() + retry_after
+
+    def status(self):
+        return {
+            'nom': self.name,
+            'retardSecondes': self.lag,
+            'disponible': self.lag is not None and time.monotonic() >= self.down_until,
+            'derniereErreur': self.last_error,
+            'pool': self.pool.status(),
+        }
+
+
+class ReplicaSet:
+    """
+    Répartition des lectures entre réplicas (tourniquet)
+    Un réplica n'est choisi que si son retard de réplication, mesuré au plus
+    toutes les `check_interval` secondes, ne dépasse pas `max_lag`.
+    """
+
+    def __init__(self, replicas, measure_lag, max_lag=5, check_interval=2):
+        self.replicas = replicas
+        self.measure_lag = measure_lag
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+
+    def choose(self):
+        """Prochain réplica utilisable, ou None (lire sur le primaire)"""
+        n = len(self.replicas)
+        if n == 0:
+            return None
+        start = next(self._counter)
+        for i in range(n):
+            replica = self.replicas[(start + i) % n]
+            if self._usable(replica):
+                return replica
+        return None
+
+    def _usable(self, replica):
+        now = time.monotonic()
+        if now < replica.down_until:
+            return False
+        # Un seul thread remesure le retard, les autres gardent la dernière valeur
+        if now - replica.checked_at >= self.check_interval and \
+                replica._check_lock.acquire(blocking=False):
+            try:
+                self._check(replica)
+            finally:
+                replica._check_lock.release()
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def _check(self, replica):
+        replica.checked_at = time.monotonic()
+        try:
+            pooled = replica.pool.checkout()
+        except Exception as e:
+            replica.mark_down(e, self.check_interval)
+            return
+        try:
+            replica.lag = self.measure_lag(pooled.raw)
+            replica.last_error = None
+            if replica.lag is None:
+                replica.last_error = "Réplication arrêtée"
+            replica.pool.checkin(pooled)
+        except Exception as e:
+            replica.pool.checkin(pooled, discard=True)
+            replica.mark_down(e, self.check_interval)
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def status(self):
+        return [replica.status() for replica in self.replicas]
@@ -0,0 +1,125 @@
+-- database/schema_sqlite.sql
+-- Schéma biblio_simple pour le moteur SQLite (créé au premier démarrage)
+
+CREATE TABLE IF NOT EXISTS Bibliothecaire (
+    idBibliothecaire INTEGER PRIMARY KEY AUTOINCREMENT,
+    nom VARCHAR(50) NOT NULL,
+    prenom VARCHAR(50) NOT NULL,
+    login VARCHAR(50) NOT NULL UNIQUE,
+    motDePasse VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Adherent (
+    idAdherent INTEGER PRIMARY KEY AUTOINCREMENT,
+    nom VARCHAR(50) NOT NULL,
+    prenom VARCHAR(50) NOT NULL,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    telephone VARCHAR(20),
+    typeAdherent VARCHAR(20) NOT NULL DEFAULT 'ETUDIANT',
+    statut VARCHAR(20) NOT NULL DEFAULT 'ACTIF',
+    empruntsEnCours INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Categorie (
+    idCategorie INTEGER PRIMARY KEY AUTOINCREMENT,
+    nomCategorie VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS Livre (
+    idLivre INTEGER PRIMARY KEY AUTOINCREMENT,
+    isbn VARCHAR(20),
+    titre VARCHAR(255) NOT NULL,
+    auteur VARCHAR(255) NOT NULL,
+    nombreExemplaires INTEGER NOT NULL DEFAULT 1,
+    nombreDisponibles INTEGER NOT NULL DEFAULT 1,
+    idCategorie INTEGER NOT NULL REFERENCES Categorie(idCategorie)
+);
+
+CREATE TABLE IF NOT EXISTS Emprunt (
+    idEmprunt INTEGER PRIMARY KEY AUTOINCREMENT,
+    dateEmprunt DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    dateRetourPrevue DATETIME NOT NULL,
+    dateRetourEffective DATETIME,
+    statut VARCHAR(20) NOT NULL DEFAULT 'EN_COURS',
+    idLivre INTEGER NOT NULL REFERENCES Livre(idLivre),
+    idAdherent INTEGER NOT NULL REFERENCES Adherent(idAdherent),
+    idBibliothecaire INTEGER NOT NULL REFERENCES Bibliothecaire(idBibliothecaire)
+);
+
+CREATE TABLE IF NOT EXISTS Reservation (
+    idReservation INTEGER PRIMARY KEY AUTOINCREMENT,
+    dateReservation DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    statut VARCHAR(20) NOT NULL DEFAULT 'EN_ATTENTE',
+    position INTEGER NOT NULL,
+    idLivre INTEGER NOT NULL REFERENCES Livre(idLivre),
+    idAdherent INTEGER NOT NULL REFERENCES Adherent(idAdherent),
+    dateExpiration DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS Penalite (
+    idPenalite INTEGER PRIMARY KEY AUTOINCREMENT,
+    montant DECIMAL(10,2) NOT NULL,
+    motif VARCHAR(255),
+    dateCreation DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    statut VARCHAR(20) NOT NULL DEFAULT 'IMPAYEE',
+    idEmprunt INTEGER NOT NULL REFERENCES Emprunt(idEmprunt)
+);
+
+-- Archives des emprunts rendus et de leurs pénalités payées (services/archivage_service.py)
+CREATE TABLE IF NOT EXISTS EmpruntArchive (
+    idEmprunt INTEGER PRIMARY KEY,
+    dateEmprunt DATETIME NOT NULL,
+    dateRetourPrevue DATETIME NOT NULL,
+    dateRetourEffective DATETIME,
+    statut VARCHAR(20) NOT NULL,
+    idLivre INTEGER NOT NULL,
+    idAdherent INTEGER NOT NULL,
+    idBibliothecaire INTEGER NOT NULL,
+    dateArchivage DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS PenaliteArchive (
+    idPenalite INTEGER PRIMARY KEY,
+    montant DECIMAL(10,2) NOT NULL,
+    motif VARCHAR(255),
+    dateCreation DATETIME NOT NULL,
+    statut VARCHAR(20) NOT NULL,
+    idEmprunt INTEGER NOT NULL,
+    dateArchivage DATETIME NOT NULL
+);
+
+-- Compteurs du tableau de bord (models/statistiques.py), recalculés au premier affichage
+CREATE TABLE IF NOT EXISTS Statistique (
+    cle VARCHAR(50) PRIMARY KEY,
+    valeur DECIMAL(14,2) NOT NULL DEFAULT 0,
+    dateMaj DATETIME
+);
+
+INSERT OR IGNORE INTO Statistique (cle) VALUES
+    ('empruntsTotal'), ('empruntsEnCours'), ('empruntsRetournes'), ('empruntsEnRetard'),
+    ('livresDisponibles'), ('adherentsActifs'), ('penalitesImpayees');
+
+-- Index des requêtes des modèles (cf. database/migrations/004 à 007 ;
+-- les plans sont vérifiés par tests/test_plans_requetes.py)
+CREATE INDEX IF NOT EXISTS idx_livre_isbn ON Livre (isbn);
+CREATE INDEX IF NOT EXISTS idx_livre_isbn_chiffres ON Livre (REPLACE(REPLACE(isbn, '-', ''), ' ', ''));
+CREATE INDEX IF NOT EXISTS idx_livre_titre ON Livre (titre);
+CREATE INDEX IF NOT EXISTS idx_adherent_nom_prenom ON Adherent (nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_emprunt_statut_retour ON Emprunt (statut, dateRetourPrevue);
+CREATE INDEX IF NOT EXISTS idx_emprunt_adherent_statut ON Emprunt (idAdherent, statut);
+CREATE INDEX IF NOT EXISTS idx_emprunt_livre_statut ON Emprunt (idLivre, statut);
+CREATE INDEX IF NOT EXISTS idx_emprunt_date ON Emprunt (dateEmprunt);
+CREATE INDEX IF NOT EXISTS idx_emprunt_statut_rendu ON Emprunt (statut, dateRetourEffective);
+CREATE INDEX IF NOT EXISTS idx_penalite_statut_date ON Penalite (statut, dateCreation);
+CREATE INDEX IF NOT EXISTS idx_penalite_date ON Penalite (dateCreation);
+CREATE INDEX IF NOT EXISTS idx_reservation_livre_statut_position ON Reservation (idLivre, statut, position);
+CREATE INDEX IF NOT EXISTS idx_reservation_statut_expiration ON Reservation (statut, dateExpiration);
+CREATE INDEX IF NOT EXISTS idx_emprunt_archive_adherent ON EmpruntArchive (idAdherent, dateEmprunt);
+CREATE INDEX IF NOT EXISTS idx_penalite_archive_emprunt ON PenaliteArchive (idEmprunt);
+
+-- Clés étrangères sans index composite qui les couvre (InnoDB les indexe
+-- d'office ; SQLite en a besoin pour vérifier une suppression du parent)
+CREATE INDEX IF NOT EXISTS idx_livre_categorie ON Livre (idCategorie);
+CREATE INDEX IF NOT EXISTS idx_penalite_emprunt ON Penalite (idEmprunt);
+CREATE INDEX IF NOT EXISTS idx_reservation_adherent ON Reservation (idAdherent);
+CREATE INDEX IF NOT EXISTS idx_emprunt_bibliothecaire ON Emprunt (idBibliothecaire);
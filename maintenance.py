@@ -0,0 +1,254 @@
+# maintenance.py
+"""
+Commandes de maintenance de la base (à lancer depuis un terminal)
+
+    python maintenance.py recalculer-compteurs [--simulation]
+    python maintenance.py recalculer-statistiques
+    python maintenance.py importer-catalogue FICHIER [--format csv|onix]
+                          [--categorie-defaut NOM] [--lot N] [--rejets FICHIER.csv]
+    python maintenance.py synchroniser-adherents FICHIER.csv [--simulation]
+                          [--sans-desactivation] [--lot N] [--rapport FICHIER.json]
+    python maintenance.py migrer [--etat | --simulation] [--jusqua N] [--marquer]
+    python maintenance.py archiver-emprunts [--age JOURS] [--lot N] [--simulation]
+    python maintenance.py expirer-reservations
+"""
+import argparse
+import csv
+import json
+import sys
+from database import db, migrateur
+from models import Adherent, Statistiques
+from services.catalogue_service import CatalogueService, LECTEURS
+from services.synchronisation_service import SynchronisationService
+from services.archivage_service import ArchivageService
+from services.reservation_service import ReservationService
+from config import ARCHIVAGE_AGE_JOURS
+
+
+def recalculer_compteurs(args):
+    """Reconstruire Adherent.empruntsEnCours depuis la table Emprunt"""
+    ecarts = Adherent.recalculer_emprunts_en_cours(appliquer=not args.simulation)
+    if not ecarts:
+        print("✓ Compteurs d'emprunts à jour")
+        return 0
+
+    for ecart in ecarts:
+        print(f"  Adhérent {ecart['idAdherent']} : compteur {ecart['compteur']}, "
+              f"emprunts en cours {ecart['reel']}")
+    if args.simulation:
+        print(f"✗ {len(ecarts)} compteur(s) faux (simulation, rien n'a été corrigé)")
+        return 1
+    print(f"✓ {len(ecarts)} compteur(s) corrigé(s)")
+    return 0
+
+
+def recalculer_statistiques(args):
+    """Recalculer les compteurs du tableau de bord depuis les tables"""
+    Statistiques.recalculer()
+    for cle, valeur in Statistiques.get().items():
+        print(f"  {cle} : {valeur}")
+    print("✓ Statistiques recalculées")
+    return 0
+
+
+def importer_catalogue(args):
+    """Importer un catalogue CSV ou ONIX (création ou mise à jour par ISBN)"""
+    def progression(rapport):
+        print(f"  {rapport.lus} notices lues, {rapport.inseres} créées, "
+              f"{rapport.mis_a_jour} mises à jour, {rapport.rejetes} rejetées "
+              f"({rapport.duree:.1f} s)", flush=True)
+
+    fichier_rejets = open(args.rejets, 'w', newline='', encoding='utf-8') if args.rejets else None
+    try:
+        rejet = None
+        if fichier_rejets:
+            ecrivain = csv.writer(fichier_rejets, delimiter=';')
+            ecrivain.writerow(['ligne', 'motif', 'isbn', 'titre', 'auteur', 'categorie'])
+
+            def rejet(ligne, notice, motif):
+                ecrivain.writerow([ligne, motif] + [notice.get(c, '') for c in
+                                                    ('isbn', 'titre', 'auteur', 'categorie')])
+
+        options = {'categorie_defaut': args.categorie_defaut,
+                   'progression': progression, 'rejet': rejet}
+        if args.lot:
+            options['taille_lot'] = args.lot
+        rapport = CatalogueService.importer_fichier(args.fichier, args.format, **options)
+    finally:
+        if fichier_rejets:
+            fichier_rejets.close()
+
+    print(f"✓ Import terminé en {rapport.duree:.1f} s : {rapport.inseres} livre(s) créé(s), "
+          f"{rapport.mis_a_jour} mis à jour, {rapport.categories_creees} catégorie(s) créée(s)")
+    if rapport.rejetes:
+        print(f"✗ {rapport.rejetes} notice(s) rejetée(s)")
+        for ligne, motif in rapport.rejets[:10]:
+            print(f"  ligne {ligne} : {motif}")
+        return 1
+    return 0
+
+
+def synchroniser_adherents(args):
+    """Aligner les adhérents sur l'export de la scolarité (créations, mises à jour, désactivations)"""
+    options = {'simulation': args.simulation, 'desactiver': not args.sans_desactivation}
+    if args.lot:
+        options['taille_lot'] = args.lot
+    rapport = SynchronisationService.synchroniser_fichier(args.fichier, **options)
+
+    if args.rapport:
+        with open(args.rapport, 'w', encoding='utf-8') as f:
+            json.dump(rapport.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+
+    for fiche in rapport.crees[:10]:
+        print(f"  + {fiche['email']} ({fiche['nom']} {fiche['prenom']})")
+    for idAdherent, email, changements in rapport.modifies[:10]:
+        detail = ', '.join(f"{champ} : {avant!r} -> {apres!r}"
+                           for champ, (avant, apres) in changements.items())
+        print(f"  ~ {email} (#{idAdherent}) {detail}")
+    for idAdherent, email in rapport.desactives[:10]:
+        print(f"  - {email} (#{idAdherent}) désactivé")
+
+    bilan = (f"{rapport.nb_crees} création(s), {rapport.nb_modifies} mise(s) à jour, "
+             f"{rapport.nb_desactives} désactivation(s), {rapport.inchanges} inchangé(s) "
+             f"sur {rapport.lus} ligne(s) lue(s) en {rapport.duree:.1f} s")
+    if args.simulation:
+        print(f"✓ Simulation (rien n'a été écrit) : {bilan}")
+    else:
+        print(f"✓ Synchronisation terminée : {bilan}")
+    if rapport.rejetes:
+        print(f"✗ {rapport.rejetes} ligne(s) rejetée(s)")
+        for ligne, motif in rapport.rejets[:10]:
+            print(f"  ligne {ligne} : {motif}")
+        return 1
+    return 0
+
+
+def migrer(args):
+    """Appliquer les migrations de schéma manquantes (database/migrations)"""
+    if args.etat:
+        for m in migrateur.etat():
+            date = m['dateApplication'] or 'à appliquer'
+            print(f"  {'✓' if m['appliquee'] else '·'} {m['version']:03d}_{m['nom']} ({date})")
+        return 0
+
+    migrations, echec = migrateur.migrer(jusqua=args.jusqua, simulation=args.simulation,
+                                         marquer=args.marquer)
+    if args.simulation:
+        for migration in migrations:
+            print(f"  {migration}")
+        print(f"✓ {len(migrations)} migration(s) à appliquer (simulation, rien n'a été exécuté)")
+        return 0
+
+    for migration in migrations:
+        print(f"  {migration}")
+    verbe = "marquée(s) comme appliquée(s)" if args.marquer else "appliquée(s)"
+    print(f"✓ {len(migrations)} migration(s) {verbe}")
+    if echec:
+        print(f"✗ Échec de la migration {echec}")
+        return 1
+    return 0
+
+
+def archiver_emprunts(args):
+    """Déplacer les emprunts rendus anciens (et leurs pénalités) dans les archives"""
+    if args.simulation:
+        total = ArchivageService.compter(args.age)
+        print(f"✓ Simulation (rien n'a été déplacé) : {total['emprunts']} emprunt(s) et "
+              f"{total['penalites']} pénalité(s) rendus depuis plus de {args.age} jours")
+        return 0
+
+    def progression(rapport):
+        print(f"  {rapport['emprunts']} emprunt(s), {rapport['penalites']} pénalité(s) "
+              f"archivés ({rapport['lots']} lot(s))", flush=True)
+
+    options = {'progression': progression}
+    if args.lot:
+        options['taille_lot'] = args.lot
+    rapport = ArchivageService.archiver(args.age, **options)
+    print(f"✓ {rapport['emprunts']} emprunt(s) et {rapport['penalites']} pénalité(s) "
+          f"archivés en {rapport['dureeSecondes']} s")
+    return 1 if rapport['erreur'] else 0
+
+
+def expirer_reservations(args):
+    """Rendre les exemplaires mis de côté et non retirés à temps (suivant de la file ou rayon)"""
+    expirees = ReservationService.expirer()
+    if expirees is None:
+        print("✗ Erreur lors de l'expiration des réservations")
+        return 1
+    print(f"✓ {expirees} réservation(s) expirée(s)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance de la base bibliothèque")
+    commandes = parser.add_subparsers(dest='commande', required=True)
+
+    p = commandes.add_parser('recalculer-compteurs',
+                             help="reconstruire les compteurs d'emprunts en cours des adhérents")
+    p.add_argument('--simulation', action='store_true',
+                   help="afficher les écarts sans les corriger")
+    p.set_defaults(action=recalculer_compteurs)
+
+    p = commandes.add_parser('recalculer-statistiques',
+                             help="recalculer les compteurs du tableau de bord")
+    p.set_defaults(action=recalculer_statistiques)
+
+    p = commandes.add_parser('importer-catalogue',
+                             help="importer un catalogue de livres (CSV ou ONIX)")
+    p.add_argument('fichier')
+    p.add_argument('--format', choices=sorted(LECTEURS), default='csv')
+    p.add_argument('--categorie-defaut', metavar='NOM',
+                   help="catégorie des notices qui n'en indiquent pas")
+    p.add_argument('--lot', type=int, metavar='N', help="notices par transaction")
+    p.add_argument('--rejets', metavar='FICHIER.csv',
+                   help="écrire les notices rejetées et leur motif")
+    p.set_defaults(action=importer_catalogue)
+
+    p = commandes.add_parser('synchroniser-adherents',
+                             help="aligner les adhérents sur l'export de la scolarité")
+    p.add_argument('fichier')
+    p.add_argument('--simulation', action='store_true',
+                   help="afficher le rapport sans rien écrire")
+    p.add_argument('--sans-desactivation', action='store_true',
+                   help="ne pas désactiver les adhérents absents (export partiel)")
+    p.add_argument('--lot', type=int, metavar='N', help="adhérents par transaction")
+    p.add_argument('--rapport', metavar='FICHIER.json',
+                   help="écrire le rapport détaillé")
+    p.set_defaults(action=synchroniser_adherents)
+
+    p = commandes.add_parser('migrer', help="appliquer les migrations de schéma manquantes")
+    options = p.add_mutually_exclusive_group()
+    options.add_argument('--etat', action='store_true',
+                         help="lister les migrations et leur date d'application")
+    options.add_argument('--simulation', action='store_true',
+                         help="lister les migrations à appliquer sans les exécuter")
+    p.add_argument('--jusqua', type=int, metavar='N', help="s'arrêter à la version N")
+    p.add_argument('--marquer', action='store_true',
+                   help="enregistrer comme appliquées sans exécuter (base migrée à la main)")
+    p.set_defaults(action=migrer)
+
+    p = commandes.add_parser('archiver-emprunts',
+                             help="archiver les emprunts rendus depuis longtemps")
+    p.add_argument('--age', type=int, default=ARCHIVAGE_AGE_JOURS, metavar='JOURS',
+                   help=f"ancienneté minimale du retour (défaut : {ARCHIVAGE_AGE_JOURS})")
+    p.add_argument('--lot', type=int, metavar='N', help="emprunts par transaction")
+    p.add_argument('--simulation', action='store_true',
+                   help="compter les emprunts à archiver sans rien déplacer")
+    p.set_defaults(action=archiver_emprunts)
+
+    p = commandes.add_parser('expirer-reservations',
+                             help="expirer les exemplaires mis de côté non retirés à temps")
+    p.set_defaults(action=expirer_reservations)
+
+    args = parser.parse_args(argv)
+    if not db.connect():
+        return 2
+    try:
+        return args.action(args)
+    finally:
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,5 +2,10 @@
 from .adherent import Adherent
 from .livre import Livre
 from .emprunt import Emprunt
+from .penalite import Penalite
+from .referentiel import Referentiel
+from .reservation import Reservation
+from .statistiques import Statistiques
 
-__all__ = ['Adherent', 'Livre', 'Emprunt']
+__all__ = ['Adherent', 'Livre', 'Emprunt', 'Penalite', 'Referentiel', 'Reservation',
+           'Statistiques']
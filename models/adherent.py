@@ -1,11 +1,26 @@
 # models/adherent.py
-from database import db
+import threading
+import time
+from database import db, keyset_page
+from database.pagination import decode_cursor, encode_cursor
+from config import (QUOTA_ETUDIANT, QUOTA_ENSEIGNANT,
+                    ADHERENT_SEARCH_LIMIT, ADHERENT_INDEX_REFRESH)
+from .index_trigrammes import IndexTrigrammes, normaliser
+from .statistiques import Statistiques
 
 class Adherent:
     """Classe représentant un adhérent"""
     
+    # Attributs dans l'ordre du constructeur (et des lignes lues par from_row)
+    # empruntsEnCours est un compteur tenu par EmpruntService dans la même
+    # transaction que l'emprunt ou le retour (recalculer_emprunts_en_cours()
+    # le reconstruit depuis Emprunt)
+    __slots__ = ('idAdherent', 'nom', 'prenom', 'email', 'telephone',
+                 'typeAdherent', 'statut', 'empruntsEnCours')
+    
     def __init__(self, idAdherent=None, nom='', prenom='', email='', 
-                 telephone='', typeAdherent='ETUDIANT', statut='ACTIF'):
+                 telephone='', typeAdherent='ETUDIANT', statut='ACTIF',
+                 empruntsEnCours=0):
         self.idAdherent = idAdherent
         self.nom = nom
         self.prenom = prenom
@@ -13,12 +28,50 @@ class Adherent:
         self.telephone = telephone
         self.typeAdherent = typeAdherent
         self.statut = statut
+        self.empruntsEnCours = empruntsEnCours
+    
+    # Colonnes de fiche, sans le compteur (qui change à chaque emprunt)
+    _COLONNES = ('idAdherent', 'nom', 'prenom', 'email', 'telephone',
+                 'typeAdherent', 'statut')
+    
+    # Pagination : listes avec quota, triées par nom puis prénom
+    _SELECT_PAGE = "SELECT a.* FROM Adherent a"
+    _ORDRE_PAGE = [('a.nom', 'nom', 'ASC'), ('a.prenom', 'prenom', 'ASC'),
+                   ('a.idAdherent', 'idAdherent', 'ASC')]
+    
+    # Recherche au guichet : index trigrammes en mémoire, tenu à jour par
+    # save/update/delete et rechargé toutes les ADHERENT_INDEX_REFRESH secondes
+    # (pour voir les modifications faites par un autre processus)
+    _index = IndexTrigrammes(('nom', 'prenom', 'email'))
+    _index_charge_a = None
+    _index_lock = threading.Lock()
+    
+    @classmethod
+    def from_row(cls, row):
+        """Construire un adhérent à partir d'un tuple ordonné comme __slots__"""
+        return cls(*row)
+    
+    def to_dict(self):
+        """Représentation sérialisable en JSON"""
+        return {name: getattr(self, name) for name in self.__slots__}
     
     @staticmethod
-    def get_all():
-        """Récupérer tous les adhérents"""
+    def get_all(objets=False):
+        """
+        Parcourir tous les adhérents (générateur)
+        objets=True : instances Adherent hydratées depuis des tuples
+        """
+        if objets:
+            query = """
+                SELECT idAdherent, nom, prenom, email, telephone, typeAdherent,
+                       statut, empruntsEnCours
+                FROM Adherent
+                ORDER BY nom, prenom
+            """
+            return map(Adherent.from_row, db.fetch_iter(query, as_tuples=True))
+        
         query = "SELECT * FROM Adherent ORDER BY nom, prenom"
-        return db.fetch_all(query)
+        return db.fetch_iter(query)
     
     @staticmethod
     def get_by_id(idAdherent):
@@ -27,15 +80,110 @@ class Adherent:
         return db.fetch_one(query, (idAdherent,))
     
     @staticmethod
-    def search(keyword):
-        """Rechercher des adhérents par nom, prénom ou email"""
-        query = """
-            SELECT * FROM Adherent 
-            WHERE nom LIKE %s OR prenom LIKE %s OR email LIKE %s
-            ORDER BY nom, prenom
+    def charger_index():
+        """(Re)construire l'index de recherche à partir de la table Adherent"""
+        with Adherent._index_lock:
+            query = f"SELECT {', '.join(Adherent._COLONNES)} FROM Adherent"
+            Adherent._index.reconstruire(db.fetch_iter(query), 'idAdherent')
+            Adherent._index_charge_a = time.monotonic()
+        print(f"✓ Index de recherche : {len(Adherent._index)} adhérents")
+    
+    @staticmethod
+    def _index_a_jour():
+        """Charger l'index au premier usage ; le recharger en tâche de fond s'il est ancien"""
+        if Adherent._index_charge_a is None:
+            Adherent.charger_index()
+        elif time.monotonic() - Adherent._index_charge_a > ADHERENT_INDEX_REFRESH \
+                and not Adherent._index_lock.locked():
+            Adherent._index_charge_a = time.monotonic()
+            threading.Thread(target=Adherent.charger_index, daemon=True).start()
+    
+    @staticmethod
+    def _tri_recherche(adherent):
+        """Départage des résultats de même score : nom puis prénom"""
+        return normaliser(adherent['nom']), normaliser(adherent['prenom'])
+    
+    @staticmethod
+    def search(keyword, limit=ADHERENT_SEARCH_LIMIT):
+        """Rechercher des adhérents par nom, prénom ou email (tolère les fautes de frappe)"""
+        Adherent._index_a_jour()
+        return Adherent._index.rechercher(keyword, limit, tri=Adherent._tri_recherche)
+    
+    @staticmethod
+    def get_quota_max(typeAdherent):
+        """Nombre maximum d'emprunts simultanés selon le type d'adhérent"""
+        if typeAdherent == 'ENSEIGNANT':
+            return QUOTA_ENSEIGNANT
+        return QUOTA_ETUDIANT
+    
+    @staticmethod
+    def _ajouter_quota(adherent):
+        """Compléter une ligne portant empruntsEnCours avec quotaMax et quotaDisponible"""
+        quota_max = Adherent.get_quota_max(adherent['typeAdherent'])
+        adherent['empruntsEnCours'] = int(adherent['empruntsEnCours'])
+        adherent['quotaMax'] = quota_max
+        adherent['quotaDisponible'] = quota_max - adherent['empruntsEnCours']
+        return adherent
+    
+    @staticmethod
+    def get_all_with_quota():
+        """Parcourir tous les adhérents avec leur quota (générateur)"""
+        query = "SELECT * FROM Adherent ORDER BY nom, prenom"
+        return map(Adherent._ajouter_quota, db.fetch_iter(query))
+    
+    @staticmethod
+    def get_with_quota(idAdherent):
+        """Récupérer un adhérent avec son quota (None s'il n'existe pas)"""
+        adherent = Adherent.get_by_id(idAdherent)
+        return Adherent._ajouter_quota(adherent) if adherent else None
+    
+    @staticmethod
+    def search_with_quota(keyword, limit=ADHERENT_SEARCH_LIMIT):
+        """Rechercher des adhérents avec leur quota (index mémoire + lignes lues par clé primaire)"""
+        return Adherent._lire_avec_quota(Adherent.search(keyword, limit))
+    
+    @staticmethod
+    def _lire_avec_quota(resultats):
+        """
+        Lignes à jour (avec quota) des adhérents trouvés par l'index, dans
+        l'ordre du classement ; un adhérent supprimé entre-temps est omis
         """
-        search_term = f"%{keyword}%"
-        return db.fetch_all(query, (search_term, search_term, search_term))
+        if not resultats:
+            return []
+        
+        ids = [a['idAdherent'] for a in resultats]
+        placeholders = ', '.join(['%s'] * len(ids))
+        query = f"SELECT * FROM Adherent WHERE idAdherent IN ({placeholders})"
+        lignes = {row['idAdherent']: row for row in db.fetch_all(query, tuple(ids))}
+        return [Adherent._ajouter_quota(lignes[i]) for i in ids if i in lignes]
+    
+    @staticmethod
+    def get_page_with_quota(limit=50, after=None):
+        """Page d'adhérents avec quota : (lignes, curseur suivant)"""
+        rows, next_after = keyset_page(
+            Adherent._SELECT_PAGE, Adherent._ORDRE_PAGE,
+            limit=limit, after=after
+        )
+        return [Adherent._ajouter_quota(row) for row in rows], next_after
+    
+    @staticmethod
+    def search_page_with_quota(keyword, limit=50, after=None):
+        """
+        Page de résultats de recherche avec quota, dans l'ordre de
+        search_with_quota : (lignes, curseur suivant)
+        Le curseur porte la clé de classement du dernier résultat (score,
+        nom, prénom, idAdherent) : la page suivante reprend dans les
+        résultats classés en mémoire, seules les lignes de la page sont lues.
+        """
+        apres = decode_cursor(after, 4) if after else None
+        Adherent._index_a_jour()
+        resultats, dernier = Adherent._index.rechercher_page(
+            keyword, limit, apres, tri=Adherent._tri_recherche)
+        suivant = encode_cursor(dernier) if dernier else None
+        return Adherent._lire_avec_quota(resultats), suivant
+    
+    def _fiche(self):
+        return {name: getattr(self, name) for name in Adherent._COLONNES}
     
     def save(self):
         """Enregistrer un nouvel adhérent"""
@@ -46,10 +194,13 @@ class Adherent:
         params = (self.nom, self.prenom, self.email, self.telephone, 
                   self.typeAdherent, self.statut)
         
-        if db.execute_query(query, params):
-            self.idAdherent = db.get_last_insert_id()
-            return True
-        return False
+        with db.transaction() as tx:
+            if db.execute_query(query, params):
+                self.idAdherent = db.get_last_insert_id()
+                Statistiques.ajuster(adherentsActifs=1 if self.statut == 'ACTIF' else 0)
+        if tx.committed:
+            Adherent._index.ajouter(self.idAdherent, self._fiche())
+        return tx.committed
     
     def update(self):
         """Mettre à jour un adhérent existant"""
@@ -61,39 +212,130 @@ class Adherent:
         """
         params = (self.nom, self.prenom, self.email, self.telephone,
                   self.typeAdherent, self.statut, self.idAdherent)
-        return db.execute_query(query, params)
+        with db.transaction() as tx:
+            avant = db.fetch_one("SELECT statut FROM Adherent WHERE idAdherent = %s",
+                                 (self.idAdherent,))
+            if db.execute_query(query, params) and avant:
+                Statistiques.ajuster(adherentsActifs=(self.statut == 'ACTIF')
+                                     - (avant['statut'] == 'ACTIF'))
+        if tx.committed:
+            Adherent._index.ajouter(self.idAdherent, self._fiche())
+        return tx.committed
     
     @staticmethod
     def delete(idAdherent):
         """Supprimer un adhérent (si pas d'emprunts en cours)"""
-        # Vérifier d'abord s'il n'a pas d'emprunts en cours
-        check_query = """
-            SELECT COUNT(*) as count FROM Emprunt 
-            WHERE idAdherent = %s AND statut = 'EN_COURS'
+        with db.transaction() as tx:
+            # Ligne verrouillée et suppression conditionnelle : un emprunt
+            # enregistré entre la vérification et le DELETE l'empêche
+            adherent = Adherent.verrouiller(idAdherent)
+            if adherent and adherent['empruntsEnCours'] > 0:
+                print("✗ Impossible de supprimer : l'adhérent a des emprunts en cours")
+                tx.rollback_only()
+                return False
+            
+            query = "DELETE FROM Adherent WHERE idAdherent = %s AND empruntsEnCours = 0"
+            if db.execute_query(query, (idAdherent,)) and adherent and db.get_row_count() == 1:
+                Statistiques.ajuster(adherentsActifs=-1 if adherent['statut'] == 'ACTIF' else 0)
+            else:
+                tx.rollback_only()
+        if tx.committed:
+            Adherent._index.retirer(idAdherent)
+        return tx.committed
+    
+    @staticmethod
+    def get_emprunts_en_cours(idAdherent):
+        """Nombre d'emprunts en cours d'un adhérent (compteur maintenu)"""
+        query = "SELECT empruntsEnCours FROM Adherent WHERE idAdherent = %s"
+        result = db.fetch_one(query, (idAdherent,))
+        return result['empruntsEnCours'] if result else 0
+    
+    @staticmethod
+    def verrouiller(idAdherent):
+        """Lire un adhérent en verrouillant sa ligne jusqu'à la fin de la transaction"""
+        query = "SELECT * FROM Adherent WHERE idAdherent = %s FOR UPDATE"
+        return db.fetch_one(query, (idAdherent,))
+    
+    @staticmethod
+    def incrementer_emprunts(idAdherent, nombre=1):
+        """
+        Compter `nombre` emprunts de plus pour un adhérent ACTIF, sans dépasser son quota
+        Retourne False sinon (aucune ligne modifiée) : statut, quota selon le
+        type et mise à jour sont une seule instruction, qui verrouille la
+        ligne jusqu'à la fin de la transaction.
+        """
+        query = """
+            UPDATE Adherent
+            SET empruntsEnCours = empruntsEnCours + %s
+            WHERE idAdherent = %s AND statut = 'ACTIF'
+              AND empruntsEnCours + %s <= CASE typeAdherent WHEN 'ENSEIGNANT' THEN %s ELSE %s END
+        """
+        params = (nombre, idAdherent, nombre, QUOTA_ENSEIGNANT, QUOTA_ETUDIANT)
+        return db.execute_query(query, params) and db.get_row_count() == 1
+    
+    @staticmethod
+    def decrementer_emprunts(idAdherent):
+        """Compter un emprunt de moins (lors d'un retour)"""
+        query = """
+            UPDATE Adherent
+            SET empruntsEnCours = empruntsEnCours - 1
+            WHERE idAdherent = %s AND empruntsEnCours > 0
         """
-        result = db.fetch_one(check_query, (idAdherent,))
-        
-        if result and result['count'] > 0:
-            print("✗ Impossible de supprimer : l'adhérent a des emprunts en cours")
-            return False
-        
-        query = "DELETE FROM Adherent WHERE idAdherent = %s"
         return db.execute_query(query, (idAdherent,))
     
     @staticmethod
-    def get_emprunts_en_cours(idAdherent):
-        """Compter le nombre d'emprunts en cours d'un adhérent"""
+    def decrementer_emprunts_lot(nombres):
+        """
+        Compter moins d'emprunts pour plusieurs adhérents {idAdherent: nombre}, en une requête
+        Comme decrementer_emprunts, le compteur ne descend pas sous 0.
+        """
+        if not nombres:
+            return True
+        cas = 'CASE idAdherent ' + ' '.join(['WHEN %s THEN %s'] * len(nombres)) + ' END'
+        placeholders = ', '.join(['%s'] * len(nombres))
+        query = f"""
+            UPDATE Adherent
+            SET empruntsEnCours = CASE WHEN empruntsEnCours >= {cas}
+                                       THEN empruntsEnCours - {cas} ELSE 0 END
+            WHERE idAdherent IN ({placeholders})
+        """
+        paires = tuple(v for item in nombres.items() for v in item)
+        return db.execute_query(query, paires * 2 + tuple(nombres))
+    
+    @staticmethod
+    def recalculer_emprunts_en_cours(appliquer=True):
+        """
+        Reconstruire les compteurs depuis la table Emprunt
+        Retourne la liste des écarts trouvés (idAdherent, compteur, réel) ;
+        appliquer=False : rapport seul, sans correction.
+        """
         query = """
-            SELECT COUNT(*) as count 
-            FROM Emprunt 
-            WHERE idAdherent = %s AND statut = 'EN_COURS'
+            SELECT a.idAdherent, a.empruntsEnCours as compteur, COUNT(e.idEmprunt) as reel
+            FROM Adherent a
+            LEFT JOIN Emprunt e 
+                ON e.idAdherent = a.idAdherent AND e.statut = 'EN_COURS'
+            GROUP BY a.idAdherent, a.empruntsEnCours
+            HAVING a.empruntsEnCours <> COUNT(e.idEmprunt)
         """
-        result = db.fetch_one(query, (idAdherent,))
-        return result['count'] if result else 0
+        ecarts = db.fetch_all(query)
+        if appliquer and ecarts:
+            # Recompté dans l'UPDATE même, pour ne pas écraser un emprunt
+            # enregistré entre la lecture ci-dessus et la correction
+            ids = [row['idAdherent'] for row in ecarts]
+            placeholders = ', '.join(['%s'] * len(ids))
+            db.execute_query(f"""
+                UPDATE Adherent
+                SET empruntsEnCours = (
+                    SELECT COUNT(*) FROM Emprunt e
+                    WHERE e.idAdherent = Adherent.idAdherent AND e.statut = 'EN_COURS'
+                )
+                WHERE idAdherent IN ({placeholders})
+            """, tuple(ids))
+        return ecarts
     
     def get_quota_disponible(self):
         """Calculer le quota disponible"""
-        quota_max = 5 if self.typeAdherent == 'ENSEIGNANT' else 3
+        quota_max = self.get_quota_max(self.typeAdherent)
         emprunts_en_cours = self.get_emprunts_en_cours(self.idAdherent)
         return quota_max - emprunts_en_cours
     
@@ -1,14 +1,26 @@
 # models/emprunt.py
 from datetime import datetime, timedelta
-from database import db
+from database import db, keyset_page
 from config import DUREE_EMPRUNT_ETUDIANT, DUREE_EMPRUNT_ENSEIGNANT
+from .referentiel import Referentiel
+from .statistiques import Statistiques
 
 class Emprunt:
     """Classe représentant un emprunt"""
     
+    # Attributs dans l'ordre du constructeur (et des lignes lues par from_row) ;
+    # les derniers sont les libellés joints par get_all() (bibliothecaire
+    # vient du référentiel en mémoire)
+    __slots__ = ('idEmprunt', 'dateEmprunt', 'dateRetourPrevue',
+                 'dateRetourEffective', 'statut', 'idLivre', 'idAdherent',
+                 'idBibliothecaire', 'adherent', 'typeAdherent', 'titre',
+                 'auteur', 'bibliothecaire')
+    
     def __init__(self, idEmprunt=None, dateEmprunt=None, dateRetourPrevue=None,
                  dateRetourEffective=None, statut='EN_COURS', 
-                 idLivre=None, idAdherent=None, idBibliothecaire=None):
+                 idLivre=None, idAdherent=None, idBibliothecaire=None,
+                 adherent=None, typeAdherent=None, titre=None, auteur=None,
+                 bibliothecaire=None):
         self.idEmprunt = idEmprunt
         self.dateEmprunt = dateEmprunt or datetime.now()
         self.dateRetourPrevue = dateRetourPrevue
@@ -17,25 +29,67 @@ class Emprunt:
         self.idLivre = idLivre
         self.idAdherent = idAdherent
         self.idBibliothecaire = idBibliothecaire
+        self.adherent = adherent
+        self.typeAdherent = typeAdherent
+        self.titre = titre
+        self.auteur = auteur
+        self.bibliothecaire = bibliothecaire
+    
+    @classmethod
+    def from_row(cls, row):
+        """Construire un emprunt à partir d'un tuple ordonné comme __slots__"""
+        return cls(*row)
+    
+    def to_dict(self):
+        """Représentation sérialisable en JSON"""
+        return {name: getattr(self, name) for name in self.__slots__}
     
     @staticmethod
-    def get_all():
-        """Récupérer tous les emprunts avec détails"""
+    def _ajouter_bibliothecaire(emprunt):
+        """Nom du bibliothécaire depuis le référentiel en mémoire (dict ou objet)"""
+        if isinstance(emprunt, dict):
+            emprunt['bibliothecaire'] = Referentiel.nom_bibliothecaire(emprunt['idBibliothecaire'])
+        else:
+            emprunt.bibliothecaire = Referentiel.nom_bibliothecaire(emprunt.idBibliothecaire)
+        return emprunt
+    
+    @staticmethod
+    def get_all(objets=False):
+        """
+        Parcourir tous les emprunts avec détails (générateur)
+        objets=True : instances Emprunt hydratées depuis des tuples
+        """
+        if objets:
+            query = """
+                SELECT 
+                    e.idEmprunt, e.dateEmprunt, e.dateRetourPrevue,
+                    e.dateRetourEffective, e.statut, e.idLivre, e.idAdherent,
+                    e.idBibliothecaire,
+                    CONCAT(a.nom, ' ', a.prenom) as adherent,
+                    a.typeAdherent,
+                    l.titre,
+                    l.auteur
+                FROM Emprunt e
+                JOIN Adherent a ON e.idAdherent = a.idAdherent
+                JOIN Livre l ON e.idLivre = l.idLivre
+                ORDER BY e.dateEmprunt DESC
+            """
+            return (Emprunt._ajouter_bibliothecaire(Emprunt.from_row(row))
+                    for row in db.fetch_iter(query, as_tuples=True))
+        
         query = """
             SELECT 
                 e.*,
                 CONCAT(a.nom, ' ', a.prenom) as adherent,
                 a.typeAdherent,
                 l.titre,
-                l.auteur,
-                CONCAT(b.nom, ' ', b.prenom) as bibliothecaire
+                l.auteur
             FROM Emprunt e
             JOIN Adherent a ON e.idAdherent = a.idAdherent
             JOIN Livre l ON e.idLivre = l.idLivre
-            JOIN Bibliothecaire b ON e.idBibliothecaire = b.idBibliothecaire
             ORDER BY e.dateEmprunt DESC
         """
-        return db.fetch_all(query)
+        return map(Emprunt._ajouter_bibliothecaire, db.fetch_iter(query))
     
     @staticmethod
     def get_en_cours():
@@ -79,6 +133,9 @@ class Emprunt:
     @staticmethod
     def get_by_livre_isbn(isbn):
         """Trouver l'emprunt en cours pour un livre (par ISBN)"""
+        # Sous-requête sur l'ISBN : le livre est trouvé par idx_livre_isbn, puis
+        # son emprunt par idx_emprunt_livre_statut (plutôt que de parcourir
+        # tous les emprunts en cours)
         query = """
             SELECT 
                 e.*,
@@ -89,13 +146,68 @@ class Emprunt:
             FROM Emprunt e
             JOIN Adherent a ON e.idAdherent = a.idAdherent
             JOIN Livre l ON e.idLivre = l.idLivre
-            WHERE l.isbn = %s AND e.statut = 'EN_COURS'
+            WHERE e.idLivre IN (SELECT idLivre FROM Livre WHERE isbn = %s)
+              AND e.statut = 'EN_COURS'
         """
         return db.fetch_one(query, (isbn,))
     
     @staticmethod
-    def get_by_adherent(idAdherent):
-        """Récupérer les emprunts d'un adhérent"""
+    def get_en_cours_par_isbn(isbns):
+        """
+        Emprunts en cours des livres `isbns` (retours en lot), en une requête,
+        par ancienneté ; lignes d'emprunt verrouillées jusqu'à la fin de la
+        transaction (pas celles des livres : comme un retour simple, un lot
+        verrouille Emprunt, puis Adherent, puis Livre)
+        """
+        isbns = tuple(isbns)
+        if not isbns:
+            return []
+        placeholders = ', '.join(['%s'] * len(isbns))
+        query = f"""
+            SELECT e.idEmprunt, e.idLivre, e.idAdherent, e.dateRetourPrevue, l.isbn
+            FROM Livre l
+            JOIN Emprunt e ON e.idLivre = l.idLivre AND e.statut = 'EN_COURS'
+            WHERE l.isbn IN ({placeholders})
+            ORDER BY e.idEmprunt
+            FOR UPDATE OF e
+        """
+        return db.fetch_all(query, isbns)
+    
+    # Historique complet d'un adhérent : emprunts courants et archivés
+    # (services/archivage_service.py), mêmes colonnes des deux côtés ;
+    # `archive` indique d'où vient la ligne. Paramètres : (idAdherent, idAdherent)
+    _HISTORIQUE = """
+        SELECT 
+            e.idEmprunt, e.dateEmprunt, e.dateRetourPrevue, e.dateRetourEffective,
+            e.statut, e.idLivre, e.idAdherent, e.idBibliothecaire,
+            l.titre,
+            l.auteur,
+            0 as archive
+        FROM Emprunt e
+        JOIN Livre l ON e.idLivre = l.idLivre
+        WHERE e.idAdherent = %s
+        UNION ALL
+        SELECT 
+            ea.idEmprunt, ea.dateEmprunt, ea.dateRetourPrevue, ea.dateRetourEffective,
+            ea.statut, ea.idLivre, ea.idAdherent, ea.idBibliothecaire,
+            l.titre,
+            l.auteur,
+            1 as archive
+        FROM EmpruntArchive ea
+        LEFT JOIN Livre l ON ea.idLivre = l.idLivre
+        WHERE ea.idAdherent = %s
+    """
+    
+    @staticmethod
+    def get_by_adherent(idAdherent, archives=False):
+        """
+        Récupérer les emprunts d'un adhérent
+        archives=True : y ajouter ses emprunts archivés
+        """
+        if archives:
+            query = Emprunt._HISTORIQUE + " ORDER BY dateEmprunt DESC, idEmprunt DESC"
+            return db.fetch_all(query, (idAdherent, idAdherent))
+        
         query = """
             SELECT 
                 e.*,
@@ -108,6 +220,103 @@ class Emprunt:
         """
         return db.fetch_all(query, (idAdherent,))
     
+    # ------------------------------------------------------------
+    # Pagination (mêmes tris que les listes, départagés par idEmprunt)
+    # ------------------------------------------------------------
+    
+    @staticmethod
+    def get_page(limit=50, after=None):
+        """Page de tous les emprunts, plus récents d'abord : (lignes, curseur suivant)"""
+        select = """
+            SELECT 
+                e.*,
+                CONCAT(a.nom, ' ', a.prenom) as adherent,
+                a.typeAdherent,
+                l.titre,
+                l.auteur
+            FROM Emprunt e
+            JOIN Adherent a ON e.idAdherent = a.idAdherent
+            JOIN Livre l ON e.idLivre = l.idLivre
+        """
+        order_by = [('e.dateEmprunt', 'dateEmprunt', 'DESC'),
+                    ('e.idEmprunt', 'idEmprunt', 'DESC')]
+        rows, next_after = keyset_page(select, order_by, limit=limit, after=after)
+        return [Emprunt._ajouter_bibliothecaire(row) for row in rows], next_after
+    
+    @staticmethod
+    def get_en_cours_page(limit=50, after=None):
+        """Page des emprunts en cours, par date de retour prévue : (lignes, curseur suivant)"""
+        select = """
+            SELECT 
+                e.*,
+                CONCAT(a.nom, ' ', a.prenom) as adherent,
+                a.email,
+                l.titre,
+                l.auteur,
+                l.isbn
+            FROM Emprunt e
+            JOIN Adherent a ON e.idAdherent = a.idAdherent
+            JOIN Livre l ON e.idLivre = l.idLivre
+        """
+        order_by = [('e.dateRetourPrevue', 'dateRetourPrevue', 'ASC'),
+                    ('e.idEmprunt', 'idEmprunt', 'ASC')]
+        return keyset_page(select, order_by,
+                           where="e.statut IN ('EN_COURS', 'EN_RETARD')",
+                           limit=limit, after=after)
+    
+    @staticmethod
+    def get_en_retard_page(limit=50, after=None):
+        """
+        Page des emprunts en retard : (lignes, curseur suivant)
+        Le plus gros retard d'abord, c'est-à-dire la date de retour prévue la
+        plus ancienne (tri équivalent à joursRetard DESC, mais indexable).
+        """
+        select = """
+            SELECT 
+                e.*,
+                CONCAT(a.nom, ' ', a.prenom) as adherent,
+                a.email,
+                a.telephone,
+                l.titre,
+                l.auteur,
+                DATEDIFF(NOW(), e.dateRetourPrevue) as joursRetard
+            FROM Emprunt e
+            JOIN Adherent a ON e.idAdherent = a.idAdherent
+            JOIN Livre l ON e.idLivre = l.idLivre
+        """
+        order_by = [('e.dateRetourPrevue', 'dateRetourPrevue', 'ASC'),
+                    ('e.idEmprunt', 'idEmprunt', 'ASC')]
+        return keyset_page(select, order_by,
+                           where="e.statut = 'EN_COURS' AND e.dateRetourPrevue < NOW()",
+                           limit=limit, after=after)
+    
+    @staticmethod
+    def get_by_adherent_page(idAdherent, limit=50, after=None, archives=False):
+        """
+        Page de l'historique d'un adhérent : (lignes, curseur suivant)
+        archives=True : historique complet, emprunts archivés compris
+        """
+        if archives:
+            order_by = [('h.dateEmprunt', 'dateEmprunt', 'DESC'),
+                        ('h.idEmprunt', 'idEmprunt', 'DESC')]
+            return keyset_page(f"SELECT h.* FROM ({Emprunt._HISTORIQUE}) h", order_by,
+                               params=(idAdherent, idAdherent),
+                               limit=limit, after=after)
+        
+        select = """
+            SELECT 
+                e.*,
+                l.titre,
+                l.auteur
+            FROM Emprunt e
+            JOIN Livre l ON e.idLivre = l.idLivre
+        """
+        order_by = [('e.dateEmprunt', 'dateEmprunt', 'DESC'),
+                    ('e.idEmprunt', 'idEmprunt', 'DESC')]
+        return keyset_page(select, order_by, params=(idAdherent,),
+                           where="e.idAdherent = %s",
+                           limit=limit, after=after)
+    
     @staticmethod
     def calculer_date_retour(typeAdherent):
         """Calculer la date de retour selon le type d'adhérent"""
@@ -130,27 +339,97 @@ class Emprunt:
         
         if db.execute_query(query, params):
             self.idEmprunt = db.get_last_insert_id()
+            Statistiques.ajuster(empruntsTotal=1,
+                                 empruntsEnCours=1 if self.statut == 'EN_COURS' else 0)
             return True
         return False
     
+    @staticmethod
+    def save_all(emprunts):
+        """
+        Enregistrer les nouveaux emprunts d'un même adhérent, un livre chacun
+        (panier), en une requête multi-lignes
+        Un INSERT multi-lignes ne rend pas tous les identifiants : ils sont
+        relus ensuite (les plus récents de l'adhérent pour chaque livre ; la
+        ligne de l'adhérent doit être verrouillée par la transaction)
+        """
+        if not emprunts:
+            return True
+        query = """
+            INSERT INTO Emprunt (dateEmprunt, dateRetourPrevue, statut,
+                               idLivre, idAdherent, idBibliothecaire)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        if not db.execute_many(query, [(e.dateEmprunt, e.dateRetourPrevue, e.statut,
+                                        e.idLivre, e.idAdherent, e.idBibliothecaire)
+                                       for e in emprunts]):
+            return False
+        
+        ids_livres = tuple(e.idLivre for e in emprunts)
+        placeholders = ', '.join(['%s'] * len(ids_livres))
+        rows = db.fetch_all(f"""
+            SELECT idEmprunt, idLivre FROM Emprunt
+            WHERE idAdherent = %s AND statut = 'EN_COURS' AND idLivre IN ({placeholders})
+            ORDER BY idEmprunt
+        """, (emprunts[0].idAdherent,) + ids_livres)
+        ids = {row['idLivre']: row['idEmprunt'] for row in rows}
+        for emprunt in emprunts:
+            emprunt.idEmprunt = ids.get(emprunt.idLivre)
+        
+        Statistiques.ajuster(empruntsTotal=len(emprunts),
+                             empruntsEnCours=sum(e.statut == 'EN_COURS' for e in emprunts))
+        return True
+    
     @staticmethod
     def retourner(idEmprunt):
-        """Marquer un emprunt comme retourné"""
+        """Marquer un emprunt en cours comme retourné (False s'il ne l'était plus)"""
         query = """
             UPDATE Emprunt 
             SET dateRetourEffective = NOW(), statut = 'RETOURNE'
-            WHERE idEmprunt = %s
+            WHERE idEmprunt = %s AND statut = 'EN_COURS'
         """
-        return db.execute_query(query, (idEmprunt,))
+        ok = db.execute_query(query, (idEmprunt,)) and db.get_row_count() == 1
+        if ok:
+            Statistiques.ajuster(empruntsEnCours=-1, empruntsRetournes=1)
+        return ok
+    
+    @staticmethod
+    def retourner_lot(ids):
+        """
+        Marquer des emprunts en cours comme retournés, en une requête
+        Retourne False si l'un d'eux ne l'était plus
+        """
+        ids = tuple(ids)
+        placeholders = ', '.join(['%s'] * len(ids))
+        query = f"""
+            UPDATE Emprunt 
+            SET dateRetourEffective = NOW(), statut = 'RETOURNE'
+            WHERE idEmprunt IN ({placeholders}) AND statut = 'EN_COURS'
+        """
+        ok = db.execute_query(query, ids) and db.get_row_count() == len(ids)
+        if ok:
+            Statistiques.ajuster(empruntsEnCours=-len(ids), empruntsRetournes=len(ids))
+        return ok
+    
+    @staticmethod
+    def est_en_retard(dateRetourPrevue, maintenant=None):
+        """
+        Emprunt compté dans empruntsEnRetard (dateRetourPrevue < maintenant,
+        comme le recalcul des statistiques), même s'il a moins d'un jour de retard
+        """
+        if isinstance(dateRetourPrevue, str):
+            dateRetourPrevue = datetime.strptime(dateRetourPrevue, '%Y-%m-%d %H:%M:%S')
+        return dateRetourPrevue < (maintenant or datetime.now())
     
     @staticmethod
-    def calculer_retard(dateRetourPrevue):
-        """Calculer le nombre de jours de retard"""
+    def calculer_retard(dateRetourPrevue, maintenant=None):
+        """Calculer le nombre de jours de retard (à `maintenant`, par défaut l'heure courante)"""
         if isinstance(dateRetourPrevue, str):
             dateRetourPrevue = datetime.strptime(dateRetourPrevue, '%Y-%m-%d %H:%M:%S')
         
-        if dateRetourPrevue < datetime.now():
-            return (datetime.now() - dateRetourPrevue).days
+        maintenant = maintenant or datetime.now()
+        if dateRetourPrevue < maintenant:
+            return (maintenant - dateRetourPrevue).days
         return 0
     
     @staticmethod
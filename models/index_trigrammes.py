@@ -0,0 +1,136 @@
+# models/index_trigrammes.py
+"""
+Index de recherche approchée en mémoire (trigrammes)
+Chaque mot est découpé en séquences de trois caractères (« dupont » →
+«   d », « du », « dup », « upo », « pon », « ont », « nt »). Une recherche
+retient les documents qui partagent assez de trigrammes avec la saisie, ce
+qui tolère les fautes de frappe et les saisies partielles, sans requête SQL.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+_RE_SEPARATEURS = re.compile(r'[^a-z0-9]+')
+
+
+def normaliser(texte):
+    """Minuscules sans accents, mots séparés par une espace"""
+    texte = unicodedata.normalize('NFKD', str(texte or '').lower())
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return _RE_SEPARATEURS.sub(' ', texte).strip()
+
+
+def trigrammes(texte):
+    """Ensemble des trigrammes d'un texte normalisé (mots bornés par des espaces)"""
+    grams = set()
+    for mot in texte.split():
+        mot = f"  {mot} "
+        grams.update(mot[i:i + 3] for i in range(len(mot) - 2))
+    return grams
+
+
+class IndexTrigrammes:
+    """
+    Index trigrammes → identifiants, protégé par un verrou
+    Les documents sont des dicts ; `champs` désigne les clés indexées.
+    """
+
+    def __init__(self, champs, seuil=0.3):
+        self.champs = champs
+        self.seuil = seuil  # part minimale des trigrammes de la saisie retrouvés
+        self._postings = {}
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _texte(self, document):
+        return normaliser(' '.join(str(document.get(c) or '') for c in self.champs))
+
+    def reconstruire(self, documents, cle):
+        """Remplacer tout le contenu de l'index (index construit à part puis échangé)"""
+        postings, docs = {}, {}
+        for document in documents:
+            texte = self._texte(document)
+            grams = trigrammes(texte)
+            docs[document[cle]] = (dict(document), texte)
+            for gram in grams:
+                postings.setdefault(gram, set()).add(document[cle])
+        with self._lock:
+            self._postings, self._documents = postings, docs
+
+    def ajouter(self, id_document, document):
+        """Indexer (ou réindexer) un document"""
+        texte = self._texte(document)
+        with self._lock:
+            self._retirer(id_document)
+            self._documents[id_document] = (dict(document), texte)
+            for gram in trigrammes(texte):
+                self._postings.setdefault(gram, set()).add(id_document)
+
+    def retirer(self, id_document):
+        with self._lock:
+            self._retirer(id_document)
+
+    def _retirer(self, id_document):
+        entree = self._documents.pop(id_document, None)
+        if entree is None:
+            return
+        for gram in trigrammes(entree[1]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(id_document)
+                if not ids:
+                    del self._postings[gram]
+
+    def rechercher(self, saisie, limite=50, tri=None):
+        """
+        Documents correspondant à la saisie, les plus proches d'abord
+        Score = part des trigrammes de la saisie présents dans le document,
+        +1 si la saisie apparaît telle quelle (sans accents) dans le document.
+        `tri` départage les scores égaux (ex. nom puis prénom), puis l'identifiant.
+        """
+        return self.rechercher_page(saisie, limite, tri=tri)[0]
+
+    def rechercher_page(self, saisie, limite=50, apres=None, tri=None):
+        """
+        Page de documents classés comme rechercher(), reprise après `apres`
+        Chaque document a une clé de classement (-score, *tri(document),
+        identifiant), unique ; `apres` est celle du dernier document de la
+        page précédente. Seuls les `limite` premiers candidats sont triés.
+        Retourne (documents, clé du dernier document ou None s'il n'y a pas de suite).
+        """
+        saisie = normaliser(saisie)
+        grams = trigrammes(saisie)
+        if not grams:
+            return [], None
+
+        with self._lock:
+            communs = Counter()
+            for gram in grams:
+                communs.update(self._postings.get(gram, ()))
+            minimum = self.seuil * len(grams)
+            candidats = []
+            for id_document, n in communs.items():
+                if n < minimum:
+                    continue
+                document, texte = self._documents[id_document]
+                score = n / len(grams) + (1 if saisie in texte else 0)
+                cle = (-score, *(tri(document) if tri else ()), id_document)
+                candidats.append((cle, document))
+
+        if apres is not None:
+            apres = tuple(apres)
+            candidats = [c for c in candidats if c[0] > apres]
+        if limite is None:
+            page = sorted(candidats, key=lambda c: c[0])
+        else:
+            page = heapq.nsmallest(limite + 1, candidats, key=lambda c: c[0])
+        suite = None
+        if limite is not None and len(page) > limite:
+            page = page[:limite]
+            suite = page[-1][0]
+        return [dict(document) for _, document in page], suite
@@ -1,11 +1,28 @@
 # models/livre.py
-from database import db
+import re
+from config import (LIVRE_SEARCH_FULLTEXT, LIVRE_SEARCH_LIMIT,
+                    LIVRE_CACHE_SIZE, LIVRE_CACHE_TTL)
+from database import db, keyset_page, LRUCache
+from database.backends import backend
+from .referentiel import Referentiel
+from .statistiques import Statistiques
+
+# ISBN-10/13 saisi avec ou sans tirets
+_RE_ISBN = re.compile(r'^\d[\d-]{8,15}[\dXx]$')
+_RE_MOT = re.compile(r'\w+')
+# innodb_ft_min_token_size : les mots plus courts ne sont pas indexés
+_MOT_MIN_FULLTEXT = 3
 
 class Livre:
     """Classe représentant un livre"""
     
+    # Attributs dans l'ordre du constructeur (et des lignes lues par from_row)
+    __slots__ = ('idLivre', 'isbn', 'titre', 'auteur', 'nombreExemplaires',
+                 'nombreDisponibles', 'idCategorie', 'nomCategorie')
+    
     def __init__(self, idLivre=None, isbn='', titre='', auteur='', 
-                 nombreExemplaires=1, nombreDisponibles=1, idCategorie=None):
+                 nombreExemplaires=1, nombreDisponibles=1, idCategorie=None,
+                 nomCategorie=None):
         self.idLivre = idLivre
         self.isbn = isbn
         self.titre = titre
@@ -13,64 +30,206 @@ class Livre:
         self.nombreExemplaires = nombreExemplaires
         self.nombreDisponibles = nombreDisponibles
         self.idCategorie = idCategorie
+        self.nomCategorie = nomCategorie
+    
+    # Pagination : même tri que les listes, départagé par la clé primaire.
+    # Aucune lecture ne joint Categorie : nomCategorie est ajouté depuis le
+    # référentiel en mémoire (Referentiel.enrichir_livre)
+    _SELECT_PAGE = """
+        SELECT l.*
+        FROM Livre l
+    """
+    _ORDRE_PAGE = [('l.titre', 'titre', 'ASC'), ('l.idLivre', 'idLivre', 'ASC')]
+    
+    # Lectures par id / ISBN : entrées étiquetées par idLivre, invalidées par
+    # update, delete et les changements de disponibilité
+    _cache = LRUCache(maxsize=LIVRE_CACHE_SIZE, ttl=LIVRE_CACHE_TTL)
+    
+    @classmethod
+    def from_row(cls, row):
+        """Construire un livre à partir d'un tuple ordonné comme __slots__ (nomCategorie facultatif)"""
+        return cls(*row)
+    
+    def to_dict(self):
+        """Représentation sérialisable en JSON"""
+        return {name: getattr(self, name) for name in self.__slots__}
     
     @staticmethod
-    def get_all():
-        """Récupérer tous les livres avec leur catégorie"""
+    def get_all(objets=False):
+        """
+        Parcourir tous les livres avec leur catégorie (générateur)
+        objets=True : instances Livre hydratées depuis des tuples
+        """
+        if objets:
+            query = """
+                SELECT idLivre, isbn, titre, auteur, nombreExemplaires,
+                       nombreDisponibles, idCategorie
+                FROM Livre
+                ORDER BY titre
+            """
+            return (Referentiel.enrichir_livre(Livre.from_row(row))
+                    for row in db.fetch_iter(query, as_tuples=True))
+        
         query = """
-            SELECT l.*, c.nomCategorie 
+            SELECT l.*
             FROM Livre l
-            JOIN Categorie c ON l.idCategorie = c.idCategorie
             ORDER BY l.titre
         """
-        return db.fetch_all(query)
+        return map(Referentiel.enrichir_livre, db.fetch_iter(query))
+    
+    @staticmethod
+    def get_page(limit=50, after=None):
+        """Page de livres triés par titre : (lignes, curseur suivant)"""
+        return Livre._page(limit=limit, after=after)
+    
+    @staticmethod
+    def _page(**kwargs):
+        rows, next_after = keyset_page(Livre._SELECT_PAGE, Livre._ORDRE_PAGE, **kwargs)
+        return [Referentiel.enrichir_livre(row) for row in rows], next_after
+    
+    @staticmethod
+    def _lire(cle, query, params):
+        """
+        Lecture d'un livre à travers le cache
+        Dans une transaction, la ligne peut refléter des écritures non
+        validées : elle est lue sans être mise en cache. Une ligne mise en
+        cache est lue sur le primaire : un réplica en retard y remettrait,
+        pour LIVRE_CACHE_TTL secondes, la version d'avant une écriture. Pour
+        la même raison, une ligne dont le livre a été invalidé pendant la
+        lecture n'est pas rangée (génération notée avant la lecture).
+        """
+        row = Livre._cache.get(cle)
+        if row is not None:
+            return Referentiel.enrichir_livre(dict(row))
+        generation = Livre._cache.generation()
+        row = db.fetch_one(query, params, primary=True)
+        if row is not None and not db.in_transaction():
+            # Rangé sous ses deux clés : un retour lit par ISBN puis par id
+            Livre._cache.put(('id', row['idLivre']), dict(row), tag=row['idLivre'],
+                             generation=generation)
+            if row['isbn']:
+                Livre._cache.put(('isbn', row['isbn']), dict(row), tag=row['idLivre'],
+                                 generation=generation)
+        return Referentiel.enrichir_livre(row)
+    
+    @staticmethod
+    def _invalider(idLivre):
+        """Oublier un livre, maintenant et à la validation de la transaction en cours"""
+        Livre._cache.invalidate_tag(idLivre)
+        db.after_commit(lambda: Livre._cache.invalidate_tag(idLivre))
+    
+    @staticmethod
+    def cache_stats(reset=False):
+        """Compteurs du cache des lectures par id / ISBN (reset=True : les remettre à zéro)"""
+        stats = Livre._cache.stats()
+        if reset:
+            Livre._cache.reset_stats()
+        return stats
     
     @staticmethod
     def get_by_id(idLivre):
         """Récupérer un livre par son ID"""
         query = """
-            SELECT l.*, c.nomCategorie 
+            SELECT l.*
             FROM Livre l
-            JOIN Categorie c ON l.idCategorie = c.idCategorie
             WHERE l.idLivre = %s
         """
-        return db.fetch_one(query, (idLivre,))
+        return Livre._lire(('id', idLivre), query, (idLivre,))
     
     @staticmethod
     def get_by_isbn(isbn):
         """Récupérer un livre par son ISBN"""
         query = """
-            SELECT l.*, c.nomCategorie 
+            SELECT l.*
             FROM Livre l
-            JOIN Categorie c ON l.idCategorie = c.idCategorie
             WHERE l.isbn = %s
         """
-        return db.fetch_one(query, (isbn,))
+        return Livre._lire(('isbn', isbn), query, (isbn,))
     
     @staticmethod
-    def search(keyword):
-        """Rechercher des livres par titre, auteur ou ISBN"""
-        query = """
-            SELECT l.*, c.nomCategorie 
-            FROM Livre l
-            JOIN Categorie c ON l.idCategorie = c.idCategorie
-            WHERE l.titre LIKE %s OR l.auteur LIKE %s OR l.isbn LIKE %s
-            ORDER BY l.titre
+    def _critere_recherche(keyword):
         """
+        Condition WHERE d'une recherche catalogue : (condition, paramètres, plein texte ?)
+        - ISBN (chiffres, tirets, X final) : égalité ou préfixe, sur l'index isbn
+        - MySQL : MATCH(titre, auteur) sur l'index FULLTEXT, chaque mot étant
+          exigé et complété en préfixe (« mise » trouve « misérables »)
+        - sinon, ou si aucun mot n'est assez long pour l'index : LIKE
+        """
+        keyword = keyword.strip()
+        if _RE_ISBN.match(keyword):
+            compact = keyword.replace('-', '').upper()
+            return ("l.isbn IN (%s, %s) OR l.isbn LIKE %s",
+                    (keyword, compact, keyword + '%'), False)
+        
+        mots = [m for m in _RE_MOT.findall(keyword) if len(m) >= _MOT_MIN_FULLTEXT]
+        if mots and LIVRE_SEARCH_FULLTEXT and backend.supports_fulltext:
+            booleen = ' '.join(f'+{m}*' for m in mots)
+            return ("MATCH(l.titre, l.auteur) AGAINST (%s IN BOOLEAN MODE)",
+                    (booleen,), True)
+        
         search_term = f"%{keyword}%"
-        return db.fetch_all(query, (search_term, search_term, search_term))
+        return ("l.titre LIKE %s OR l.auteur LIKE %s OR l.isbn LIKE %s",
+                (search_term, search_term, search_term), False)
+    
+    @staticmethod
+    def search(keyword, limit=LIVRE_SEARCH_LIMIT):
+        """Rechercher des livres par titre, auteur ou ISBN (les plus pertinents d'abord)"""
+        keyword = keyword.strip()
+        if _RE_ISBN.match(keyword):
+            # Lecture exacte d'abord : un code-barres désigne un seul livre
+            compact = keyword.replace('-', '').upper()
+            query = """
+                SELECT l.*
+                FROM Livre l
+                WHERE l.isbn IN (%s, %s)
+            """
+            rows = db.fetch_all(query, (keyword, compact))
+            if rows:
+                return [Referentiel.enrichir_livre(row) for row in rows]
+        
+        condition, params, fulltext = Livre._critere_recherche(keyword)
+        if fulltext:
+            query = f"""
+                SELECT l.*,
+                       MATCH(l.titre, l.auteur) AGAINST (%s IN BOOLEAN MODE) as pertinence
+                FROM Livre l
+                WHERE {condition}
+                ORDER BY pertinence DESC, l.titre
+                LIMIT %s
+            """
+            params = params + params
+        else:
+            query = f"""
+                SELECT l.*
+                FROM Livre l
+                WHERE {condition}
+                ORDER BY l.titre
+                LIMIT %s
+            """
+        rows = db.fetch_all(query, params + (limit,))
+        return [Referentiel.enrichir_livre(row) for row in rows]
+    
+    @staticmethod
+    def search_page(keyword, limit=50, after=None):
+        """Page de résultats de recherche, par titre : (lignes, curseur suivant)"""
+        condition, params, _ = Livre._critere_recherche(keyword)
+        return Livre._page(params=params, where=condition, limit=limit, after=after)
     
     @staticmethod
     def get_disponibles():
         """Récupérer les livres disponibles"""
         query = """
-            SELECT l.*, c.nomCategorie 
+            SELECT l.*
             FROM Livre l
-            JOIN Categorie c ON l.idCategorie = c.idCategorie
             WHERE l.nombreDisponibles > 0
             ORDER BY l.titre
         """
-        return db.fetch_all(query)
+        return [Referentiel.enrichir_livre(row) for row in db.fetch_all(query)]
+    
+    @staticmethod
+    def get_disponibles_page(limit=50, after=None):
+        """Page de livres disponibles : (lignes, curseur suivant)"""
+        return Livre._page(where="l.nombreDisponibles > 0", limit=limit, after=after)
     
     def save(self):
         """Enregistrer un nouveau livre"""
@@ -82,10 +241,11 @@ class Livre:
         params = (self.isbn, self.titre, self.auteur, self.nombreExemplaires,
                   self.nombreDisponibles, self.idCategorie)
         
-        if db.execute_query(query, params):
-            self.idLivre = db.get_last_insert_id()
-            return True
-        return False
+        with db.transaction() as tx:
+            if db.execute_query(query, params):
+                self.idLivre = db.get_last_insert_id()
+                Statistiques.ajuster(livresDisponibles=self.nombreDisponibles)
+        return tx.committed
     
     def update(self):
         """Mettre à jour un livre existant"""
@@ -97,15 +257,23 @@ class Livre:
         """
         params = (self.isbn, self.titre, self.auteur, self.nombreExemplaires,
                   self.nombreDisponibles, self.idCategorie, self.idLivre)
-        return db.execute_query(query, params)
+        with db.transaction() as tx:
+            avant = db.fetch_one("SELECT nombreDisponibles FROM Livre WHERE idLivre = %s",
+                                 (self.idLivre,))
+            if db.execute_query(query, params) and avant:
+                Statistiques.ajuster(
+                    livresDisponibles=self.nombreDisponibles - avant['nombreDisponibles'])
+        Livre._invalider(self.idLivre)
+        return tx.committed
     
     @staticmethod
     def delete(idLivre):
         """Supprimer un livre (si pas d'emprunts en cours)"""
-        # Vérifier d'abord s'il n'y a pas d'emprunts en cours
+        # Vérifier d'abord s'il n'y a pas d'emprunts en cours : les exemplaires
+        # sortis sont déjà comptés par nombreDisponibles (lecture par clé primaire)
         check_query = """
-            SELECT COUNT(*) as count FROM Emprunt 
-            WHERE idLivre = %s AND statut = 'EN_COURS'
+            SELECT nombreExemplaires - nombreDisponibles as count, nombreDisponibles
+            FROM Livre WHERE idLivre = %s
         """
         result = db.fetch_one(check_query, (idLivre,))
         
@@ -114,17 +282,68 @@ class Livre:
             return False
         
         query = "DELETE FROM Livre WHERE idLivre = %s"
-        return db.execute_query(query, (idLivre,))
+        with db.transaction() as tx:
+            if db.execute_query(query, (idLivre,)) and result and db.get_row_count():
+                Statistiques.ajuster(livresDisponibles=-result['nombreDisponibles'])
+        Livre._invalider(idLivre)
+        return tx.committed
     
     @staticmethod
     def decrementer_disponibilite(idLivre):
-        """Décrémenter le nombre de livres disponibles (lors d'un emprunt)"""
+        """
+        Décrémenter le nombre de livres disponibles (lors d'un emprunt)
+        Retourne False si aucun exemplaire n'était disponible
+        """
         query = """
             UPDATE Livre 
             SET nombreDisponibles = nombreDisponibles - 1 
             WHERE idLivre = %s AND nombreDisponibles > 0
         """
-        return db.execute_query(query, (idLivre,))
+        ok = db.execute_query(query, (idLivre,)) and db.get_row_count() == 1
+        if ok:
+            Statistiques.ajuster(livresDisponibles=-1)
+        Livre._invalider(idLivre)
+        return ok
+    
+    @staticmethod
+    def verrouiller(ids):
+        """
+        {idLivre: ligne} des livres demandés, lignes verrouillées jusqu'à la
+        fin de la transaction (dans l'ordre des id : deux paniers qui
+        partagent des livres les verrouillent dans le même ordre)
+        """
+        ids = tuple(ids)
+        if not ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(ids))
+        query = f"""
+            SELECT idLivre, isbn, titre, nombreDisponibles
+            FROM Livre
+            WHERE idLivre IN ({placeholders})
+            ORDER BY idLivre
+            FOR UPDATE
+        """
+        return {row['idLivre']: row for row in db.fetch_all(query, ids)}
+    
+    @staticmethod
+    def decrementer_disponibilites(ids):
+        """
+        Décrémenter d'un exemplaire chacun des livres `ids` (id distincts)
+        Retourne False si l'un d'eux n'avait plus d'exemplaire disponible
+        """
+        ids = tuple(ids)
+        placeholders = ', '.join(['%s'] * len(ids))
+        query = f"""
+            UPDATE Livre 
+            SET nombreDisponibles = nombreDisponibles - 1 
+            WHERE idLivre IN ({placeholders}) AND nombreDisponibles > 0
+        """
+        ok = db.execute_query(query, ids) and db.get_row_count() == len(ids)
+        if ok:
+            Statistiques.ajuster(livresDisponibles=-len(ids))
+        for idLivre in ids:
+            Livre._invalider(idLivre)
+        return ok
     
     @staticmethod
     def incrementer_disponibilite(idLivre):
@@ -134,7 +353,31 @@ class Livre:
             SET nombreDisponibles = nombreDisponibles + 1 
             WHERE idLivre = %s
         """
-        return db.execute_query(query, (idLivre,))
+        ok = db.execute_query(query, (idLivre,)) and db.get_row_count() == 1
+        if ok:
+            Statistiques.ajuster(livresDisponibles=1)
+        Livre._invalider(idLivre)
+        return ok
+    
+    @staticmethod
+    def incrementer_disponibilites(nombres):
+        """Rendre des exemplaires à plusieurs livres {idLivre: nombre}, en une requête"""
+        if not nombres:
+            return True
+        cas = ' '.join(['WHEN %s THEN %s'] * len(nombres))
+        placeholders = ', '.join(['%s'] * len(nombres))
+        query = f"""
+            UPDATE Livre 
+            SET nombreDisponibles = nombreDisponibles + CASE idLivre {cas} END
+            WHERE idLivre IN ({placeholders})
+        """
+        params = tuple(v for item in nombres.items() for v in item) + tuple(nombres)
+        ok = db.execute_query(query, params) and db.get_row_count() == len(nombres)
+        if ok:
+            Statistiques.ajuster(livresDisponibles=sum(nombres.values()))
+        for idLivre in nombres:
+            Livre._invalider(idLivre)
+        return ok
     
     def est_disponible(self):
         """Vérifier si le livre est disponible"""
@@ -0,0 +1,105 @@
+# models/penalite.py
+from database import db, keyset_page
+from .statistiques import Statistiques
+
+class Penalite:
+    """Pénalités de retard"""
+
+    _SELECT = """
+        SELECT
+            p.*,
+            CONCAT(a.nom, ' ', a.prenom) as adherent,
+            l.titre as livre
+        FROM Penalite p
+        JOIN Emprunt e ON p.idEmprunt = e.idEmprunt
+        JOIN Adherent a ON e.idAdherent = a.idAdherent
+        JOIN Livre l ON e.idLivre = l.idLivre
+    """
+    # Plus récentes d'abord, départagées par la clé primaire
+    _ORDRE_PAGE = [('p.dateCreation', 'dateCreation', 'DESC'),
+                   ('p.idPenalite', 'idPenalite', 'DESC')]
+
+    @staticmethod
+    def get_all():
+        """Récupérer toutes les pénalités"""
+        query = Penalite._SELECT + " ORDER BY p.dateCreation DESC"
+        return db.fetch_all(query)
+
+    @staticmethod
+    def get_by_id(idPenalite):
+        """Récupérer une pénalité par son ID"""
+        query = Penalite._SELECT + " WHERE p.idPenalite = %s"
+        return db.fetch_one(query, (idPenalite,))
+
+    @staticmethod
+    def get_impayees():
+        """Récupérer les pénalités impayées"""
+        query = Penalite._SELECT + """
+            WHERE p.statut = 'IMPAYEE'
+            ORDER BY p.dateCreation DESC
+        """
+        return db.fetch_all(query)
+
+    @staticmethod
+    def get_page(limit=50, after=None):
+        """Page de pénalités : (lignes, curseur suivant)"""
+        return keyset_page(Penalite._SELECT, Penalite._ORDRE_PAGE,
+                           limit=limit, after=after)
+
+    @staticmethod
+    def get_impayees_page(limit=50, after=None):
+        """Page de pénalités impayées : (lignes, curseur suivant)"""
+        return keyset_page(Penalite._SELECT, Penalite._ORDRE_PAGE,
+                           where="p.statut = 'IMPAYEE'",
+                           limit=limit, after=after)
+
+    @staticmethod
+    def creer(idEmprunt, montant, motif):
+        """Enregistrer une pénalité impayée"""
+        query = """
+            INSERT INTO Penalite (montant, motif, idEmprunt)
+            VALUES (%s, %s, %s)
+        """
+        if db.execute_query(query, (montant, motif, idEmprunt)):
+            Statistiques.ajuster(penalitesImpayees=montant)
+            return True
+        return False
+
+    @staticmethod
+    def creer_lot(penalites):
+        """Enregistrer des pénalités impayées [(idEmprunt, montant, motif)] en une requête"""
+        penalites = list(penalites)
+        query = """
+            INSERT INTO Penalite (montant, motif, idEmprunt)
+            VALUES (%s, %s, %s)
+        """
+        if db.execute_many(query, [(montant, motif, idEmprunt)
+                                   for idEmprunt, montant, motif in penalites]):
+            Statistiques.ajuster(penalitesImpayees=sum(p[1] for p in penalites))
+            return True
+        return False
+
+    @staticmethod
+    def payer(idPenalite):
+        """
+        Marquer une pénalité comme payée
+        Seul l'UPDATE qui fait passer la pénalité de IMPAYEE à PAYEE retire
+        son montant du compteur : un double paiement (ou deux guichets en
+        même temps) ne le décompte qu'une fois.
+        Retourne False si la pénalité n'était pas (ou plus) impayée.
+        """
+        with db.transaction() as tx:
+            penalite = db.fetch_one(
+                "SELECT montant FROM Penalite WHERE idPenalite = %s AND statut = 'IMPAYEE'",
+                (idPenalite,)
+            )
+            query = """
+                UPDATE Penalite SET statut = 'PAYEE'
+                WHERE idPenalite = %s AND statut = 'IMPAYEE'
+            """
+            payee = db.execute_query(query, (idPenalite,)) and db.get_row_count() == 1
+            if not payee:
+                tx.rollback_only()
+            elif penalite:
+                Statistiques.ajuster(penalitesImpayees=-penalite['montant'])
+        return tx.committed and payee
@@ -0,0 +1,132 @@
+# models/referentiel.py
+import threading
+import time
+from database import db
+from config import REFERENTIEL_REFRESH
+
+
+class Referentiel:
+    """
+    Données de référence gardées en mémoire : catégories et bibliothécaires
+    Ces tables ne changent presque jamais mais sont lues à chaque requête :
+    elles sont chargées au démarrage, rechargées après une modification
+    (invalider()) ou toutes les REFERENTIEL_REFRESH secondes, et lorsqu'un
+    identifiant inconnu est demandé (ligne créée par un autre processus).
+    """
+
+    _categories = {}
+    _bibliothecaires = {}
+    _charge_a = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def charger():
+        """(Re)lire les deux tables"""
+        categories = db.fetch_all("SELECT * FROM Categorie")
+        # Jamais le mot de passe : ces lignes sont renvoyées telles quelles
+        bibliothecaires = db.fetch_all(
+            "SELECT idBibliothecaire, nom, prenom, login FROM Bibliothecaire"
+        )
+        with Referentiel._lock:
+            Referentiel._categories = {c['idCategorie']: c for c in categories}
+            Referentiel._bibliothecaires = {b['idBibliothecaire']: b for b in bibliothecaires}
+            Referentiel._charge_a = time.monotonic()
+
+    @staticmethod
+    def invalider():
+        """Forcer un rechargement à la prochaine lecture (après une écriture)"""
+        Referentiel._charge_a = None
+        db.after_commit(Referentiel._oublier)
+
+    @staticmethod
+    def _oublier():
+        Referentiel._charge_a = None
+
+    @staticmethod
+    def _a_jour():
+        charge_a = Referentiel._charge_a
+        if charge_a is None or time.monotonic() - charge_a > REFERENTIEL_REFRESH:
+            Referentiel.charger()
+
+    @staticmethod
+    def _lire(table, identifiant):
+        """Ligne d'une des tables, en rechargeant une fois si l'id est inconnu"""
+        Referentiel._a_jour()
+        ligne = getattr(Referentiel, table).get(identifiant)
+        if ligne is None and identifiant is not None:
+            Referentiel.charger()
+            ligne = getattr(Referentiel, table).get(identifiant)
+        return ligne
+
+    # ------------------------------------------------------------
+    # Catégories
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def get_categories():
+        """Toutes les catégories, triées par nom"""
+        Referentiel._a_jour()
+        categories = sorted(Referentiel._categories.values(),
+                            key=lambda c: c['nomCategorie'])
+        return [dict(c) for c in categories]
+
+    @staticmethod
+    def nom_categorie(idCategorie):
+        categorie = Referentiel._lire('_categories', idCategorie)
+        return categorie['nomCategorie'] if categorie else None
+
+    @staticmethod
+    def id_categorie(nomCategorie, creer=False):
+        """
+        Identifiant d'une catégorie d'après son nom (casse et espaces ignorés)
+        creer=True : la catégorie absente est créée (import de catalogue)
+        """
+        nom = ' '.join(nomCategorie.split())
+        Referentiel._a_jour()
+        idCategorie = Referentiel._chercher_categorie(nom)
+        if idCategorie is not None or not creer:
+            return idCategorie
+
+        if db.execute_query("INSERT INTO Categorie (nomCategorie) VALUES (%s)", (nom,)):
+            Referentiel.invalider()
+            return db.get_last_insert_id()
+        # Créée entre-temps par un autre processus (nomCategorie est unique)
+        Referentiel.charger()
+        return Referentiel._chercher_categorie(nom)
+
+    @staticmethod
+    def _chercher_categorie(nom):
+        cle = nom.lower()
+        for categorie in Referentiel._categories.values():
+            if categorie['nomCategorie'].lower() == cle:
+                return categorie['idCategorie']
+        return None
+
+    @staticmethod
+    def enrichir_livre(livre):
+        """Compléter une ligne Livre (dict) ou un objet Livre avec nomCategorie"""
+        if livre is None:
+            return None
+        if isinstance(livre, dict):
+            livre['nomCategorie'] = Referentiel.nom_categorie(livre['idCategorie'])
+        else:
+            livre.nomCategorie = Referentiel.nom_categorie(livre.idCategorie)
+        return livre
+
+    # ------------------------------------------------------------
+    # Bibliothécaires
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def get_bibliothecaire(idBibliothecaire):
+        """Bibliothécaire (sans mot de passe) ou None"""
+        bibliothecaire = Referentiel._lire('_bibliothecaires', idBibliothecaire)
+        return dict(bibliothecaire) if bibliothecaire else None
+
+    @staticmethod
+    def nom_bibliothecaire(idBibliothecaire):
+        """Nom affiché : « nom prénom »"""
+        bibliothecaire = Referentiel._lire('_bibliothecaires', idBibliothecaire)
+        if not bibliothecaire:
+            return None
+        return f"{bibliothecaire['nom']} {bibliothecaire['prenom']}"
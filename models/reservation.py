@@ -0,0 +1,254 @@
+# models/reservation.py
+import threading
+import time
+from collections import OrderedDict
+from database import db
+from config import RESERVATION_INDEX_REFRESH
+
+
+class Reservation:
+    """
+    Réservations d'un livre dont aucun exemplaire n'est disponible
+    Statuts : EN_ATTENTE (dans la file), DISPONIBLE (exemplaire rendu mis de
+    côté jusqu'à dateExpiration), SATISFAITE (empruntée), ANNULEE, EXPIREE.
+    Chaque réservation prend la position suivante de son livre ; les
+    positions ne sont jamais renumérotées (une annulation ne touche que sa
+    ligne), le rang dans la file se déduit de leur ordre.
+
+    Les files EN_ATTENTE sont gardées en mémoire, par livre, dans l'ordre
+    des positions : le prochain réservataire d'un livre rendu est lu en
+    tête de file, sans requête. Elles sont chargées au démarrage, tenues à
+    jour à la validation de chaque écriture de ce processus et rechargées
+    toutes les RESERVATION_INDEX_REFRESH secondes (écritures d'un autre
+    processus). La tête de file est confirmée par un UPDATE conditionnel :
+    une entrée périmée est écartée.
+    """
+
+    _SELECT = """
+        SELECT
+            r.*,
+            CONCAT(a.nom, ' ', a.prenom) as adherent,
+            l.titre as livre
+        FROM Reservation r
+        JOIN Adherent a ON r.idAdherent = a.idAdherent
+        JOIN Livre l ON r.idLivre = l.idLivre
+    """
+
+    # idLivre -> OrderedDict {idReservation: (position, idAdherent)}, par position croissante
+    _files = {}
+    _index_charge_a = None
+    _index_lock = threading.Lock()
+
+    # ------------------------------------------------------------
+    # Files d'attente en mémoire
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def charger_index():
+        """(Re)construire les files d'attente à partir de la table Reservation"""
+        query = """
+            SELECT idReservation, idLivre, idAdherent, position
+            FROM Reservation
+            WHERE statut = 'EN_ATTENTE'
+            ORDER BY idLivre, position
+        """
+        files = {}
+        for row in db.fetch_iter(query):
+            files.setdefault(row['idLivre'], OrderedDict())[row['idReservation']] = \
+                (row['position'], row['idAdherent'])
+        with Reservation._index_lock:
+            Reservation._files = files
+            Reservation._index_charge_a = time.monotonic()
+        print(f"✓ Files de réservation : {sum(len(f) for f in files.values())} réservation(s) en attente")
+
+    @staticmethod
+    def _index_a_jour():
+        """Charger les files au premier usage ; les recharger en tâche de fond si elles sont anciennes"""
+        if Reservation._index_charge_a is None:
+            Reservation.charger_index()
+        elif time.monotonic() - Reservation._index_charge_a > RESERVATION_INDEX_REFRESH \
+                and not Reservation._index_lock.locked():
+            Reservation._index_charge_a = time.monotonic()
+            threading.Thread(target=Reservation.charger_index, daemon=True).start()
+
+    @staticmethod
+    def _ajouter_a_file(idLivre, idReservation, position, idAdherent):
+        with Reservation._index_lock:
+            file = Reservation._files.setdefault(idLivre, OrderedDict())
+            derniere = next(reversed(file.values()), None)
+            file[idReservation] = (position, idAdherent)
+            if derniere and derniere[0] > position:
+                # deux réservations validées dans le désordre : rétablir l'ordre des positions
+                Reservation._files[idLivre] = OrderedDict(sorted(file.items(), key=lambda r: r[1][0]))
+
+    @staticmethod
+    def _retirer_de_file(idLivre, idReservation):
+        with Reservation._index_lock:
+            file = Reservation._files.get(idLivre)
+            if file is not None:
+                file.pop(idReservation, None)
+                if not file:
+                    del Reservation._files[idLivre]
+
+    @staticmethod
+    def suivante(idLivre, exclues=()):
+        """(idReservation, idAdherent) en tête de la file du livre, hors `exclues` ; None si vide"""
+        Reservation._index_a_jour()
+        with Reservation._index_lock:
+            for idReservation, (_, idAdherent) in Reservation._files.get(idLivre, {}).items():
+                if idReservation not in exclues:
+                    return idReservation, idAdherent
+        return None
+
+    @staticmethod
+    def rang(idLivre, idReservation):
+        """Rang (1 = prochain servi) d'une réservation EN_ATTENTE dans la file du livre"""
+        Reservation._index_a_jour()
+        with Reservation._index_lock:
+            for rang, idAttente in enumerate(Reservation._files.get(idLivre, {}), 1):
+                if idAttente == idReservation:
+                    return rang
+        return None
+
+    @staticmethod
+    def _ajouter_rang(reservation):
+        """Compléter une ligne avec son rang dans la file (None hors EN_ATTENTE)"""
+        reservation['rang'] = None
+        if reservation['statut'] == 'EN_ATTENTE':
+            reservation['rang'] = Reservation.rang(reservation['idLivre'],
+                                                   reservation['idReservation'])
+        return reservation
+
+    # ------------------------------------------------------------
+    # Lectures
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def get_by_id(idReservation):
+        """Récupérer une réservation par son ID"""
+        query = Reservation._SELECT + " WHERE r.idReservation = %s"
+        reservation = db.fetch_one(query, (idReservation,))
+        return Reservation._ajouter_rang(reservation) if reservation else None
+
+    @staticmethod
+    def get_by_livre(idLivre):
+        """File d'un livre : exemplaires de côté puis réservations en attente, par position"""
+        query = Reservation._SELECT + """
+            WHERE r.idLivre = %s AND r.statut IN ('DISPONIBLE', 'EN_ATTENTE')
+            ORDER BY r.statut, r.position
+        """
+        return [Reservation._ajouter_rang(r) for r in db.fetch_all(query, (idLivre,))]
+
+    @staticmethod
+    def get_by_adherent(idAdherent):
+        """Réservations en cours d'un adhérent (de côté ou en attente)"""
+        query = Reservation._SELECT + """
+            WHERE r.idAdherent = %s AND r.statut IN ('DISPONIBLE', 'EN_ATTENTE')
+            ORDER BY r.dateReservation
+        """
+        return [Reservation._ajouter_rang(r) for r in db.fetch_all(query, (idAdherent,))]
+
+    @staticmethod
+    def get_disponibles():
+        """Exemplaires mis de côté, les plus proches de l'expiration d'abord"""
+        query = Reservation._SELECT + """
+            WHERE r.statut = 'DISPONIBLE'
+            ORDER BY r.dateExpiration
+        """
+        return db.fetch_all(query)
+
+    @staticmethod
+    def get_en_cours(idLivre, idAdherent):
+        """Réservation en cours (de côté ou en attente) d'un adhérent pour un livre"""
+        query = """
+            SELECT idReservation FROM Reservation
+            WHERE idAdherent = %s AND idLivre = %s AND statut IN ('DISPONIBLE', 'EN_ATTENTE')
+        """
+        return db.fetch_one(query, (idAdherent, idLivre))
+
+    @staticmethod
+    def get_expirees(verrouiller=False):
+        """Exemplaires de côté dont le délai de retrait est passé (lignes verrouillées si demandé)"""
+        query = """
+            SELECT idReservation, idLivre, idAdherent FROM Reservation
+            WHERE statut = 'DISPONIBLE' AND dateExpiration < NOW()
+        """
+        if verrouiller:
+            query += " FOR UPDATE"
+        return db.fetch_all(query)
+
+    # ------------------------------------------------------------
+    # Écritures (dans la transaction de l'appelant)
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def creer(idLivre, idAdherent):
+        """
+        Ajouter une réservation en fin de file ; retourne son id (None en cas d'erreur)
+        La ligne du livre doit être verrouillée par la transaction : deux
+        réservations simultanées ne prennent pas la même position.
+        """
+        row = db.fetch_one(
+            "SELECT COALESCE(MAX(position), 0) as derniere FROM Reservation WHERE idLivre = %s",
+            (idLivre,)
+        )
+        query = """
+            INSERT INTO Reservation (dateReservation, statut, position, idLivre, idAdherent)
+            VALUES (NOW(), 'EN_ATTENTE', %s, %s, %s)
+        """
+        position = row['derniere'] + 1
+        if not db.execute_query(query, (position, idLivre, idAdherent)):
+            return None
+        idReservation = db.get_last_insert_id()
+        db.after_commit(lambda: Reservation._ajouter_a_file(idLivre, idReservation,
+                                                            position, idAdherent))
+        return idReservation
+
+    @staticmethod
+    def changer_statut(reservation, ancien, nouveau):
+        """
+        Passer une réservation de `ancien` à `nouveau` (False si elle n'était plus `ancien`)
+        reservation : ligne portant idReservation et idLivre
+        """
+        query = """
+            UPDATE Reservation SET statut = %s
+            WHERE idReservation = %s AND statut = %s
+        """
+        ok = db.execute_query(query, (nouveau, reservation['idReservation'], ancien)) \
+            and db.get_row_count() == 1
+        if ok and ancien == 'EN_ATTENTE':
+            db.after_commit(lambda: Reservation._retirer_de_file(
+                reservation['idLivre'], reservation['idReservation']))
+        return ok
+
+    @staticmethod
+    def mettre_de_cote(idLivre, idReservation, dateExpiration):
+        """
+        Passer une réservation EN_ATTENTE à DISPONIBLE jusqu'à `dateExpiration`
+        Retourne False si elle n'était plus en attente (file en mémoire
+        périmée) : elle est alors retirée de la file.
+        """
+        query = """
+            UPDATE Reservation SET statut = 'DISPONIBLE', dateExpiration = %s
+            WHERE idReservation = %s AND statut = 'EN_ATTENTE'
+        """
+        if not db.execute_query(query, (dateExpiration, idReservation)):
+            return False
+        if db.get_row_count() != 1:
+            Reservation._retirer_de_file(idLivre, idReservation)
+            return False
+        db.after_commit(lambda: Reservation._retirer_de_file(idLivre, idReservation))
+        return True
+
+    @staticmethod
+    def expirer(ids):
+        """Passer des réservations DISPONIBLE à EXPIREE, en une requête"""
+        ids = tuple(ids)
+        if not ids:
+            return True
+        placeholders = ', '.join(['%s'] * len(ids))
+        query = f"""
+            UPDATE Reservation SET statut = 'EXPIREE'
+            WHERE idReservation IN ({placeholders}) AND statut = 'DISPONIBLE'
+        """
+        return db.execute_query(query, ids) and db.get_row_count() == len(ids)
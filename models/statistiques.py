@@ -0,0 +1,197 @@
+# models/statistiques.py
+import threading
+import time
+from decimal import Decimal
+from database import db
+from config import (STATS_CACHE_TTL, STATS_RETARDS_INTERVAL,
+                    STATS_RECOMPUTE_INTERVAL)
+
+
+class Statistiques:
+    """
+    Compteurs du tableau de bord, tenus dans la table Statistique
+    Chaque écriture (emprunt, retour, pénalité, adhérent, livre) ajuste ses
+    compteurs dans sa propre transaction : lire le tableau de bord revient à
+    lire quelques lignes, quelle que soit la taille des tables. Les valeurs
+    lues sont gardées STATS_CACHE_TTL secondes par processus.
+    Un fil de fond (demarrer_recalcul) tient à jour ce qui ne suit pas les
+    écritures, hors du chemin des requêtes :
+    - empruntsEnRetard dépend de l'heure, pas d'une écriture : il est recompté
+      toutes les STATS_RETARDS_INTERVAL secondes ;
+    - tous les compteurs sont recalculés depuis les tables toutes les
+      STATS_RECOMPUTE_INTERVAL secondes pour corriger toute dérive.
+    """
+
+    # clé -> requête de recalcul complet (les emprunts archivés sont rendus :
+    # ils comptent dans le total et les retours, l'archivage ne change rien)
+    _CALCULS = {
+        'empruntsTotal': """
+            SELECT (SELECT COUNT(*) FROM Emprunt) + (SELECT COUNT(*) FROM EmpruntArchive)
+        """,
+        'empruntsEnCours': "SELECT COUNT(*) FROM Emprunt WHERE statut = 'EN_COURS'",
+        'empruntsRetournes': """
+            SELECT (SELECT COUNT(*) FROM Emprunt WHERE statut = 'RETOURNE')
+                 + (SELECT COUNT(*) FROM EmpruntArchive)
+        """,
+        'empruntsEnRetard': """
+            SELECT COUNT(*) FROM Emprunt
+            WHERE statut = 'EN_COURS' AND dateRetourPrevue < NOW()
+        """,
+        'livresDisponibles': "SELECT COALESCE(SUM(nombreDisponibles), 0) FROM Livre",
+        'adherentsActifs': "SELECT COUNT(*) FROM Adherent WHERE statut = 'ACTIF'",
+        'penalitesImpayees': """
+            SELECT COALESCE(SUM(montant), 0) FROM Penalite WHERE statut = 'IMPAYEE'
+        """,
+    }
+
+    _instantane = None
+    _lu_a = 0.0
+    _lock = threading.Lock()
+    _fil = None
+    _arret = threading.Event()
+    # Deltas cumulés de la transaction en cours, par thread
+    _en_attente = threading.local()
+
+    @staticmethod
+    def ajuster(**deltas):
+        """
+        Ajouter des deltas aux compteurs, ex. ajuster(empruntsEnCours=1)
+        Dans une transaction, les deltas sont cumulés et écrits en une seule
+        requête juste avant le COMMIT : le compteur n'avance que si
+        l'écriture qu'il compte est validée, et les lignes de Statistique,
+        touchées par toutes les transactions, ne restent verrouillées que le
+        temps de la validation.
+        """
+        deltas = {cle: delta for cle, delta in deltas.items() if delta}
+        if not deltas:
+            return True
+        tx = db.current_transaction()
+        if tx is None:
+            return Statistiques._ecrire(deltas)
+
+        en_attente = Statistiques._en_attente
+        if getattr(en_attente, 'tx', None) is not tx:
+            en_attente.tx, en_attente.deltas = tx, {}
+            db.before_commit(Statistiques._ecrire_en_attente)
+        for cle, delta in deltas.items():
+            en_attente.deltas[cle] = en_attente.deltas.get(cle, 0) + delta
+        return True
+
+    @staticmethod
+    def _ecrire_en_attente():
+        en_attente = Statistiques._en_attente
+        deltas, en_attente.tx, en_attente.deltas = en_attente.deltas, None, {}
+        Statistiques._ecrire({cle: delta for cle, delta in deltas.items() if delta})
+
+    @staticmethod
+    def _ecrire(deltas):
+        """Appliquer {clé: delta} en une requête"""
+        if not deltas:
+            return True
+        cas = ' '.join(['WHEN %s THEN %s'] * len(deltas))
+        placeholders = ', '.join(['%s'] * len(deltas))
+        query = f"""
+            UPDATE Statistique SET valeur = valeur + CASE cle {cas} END
+            WHERE cle IN ({placeholders})
+        """
+        params = tuple(v for item in deltas.items() for v in item) + tuple(deltas)
+        ok = db.execute_query(query, params)
+        db.after_commit(Statistiques.invalider)
+        return ok
+
+    @staticmethod
+    def invalider():
+        """Relire la table au prochain get()"""
+        Statistiques._instantane = None
+
+    @staticmethod
+    def recalculer(cles=None):
+        """
+        Recalculer des compteurs (tous par défaut) depuis les tables
+        Une requête par clé, recomptée dans l'UPDATE même : un delta validé
+        par ajuster() pendant le recalcul n'est pas écrasé par un compte lu
+        avant lui.
+        """
+        cles = cles or list(Statistiques._CALCULS)
+        query = """
+            UPDATE Statistique SET valeur = ({calcul}), dateMaj = NOW() WHERE cle = %s
+        """
+        for cle in cles:
+            db.execute_query(query.format(calcul=Statistiques._CALCULS[cle]), (cle,))
+        Statistiques.invalider()
+
+    @staticmethod
+    def _lire():
+        rows = db.fetch_all("SELECT cle, valeur, dateMaj FROM Statistique")
+        return {row['cle']: row for row in rows}
+
+    @staticmethod
+    def _recalcul_du(lignes):
+        """Clés dont le dernier recalcul est trop ancien"""
+        maintenant = time.time()
+
+        def age(cle):
+            date_maj = lignes[cle]['dateMaj'] if cle in lignes else None
+            return maintenant - date_maj.timestamp() if date_maj else float('inf')
+
+        if any(age(cle) > STATS_RECOMPUTE_INTERVAL for cle in Statistiques._CALCULS):
+            return list(Statistiques._CALCULS)
+        if age('empruntsEnRetard') > STATS_RETARDS_INTERVAL:
+            return ['empruntsEnRetard']
+        return []
+
+    @staticmethod
+    def recalculer_si_du():
+        """Recalculer les compteurs dont le dernier recalcul est trop ancien"""
+        a_recalculer = Statistiques._recalcul_du(Statistiques._lire())
+        if a_recalculer:
+            Statistiques.recalculer(a_recalculer)
+        return a_recalculer
+
+    @staticmethod
+    def demarrer_recalcul():
+        """
+        Lancer le fil de fond des recalculs (une fois par processus)
+        L'échéance est lue dans Statistique.dateMaj : plusieurs processus
+        ne refont pas le même recalcul.
+        """
+        with Statistiques._lock:
+            if Statistiques._fil is not None and Statistiques._fil.is_alive():
+                return
+            Statistiques._arret.clear()
+            Statistiques._fil = threading.Thread(target=Statistiques._boucle_recalcul,
+                                                 name='recalcul-statistiques', daemon=True)
+            Statistiques._fil.start()
+
+    @staticmethod
+    def arreter_recalcul():
+        Statistiques._arret.set()
+
+    @staticmethod
+    def _boucle_recalcul():
+        while True:
+            try:
+                Statistiques.recalculer_si_du()
+            except Exception as e:
+                print(f"✗ Erreur lors du recalcul des statistiques : {e}")
+            if Statistiques._arret.wait(STATS_RETARDS_INTERVAL):
+                return
+
+    @staticmethod
+    def get():
+        """Tous les compteurs : {clé: valeur} (simple lecture de la table Statistique)"""
+        instantane = Statistiques._instantane
+        if instantane is not None and time.monotonic() - Statistiques._lu_a < STATS_CACHE_TTL:
+            return dict(instantane)
+
+        lignes = Statistiques._lire()
+        instantane = {}
+        for cle in Statistiques._CALCULS:
+            valeur = lignes[cle]['valeur'] if cle in lignes else 0
+            if cle == 'penalitesImpayees':
+                instantane[cle] = float(valeur)
+            else:
+                instantane[cle] = int(Decimal(valeur))
+        Statistiques._instantane = instantane
+        Statistiques._lu_a = time.monotonic()
+        return dict(instantane)
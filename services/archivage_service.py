@@ -0,0 +1,112 @@
+# services/archivage_service.py
+"""
+Archivage des emprunts rendus
+Les emprunts RETOURNE depuis plus de ARCHIVAGE_AGE_JOURS jours sont déplacés,
+avec leurs pénalités, dans EmpruntArchive et PenaliteArchive : Emprunt et
+Penalite ne gardent que l'activité en cours, et les requêtes du guichet
+(en cours, retards, retour par ISBN) restent rapides quelle que soit
+l'ancienneté de la bibliothèque.
+Chaque lot de ARCHIVAGE_BATCH emprunts est une transaction courte (copie
+puis suppression par clé primaire), suivie d'une pause : les verrous sur
+Emprunt et Penalite ne sont tenus que le temps d'un lot. Un emprunt dont une
+pénalité reste impayée n'est pas archivé.
+"""
+import time
+from datetime import datetime, timedelta
+from database import db
+from config import ARCHIVAGE_AGE_JOURS, ARCHIVAGE_BATCH, ARCHIVAGE_PAUSE
+
+_COLONNES_EMPRUNT = ("idEmprunt, dateEmprunt, dateRetourPrevue, dateRetourEffective, "
+                     "statut, idLivre, idAdherent, idBibliothecaire")
+_COLONNES_PENALITE = "idPenalite, montant, motif, dateCreation, statut, idEmprunt"
+
+# Emprunts archivables : rendus avant la date limite, sans pénalité impayée
+_ARCHIVABLES = """
+    FROM Emprunt e
+    WHERE e.statut = 'RETOURNE' AND e.dateRetourEffective < %s
+      AND NOT EXISTS (
+          SELECT 1 FROM Penalite p
+          WHERE p.idEmprunt = e.idEmprunt AND p.statut <> 'PAYEE'
+      )
+"""
+
+
+class ArchivageService:
+    """Déplacement des emprunts rendus vers les tables d'archive"""
+
+    @staticmethod
+    def compter(age_jours=ARCHIVAGE_AGE_JOURS):
+        """Emprunts et pénalités qu'un archivage déplacerait : {emprunts, penalites}"""
+        limite = datetime.now() - timedelta(days=age_jours)
+        emprunts = db.fetch_one("SELECT COUNT(*) as n " + _ARCHIVABLES, (limite,))
+        penalites = db.fetch_one(f"""
+            SELECT COUNT(*) as n FROM Penalite
+            WHERE idEmprunt IN (SELECT e.idEmprunt {_ARCHIVABLES})
+        """, (limite,))
+        return {'emprunts': emprunts['n'] if emprunts else 0,
+                'penalites': penalites['n'] if penalites else 0}
+
+    @staticmethod
+    def archiver(age_jours=ARCHIVAGE_AGE_JOURS, taille_lot=ARCHIVAGE_BATCH,
+                 pause=ARCHIVAGE_PAUSE, progression=None):
+        """
+        Archiver les emprunts rendus depuis plus de `age_jours` jours
+        - progression : appelée avec le rapport après chaque lot
+        Retourne le rapport {emprunts, penalites, lots, erreur, dureeSecondes}.
+        """
+        debut = time.perf_counter()
+        limite = datetime.now() - timedelta(days=age_jours)
+        rapport = {'emprunts': 0, 'penalites': 0, 'lots': 0, 'erreur': False}
+        selection = f"""
+            SELECT e.idEmprunt {_ARCHIVABLES}
+            ORDER BY e.dateRetourEffective
+            LIMIT %s
+        """
+
+        while True:
+            ids = tuple(row['idEmprunt']
+                        for row in db.fetch_all(selection, (limite, taille_lot)))
+            if not ids:
+                break
+            placeholders = ', '.join(['%s'] * len(ids))
+
+            with db.transaction() as tx:
+                # Pénalités d'abord (clé étrangère vers Emprunt) ; une pénalité
+                # impayée apparue entre-temps bloque la suppression de
+                # l'emprunt et annule le lot
+                db.execute_query(f"""
+                    INSERT INTO PenaliteArchive ({_COLONNES_PENALITE}, dateArchivage)
+                    SELECT {_COLONNES_PENALITE}, NOW() FROM Penalite
+                    WHERE idEmprunt IN ({placeholders}) AND statut = 'PAYEE'
+                """, ids)
+                penalites = db.get_row_count()
+                db.execute_query(f"""
+                    DELETE FROM Penalite
+                    WHERE idEmprunt IN ({placeholders}) AND statut = 'PAYEE'
+                """, ids)
+                db.execute_query(f"""
+                    INSERT INTO EmpruntArchive ({_COLONNES_EMPRUNT}, dateArchivage)
+                    SELECT {_COLONNES_EMPRUNT}, NOW() FROM Emprunt
+                    WHERE idEmprunt IN ({placeholders}) AND statut = 'RETOURNE'
+                """, ids)
+                emprunts = db.get_row_count()
+                db.execute_query(f"""
+                    DELETE FROM Emprunt
+                    WHERE idEmprunt IN ({placeholders}) AND statut = 'RETOURNE'
+                """, ids)
+
+            if not tx.committed:
+                print(f"✗ Archivage interrompu : lot de {len(ids)} emprunt(s) annulé")
+                rapport['erreur'] = True
+                break
+            rapport['emprunts'] += emprunts
+            rapport['penalites'] += penalites
+            rapport['lots'] += 1
+            if progression:
+                progression(rapport)
+            if len(ids) < taille_lot:
+                break
+            time.sleep(pause)
+
+        rapport['dureeSecondes'] = round(time.perf_counter() - debut, 2)
+        return rapport
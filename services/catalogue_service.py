@@ -0,0 +1,394 @@
+# services/catalogue_service.py
+"""
+Import en masse du catalogue (Livre)
+Le fichier est lu en flux et traité par lots : chaque lot est validé, puis
+écrit en une transaction (un INSERT multi-lignes pour les nouveaux ISBN, un
+UPDATE multi-lignes pour les ISBN déjà connus). La mémoire utilisée ne dépend que
+de la taille d'un lot, pas de celle du fichier.
+
+Formats lus :
+- csv  : une ligne d'en-tête (isbn, titre, auteur, categorie, exemplaires ;
+         les noms anglais title/author/category/quantity sont acceptés),
+         séparateur « , », « ; » ou tabulation détecté automatiquement
+- onix : export ONIX for Books 2.1 / 3.0 (balises longues)
+"""
+import csv
+import time
+import xml.etree.ElementTree as ET
+from itertools import islice
+from database import db
+from models import Livre, Referentiel, Statistiques
+from config import CATALOGUE_IMPORT_BATCH
+
+
+# ------------------------------------------------------------
+# ISBN
+# ------------------------------------------------------------
+
+def _isbn10_valide(isbn):
+    total = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(isbn))
+    return total % 11 == 0
+
+
+def _cle_isbn13(isbn12):
+    total = sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(isbn12))
+    return str((10 - total % 10) % 10)
+
+
+def normaliser_isbn(valeur):
+    """
+    ISBN-13 sans tirets, ou None si la valeur n'est pas un ISBN valide
+    Un ISBN-10 est converti en ISBN-13 (préfixe 978) ; la clé de contrôle
+    est vérifiée dans les deux cas.
+    """
+    isbn = ''.join(c for c in str(valeur or '') if c.isalnum()).upper()
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == 'X'):
+        if not _isbn10_valide(isbn):
+            return None
+        isbn = '978' + isbn[:9]
+        return isbn + _cle_isbn13(isbn)
+    if len(isbn) == 13 and isbn.isdigit() and isbn[:3] in ('978', '979'):
+        return isbn if _cle_isbn13(isbn[:12]) == isbn[12] else None
+    return None
+
+
+def _chiffres_isbn(isbn):
+    """ISBN enregistré, sans tirets ni espaces (cf. idx_livre_isbn_chiffres)"""
+    return str(isbn or '').replace('-', '').replace(' ', '').upper()
+
+
+def _formes_isbn(isbn13):
+    """Formes (sans tirets ni espaces) sous lesquelles un ISBN peut déjà être enregistré"""
+    formes = {isbn13}
+    if isbn13.startswith('978'):
+        isbn9 = isbn13[3:12]
+        total = sum((10 - i) * int(c) for i, c in enumerate(isbn9))
+        cle = (11 - total % 11) % 11
+        formes.add(isbn9 + ('X' if cle == 10 else str(cle)))
+    return formes
+
+
+# ------------------------------------------------------------
+# Lecture des fichiers
+# ------------------------------------------------------------
+
+_COLONNES = {
+    'isbn': 'isbn', 'ean': 'isbn',
+    'titre': 'titre', 'title': 'titre',
+    'auteur': 'auteur', 'author': 'auteur', 'auteurs': 'auteur',
+    'categorie': 'categorie', 'catégorie': 'categorie', 'nomcategorie': 'categorie',
+    'category': 'categorie',
+    'exemplaires': 'exemplaires', 'nombreexemplaires': 'exemplaires',
+    'quantite': 'exemplaires', 'quantité': 'exemplaires', 'quantity': 'exemplaires',
+}
+
+
+def lire_csv(fichier, colonnes=_COLONNES):
+    """
+    Générateur de (numéro de ligne, notice) pour un fichier CSV
+    colonnes : nom de colonne en minuscules -> champ de la notice
+    (les colonnes inconnues sont ignorées)
+    """
+    with open(fichier, newline='', encoding='utf-8-sig') as f:
+        debut = f.read(4096)
+        f.seek(0)
+        try:
+            dialecte = csv.Sniffer().sniff(debut, delimiters=',;\t')
+        except csv.Error:
+            dialecte = csv.excel
+        lecteur = csv.reader(f, dialecte)
+        entete = next(lecteur, None)
+        if not entete:
+            return
+        champs = [colonnes.get(nom.strip().lower()) for nom in entete]
+        for valeurs in lecteur:
+            if not any(v.strip() for v in valeurs):
+                continue
+            notice = {champ: valeur.strip()
+                      for champ, valeur in zip(champs, valeurs) if champ}
+            yield lecteur.line_num, notice
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _enfants(element, nom):
+    return [e for e in element if _local(e.tag) == nom]
+
+
+def _texte(element, *chemin):
+    """Texte du premier élément trouvé en suivant les noms locaux de `chemin`"""
+    courants = [element]
+    for nom in chemin:
+        courants = [e for c in courants for e in _enfants(c, nom)]
+    for e in courants:
+        if e.text and e.text.strip():
+            return e.text.strip()
+    return None
+
+
+def _notice_onix(produit):
+    isbn = None
+    for identifiant in _enfants(produit, 'ProductIdentifier'):
+        if _texte(identifiant, 'ProductIDType') in ('15', '03', '02'):
+            isbn = _texte(identifiant, 'IDValue')
+            if _texte(identifiant, 'ProductIDType') == '15':
+                break
+
+    # ONIX 3.0 range titre, auteurs et sujets sous DescriptiveDetail
+    detail = (_enfants(produit, 'DescriptiveDetail') or [produit])[0]
+    titre = (_texte(detail, 'TitleDetail', 'TitleElement', 'TitleText')
+             or _texte(detail, 'Title', 'TitleText'))
+
+    auteurs = []
+    for contributeur in _enfants(detail, 'Contributor'):
+        if _texte(contributeur, 'ContributorRole') not in (None, 'A01'):
+            continue
+        nom = _texte(contributeur, 'PersonName')
+        if not nom:
+            nom = ' '.join(filter(None, (_texte(contributeur, 'NamesBeforeKey'),
+                                         _texte(contributeur, 'KeyNames'))))
+        if nom:
+            auteurs.append(nom)
+
+    return {
+        'isbn': isbn,
+        'titre': titre,
+        'auteur': ', '.join(auteurs),
+        'categorie': _texte(detail, 'Subject', 'SubjectHeadingText'),
+    }
+
+
+def lire_onix(fichier):
+    """Générateur de (numéro de notice, notice) pour un export ONIX"""
+    numero = 0
+    for _, element in ET.iterparse(fichier, events=('end',)):
+        if _local(element.tag) != 'Product':
+            continue
+        numero += 1
+        yield numero, _notice_onix(element)
+        element.clear()  # mémoire bornée : la notice lue est libérée
+
+
+LECTEURS = {'csv': lire_csv, 'onix': lire_onix}
+
+
+# ------------------------------------------------------------
+# Import
+# ------------------------------------------------------------
+
+class RapportImport:
+    """Compteurs d'un import, et les premiers rejets (ligne, motif)"""
+
+    REJETS_GARDES = 1000
+
+    def __init__(self):
+        self.lus = 0
+        self.inseres = 0
+        self.mis_a_jour = 0
+        self.rejetes = 0
+        self.categories_creees = 0
+        self.rejets = []
+        self.debut = time.perf_counter()
+
+    def rejeter(self, ligne, motif):
+        self.rejetes += 1
+        if len(self.rejets) < self.REJETS_GARDES:
+            self.rejets.append((ligne, motif))
+
+    @property
+    def duree(self):
+        return time.perf_counter() - self.debut
+
+    def to_dict(self):
+        return {
+            'lus': self.lus,
+            'inseres': self.inseres,
+            'misAJour': self.mis_a_jour,
+            'rejetes': self.rejetes,
+            'categoriesCreees': self.categories_creees,
+            'dureeSecondes': round(self.duree, 2),
+            'rejets': [{'ligne': l, 'motif': m} for l, m in self.rejets],
+        }
+
+
+class CatalogueService:
+    """Import en masse du catalogue"""
+
+    @staticmethod
+    def importer_fichier(fichier, format='csv', **options):
+        """Importer un fichier CSV ou ONIX (cf. importer())"""
+        if format not in LECTEURS:
+            raise ValueError(f"Format inconnu : {format} (attendu : {', '.join(LECTEURS)})")
+        return CatalogueService.importer(LECTEURS[format](fichier), **options)
+
+    @staticmethod
+    def importer(notices, categorie_defaut=None, taille_lot=CATALOGUE_IMPORT_BATCH,
+                 progression=None, rejet=None):
+        """
+        Importer des notices {isbn, titre, auteur, categorie, exemplaires}
+        - notices          : itérable de (numéro de ligne, notice), lu en flux
+        - categorie_defaut : catégorie des notices qui n'en ont pas
+        - progression      : appelée avec le rapport après chaque lot
+        - rejet            : appelée avec (ligne, notice, motif) pour chaque rejet
+        Un ISBN déjà présent est mis à jour (titre, auteur, catégorie,
+        exemplaires) ; les catégories inconnues sont créées.
+        Retourne un RapportImport.
+        """
+        rapport = RapportImport()
+        categories = {}  # nom en minuscules -> idCategorie, pour tout l'import
+        notices = iter(notices)
+        while True:
+            lot = list(islice(notices, taille_lot))
+            if not lot:
+                break
+            rapport.lus += len(lot)
+            livres = CatalogueService._valider_lot(lot, categorie_defaut, categories,
+                                                   rapport, rejet)
+            if livres:
+                CatalogueService._ecrire_lot(livres, rapport)
+            if progression:
+                progression(rapport)
+
+        if rapport.inseres or rapport.mis_a_jour:
+            Statistiques.recalculer(['livresDisponibles'])
+        return rapport
+
+    @staticmethod
+    def _valider_lot(lot, categorie_defaut, categories, rapport, rejet):
+        """Notices valides du lot, indexées par ISBN normalisé (la dernière l'emporte)"""
+        livres = {}
+        for ligne, notice in lot:
+            motif = None
+            isbn = normaliser_isbn(notice.get('isbn'))
+            titre = (notice.get('titre') or '').strip()
+            auteur = (notice.get('auteur') or '').strip()
+            categorie = (notice.get('categorie') or '').strip() or categorie_defaut
+            exemplaires = notice.get('exemplaires') or 1
+
+            if not notice.get('isbn'):
+                motif = "ISBN absent"
+            elif isbn is None:
+                motif = f"ISBN invalide : {notice.get('isbn')}"
+            elif not titre:
+                motif = "Titre absent"
+            elif not auteur:
+                motif = "Auteur absent"
+            elif not categorie:
+                motif = "Catégorie absente"
+            else:
+                try:
+                    exemplaires = int(exemplaires)
+                    if exemplaires < 1:
+                        raise ValueError
+                except (TypeError, ValueError):
+                    motif = f"Nombre d'exemplaires invalide : {notice.get('exemplaires')}"
+
+            if motif is None:
+                idCategorie = CatalogueService._categorie(categorie, categories, rapport)
+                if idCategorie is None:
+                    motif = f"Catégorie impossible à créer : {categorie}"
+
+            if motif is not None:
+                rapport.rejeter(ligne, motif)
+                if rejet:
+                    rejet(ligne, notice, motif)
+                continue
+
+            livres[isbn] = {
+                'ligne': ligne,
+                'titre': titre[:255],
+                'auteur': auteur[:255],
+                'idCategorie': idCategorie,
+                'exemplaires': exemplaires,
+            }
+        return livres
+
+    @staticmethod
+    def _categorie(nom, categories, rapport):
+        """Catégorie existante, ou créée à la première rencontre"""
+        cle = ' '.join(nom.split()).lower()
+        if cle not in categories:
+            idCategorie = Referentiel.id_categorie(nom)
+            if idCategorie is None:
+                idCategorie = Referentiel.id_categorie(nom, creer=True)
+                if idCategorie is not None:
+                    rapport.categories_creees += 1
+            categories[cle] = idCategorie
+        return categories[cle]
+
+    @staticmethod
+    def _ecrire_lot(livres, rapport):
+        """Une transaction par lot : UPDATE multi-lignes des ISBN connus, INSERT multi-lignes des autres"""
+        formes = {}
+        for isbn in livres:
+            for forme in _formes_isbn(isbn):
+                formes[forme] = isbn
+        placeholders = ', '.join(['%s'] * len(formes))
+
+        with db.transaction() as tx:
+            # ISBN comparés sans tirets ni espaces : un livre saisi sous la
+            # forme « 978-2-07-036024-5 » est retrouvé, pas dupliqué
+            existants = db.fetch_all(f"""
+                SELECT idLivre, isbn FROM Livre
+                WHERE REPLACE(REPLACE(isbn, '-', ''), ' ', '') IN ({placeholders})
+            """, tuple(formes))
+            ids = {}
+            for row in existants:
+                ids.setdefault(formes[_chiffres_isbn(row['isbn'])], row['idLivre'])
+
+            mises_a_jour = {ids[isbn]: l for isbn, l in livres.items() if isbn in ids}
+            CatalogueService._mettre_a_jour(mises_a_jour)
+
+            nouveaux = [
+                (isbn, l['titre'], l['auteur'], l['exemplaires'], l['exemplaires'],
+                 l['idCategorie'])
+                for isbn, l in livres.items() if isbn not in ids
+            ]
+            db.execute_many("""
+                INSERT INTO Livre (isbn, titre, auteur, nombreExemplaires,
+                                   nombreDisponibles, idCategorie)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, nouveaux)
+
+        if not tx.committed:
+            for livre in livres.values():
+                rapport.rejeter(livre['ligne'], "Erreur d'écriture du lot")
+            return
+
+        rapport.mis_a_jour += len(mises_a_jour)
+        rapport.inseres += len(nouveaux)
+        for idLivre in ids.values():
+            Livre._invalider(idLivre)
+
+    @staticmethod
+    def _mettre_a_jour(livres):
+        """
+        Mettre à jour les livres {idLivre: notice} en une requête
+        Les exemplaires empruntés restent sortis : la disponibilité suit
+        l'écart entre l'ancien et le nouveau nombre d'exemplaires
+        (nombreDisponibles est affecté avant nombreExemplaires, que MySQL
+        relit après affectation).
+        """
+        if not livres:
+            return True
+        cas = 'CASE idLivre ' + ' '.join(['WHEN %s THEN %s'] * len(livres)) + ' END'
+        placeholders = ', '.join(['%s'] * len(livres))
+        query = f"""
+            UPDATE Livre
+            SET titre = {cas}, auteur = {cas}, idCategorie = {cas},
+                nombreDisponibles = CASE
+                    WHEN nombreDisponibles + {cas} - nombreExemplaires < 0 THEN 0
+                    ELSE nombreDisponibles + {cas} - nombreExemplaires END,
+                nombreExemplaires = {cas}
+            WHERE idLivre IN ({placeholders})
+        """
+
+        def valeurs(champ):
+            return tuple(v for idLivre, l in livres.items() for v in (idLivre, l[champ]))
+
+        exemplaires = valeurs('exemplaires')
+        params = (valeurs('titre') + valeurs('auteur') + valeurs('idCategorie')
+                  + exemplaires * 3 + tuple(livres))
+        return db.execute_query(query, params)
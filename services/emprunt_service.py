@@ -1,10 +1,13 @@
 # services/emprunt_service.py
+from collections import Counter, defaultdict, deque
 from datetime import datetime
-from models import Adherent, Livre, Emprunt
+from itertools import islice
+from models import Adherent, Livre, Emprunt, Penalite, Reservation, Statistiques
 from models.livre import Livre as LivreModel
 from models.adherent import Adherent as AdherentModel
 from database import db
-from config import PENALITE_PAR_JOUR
+from services.reservation_service import ReservationService
+from config import PENALITE_PAR_JOUR, RETOUR_BATCH
 
 class EmpruntService:
     """Service gérant la logique métier des emprunts"""
@@ -14,89 +17,246 @@ class EmpruntService:
         """
         Emprunter un livre avec toutes les vérifications
         Retourne : (success: bool, message: str, emprunt_id: int ou None)
+        Les vérifications sont les conditions des UPDATE, dans une seule
+        transaction : adhérent ACTIF sous son quota, puis exemplaire
+        disponible. Chaque UPDATE verrouille sa ligne, deux guichets ne
+        peuvent donc ni dépasser le quota ni prêter le même dernier
+        exemplaire. Le motif d'un refus n'est cherché qu'après coup.
         """
-        # 1. Vérifier que le livre existe et est disponible
-        livre = Livre.get_by_id(idLivre)
-        if not livre:
-            return False, "Livre introuvable", None
-        
-        if livre['nombreDisponibles'] <= 0:
-            return False, "Aucun exemplaire disponible", None
+        emprunt = None
+        with db.transaction() as tx:
+            # 1. Compter l'emprunt (statut et quota vérifiés par l'UPDATE)
+            # 2. Décrémenter la disponibilité (exemplaire disponible)
+            if not (AdherentModel.incrementer_emprunts(idAdherent)
+                    and LivreModel.decrementer_disponibilite(idLivre)):
+                tx.rollback_only()
+            else:
+                # 3. Créer l'emprunt (ligne adhérent verrouillée par l'étape 1)
+                adherent = Adherent.get_by_id(idAdherent)
+                date_retour = Emprunt.calculer_date_retour(adherent['typeAdherent'])
+                emprunt = Emprunt(
+                    dateRetourPrevue=date_retour,
+                    idLivre=idLivre,
+                    idAdherent=idAdherent,
+                    idBibliothecaire=idBibliothecaire
+                )
+                emprunt.save()
         
-        # 2. Vérifier que l'adhérent existe et peut emprunter
-        adherent = Adherent.get_by_id(idAdherent)
-        if not adherent:
-            return False, "Adhérent introuvable", None
+        if emprunt is None:
+            return EmpruntService._refus_emprunt(idLivre, idAdherent)
+        if not tx.committed:
+            return False, "Erreur lors de l'enregistrement de l'emprunt", None
         
-        if adherent['statut'] != 'ACTIF':
-            return False, f"Adhérent {adherent['statut'].lower()} - Emprunt impossible", None
+        message = f"Emprunt enregistré ! Retour prévu le {date_retour.strftime('%d/%m/%Y')}"
+        return True, message, emprunt.idEmprunt
+    
+    @staticmethod
+    def emprunter_livres(ids_livres, idAdherent, idBibliothecaire, partiel=False):
+        """
+        Emprunter plusieurs livres en une fois (panier)
+        Retourne : (success: bool, message: str, resultats: list) ; un
+        résultat par livre demandé, dans l'ordre : {idLivre, success,
+        message, idEmprunt}
+        - partiel=False : tout ou rien, un seul livre refusé annule le panier
+        - partiel=True  : les livres empruntables le sont (dans l'ordre du
+                          panier, jusqu'au quota), les autres sont refusés
+        Une transaction : adhérent puis livres lus et verrouillés ensemble,
+        quota vérifié une fois, un UPDATE par table et un INSERT multi-lignes.
+        """
+        resultats = [{'idLivre': idLivre, 'success': False, 'message': None, 'idEmprunt': None}
+                     for idLivre in ids_livres]
+        if not resultats:
+            return False, "Aucun livre demandé", resultats
         
-        # 3. Vérifier le quota
-        emprunts_en_cours = Adherent.get_emprunts_en_cours(idAdherent)
-        quota_max = 5 if adherent['typeAdherent'] == 'ENSEIGNANT' else 3
+        with db.transaction() as tx:
+            # 1. Adhérent (ligne verrouillée : quota lu une fois pour tout le panier)
+            adherent = AdherentModel.verrouiller(idAdherent)
+            motif = EmpruntService._motif_adherent(adherent)
+            if motif:
+                tx.rollback_only()
+                for resultat in resultats:
+                    resultat['message'] = motif
+                return False, motif, resultats
+            quota_max = Adherent.get_quota_max(adherent['typeAdherent'])
+            quota_restant = quota_max - adherent['empruntsEnCours']
+            
+            # 2. Livres (lignes verrouillées ensemble), un motif par livre refusé
+            livres = LivreModel.verrouiller(set(ids_livres))
+            acceptes, vus = [], set()
+            for resultat in resultats:
+                livre = livres.get(resultat['idLivre'])
+                if resultat['idLivre'] in vus:
+                    resultat['message'] = "Livre en double dans le panier"
+                elif not livre:
+                    resultat['message'] = "Livre introuvable"
+                elif livre['nombreDisponibles'] <= 0:
+                    resultat['message'] = "Aucun exemplaire disponible"
+                elif len(acceptes) >= quota_restant:
+                    resultat['message'] = f"Quota atteint ({quota_max}/{quota_max})"
+                else:
+                    acceptes.append(resultat)
+                vus.add(resultat['idLivre'])
+            refuses = len(resultats) - len(acceptes)
+            
+            if not acceptes or (refuses and not partiel):
+                tx.rollback_only()
+                for resultat in acceptes:
+                    resultat['message'] = "Non emprunté : panier refusé"
+                return False, f"Panier refusé : {refuses} livre(s) non empruntable(s)", resultats
+            
+            # 3. Quota, disponibilités et emprunts, pour tout le panier à la fois
+            date_retour = Emprunt.calculer_date_retour(adherent['typeAdherent'])
+            emprunts = [Emprunt(
+                dateRetourPrevue=date_retour,
+                idLivre=resultat['idLivre'],
+                idAdherent=idAdherent,
+                idBibliothecaire=idBibliothecaire
+            ) for resultat in acceptes]
+            if not (AdherentModel.incrementer_emprunts(idAdherent, len(emprunts))
+                    and LivreModel.decrementer_disponibilites(e.idLivre for e in emprunts)
+                    and Emprunt.save_all(emprunts)):
+                tx.rollback_only()
         
-        if emprunts_en_cours >= quota_max:
-            return False, f"Quota atteint ({emprunts_en_cours}/{quota_max})", None
+        if not tx.committed:
+            for resultat in acceptes:
+                resultat['message'] = "Erreur lors de l'enregistrement de l'emprunt"
+            return False, "Erreur lors de l'enregistrement des emprunts", resultats
         
-        # 4. Calculer la date de retour
-        date_retour = Emprunt.calculer_date_retour(adherent['typeAdherent'])
+        retour = date_retour.strftime('%d/%m/%Y')
+        for resultat, emprunt in zip(acceptes, emprunts):
+            resultat.update(success=True, idEmprunt=emprunt.idEmprunt,
+                            message=f"Retour prévu le {retour}")
+        message = f"{len(emprunts)} emprunt(s) enregistré(s) ! Retour prévu le {retour}"
+        if refuses:
+            message += f" - {refuses} livre(s) refusé(s)"
+        return True, message, resultats
+    
+    @staticmethod
+    def emprunter_reservation(idReservation, idBibliothecaire):
+        """
+        Emprunter l'exemplaire mis de côté pour une réservation
+        Retourne : (success: bool, message: str, emprunt_id: int ou None)
+        L'exemplaire mis de côté n'est plus compté disponible : la
+        transaction compte l'emprunt (statut et quota de l'adhérent), passe
+        la réservation de DISPONIBLE à SATISFAITE et crée l'emprunt, sans
+        toucher au livre.
+        """
+        reservation = Reservation.get_by_id(idReservation)
+        if not reservation:
+            return False, "Réservation introuvable", None
+        if reservation['statut'] != 'DISPONIBLE':
+            return False, "Aucun exemplaire mis de côté pour cette réservation", None
         
-        # 5. Créer l'emprunt
-        emprunt = Emprunt(
-            dateRetourPrevue=date_retour,
-            idLivre=idLivre,
-            idAdherent=idAdherent,
-            idBibliothecaire=idBibliothecaire
-        )
+        idAdherent = reservation['idAdherent']
+        emprunt = None
+        with db.transaction() as tx:
+            # 1. Compter l'emprunt (statut et quota vérifiés par l'UPDATE)
+            if not AdherentModel.incrementer_emprunts(idAdherent):
+                tx.rollback_only()
+            # 2. Clore la réservation (si elle n'a pas expiré ou été annulée entre-temps)
+            elif not Reservation.changer_statut(reservation, 'DISPONIBLE', 'SATISFAITE'):
+                tx.rollback_only()
+                return False, "Aucun exemplaire mis de côté pour cette réservation", None
+            else:
+                # 3. Créer l'emprunt
+                adherent = Adherent.get_by_id(idAdherent)
+                date_retour = Emprunt.calculer_date_retour(adherent['typeAdherent'])
+                emprunt = Emprunt(
+                    dateRetourPrevue=date_retour,
+                    idLivre=reservation['idLivre'],
+                    idAdherent=idAdherent,
+                    idBibliothecaire=idBibliothecaire
+                )
+                emprunt.save()
         
-        if not emprunt.save():
+        if emprunt is None:
+            return EmpruntService._refus_adherent(idAdherent)
+        if not tx.committed:
             return False, "Erreur lors de l'enregistrement de l'emprunt", None
         
-        # 6. Décrémenter la disponibilité
-        if not LivreModel.decrementer_disponibilite(idLivre):
-            return False, "Erreur lors de la mise à jour de la disponibilité", None
-        
         message = f"Emprunt enregistré ! Retour prévu le {date_retour.strftime('%d/%m/%Y')}"
         return True, message, emprunt.idEmprunt
     
+    @staticmethod
+    def _motif_adherent(adherent):
+        """Motif pour lequel un adhérent ne peut pas emprunter, None s'il le peut (privé)"""
+        if not adherent:
+            return "Adhérent introuvable"
+        if adherent['statut'] != 'ACTIF':
+            return f"Adhérent {adherent['statut'].lower()} - Emprunt impossible"
+        return None
+    
+    @staticmethod
+    def _refus_emprunt(idLivre, idAdherent):
+        """Motif d'un emprunt refusé, relu une fois la transaction annulée (privé)"""
+        livre = Livre.get_by_id(idLivre)
+        if not livre:
+            return False, "Livre introuvable", None
+        if livre['nombreDisponibles'] <= 0:
+            return False, "Aucun exemplaire disponible", None
+        return EmpruntService._refus_adherent(idAdherent)
+    
+    @staticmethod
+    def _refus_adherent(idAdherent):
+        """Motif pour lequel l'adhérent n'a pas pu emprunter, relu après annulation (privé)"""
+        adherent = Adherent.get_by_id(idAdherent)
+        motif = EmpruntService._motif_adherent(adherent)
+        if motif:
+            return False, motif, None
+        
+        emprunts_en_cours = adherent['empruntsEnCours']
+        quota_max = Adherent.get_quota_max(adherent['typeAdherent'])
+        if emprunts_en_cours >= quota_max:
+            return False, f"Quota atteint ({emprunts_en_cours}/{quota_max})", None
+        
+        return False, "Erreur lors de l'enregistrement de l'emprunt", None
+    
     @staticmethod
     def retourner_livre(isbn):
         """
         Retourner un livre avec calcul automatique de pénalité
         Retourne : (success: bool, message: str, penalite: float ou None)
+        Recherche de l'emprunt, retour, pénalité, quota, et exemplaire mis
+        de côté pour la réservation suivante ou rendu disponible : une seule
+        transaction. Le retour est
+        conditionnel (emprunt encore EN_COURS) : deux retours simultanés du
+        même exemplaire n'en enregistrent qu'un.
         """
-        # 1. Trouver l'emprunt en cours pour ce livre
-        emprunt = Emprunt.get_by_livre_isbn(isbn)
-        if not emprunt:
-            return False, "Aucun emprunt en cours pour ce livre", None
-        
-        # 2. Calculer le retard éventuel
-        jours_retard = Emprunt.calculer_retard(emprunt['dateRetourPrevue'])
         montant_penalite = 0
-        
-        if jours_retard > 0:
-            montant_penalite = jours_retard * PENALITE_PAR_JOUR
+        with db.transaction() as tx:
+            # 1. Trouver l'emprunt en cours pour ce livre
+            emprunt = Emprunt.get_by_livre_isbn(isbn)
+            if not emprunt:
+                tx.rollback_only()
+                return False, "Aucun emprunt en cours pour ce livre", None
+            
+            # 2. Marquer l'emprunt comme retourné (s'il l'est encore)
+            if not Emprunt.retourner(emprunt['idEmprunt']):
+                tx.rollback_only()
+                return False, "Erreur lors du retour", None
+            
+            # 3. Pénalité éventuelle (par jour entier de retard) ; le compteur
+            #    des retards suit la date prévue, comme son recalcul
+            maintenant = datetime.now()
+            jours_retard = Emprunt.calculer_retard(emprunt['dateRetourPrevue'], maintenant)
+            if jours_retard > 0:
+                montant_penalite = jours_retard * PENALITE_PAR_JOUR
+                motif = f"Retard de {jours_retard} jour(s) à {PENALITE_PAR_JOUR}€/jour"
+                Penalite.creer(emprunt['idEmprunt'], montant_penalite, motif)
+            if Emprunt.est_en_retard(emprunt['dateRetourPrevue'], maintenant):
+                Statistiques.ajuster(empruntsEnRetard=-1)
             
-            # Créer la pénalité
-            query_penalite = """
-                INSERT INTO Penalite (montant, motif, idEmprunt)
-                VALUES (%s, %s, %s)
-            """
-            motif = f"Retard de {jours_retard} jour(s) à {PENALITE_PAR_JOUR}€/jour"
-            db.execute_query(query_penalite, (montant_penalite, motif, emprunt['idEmprunt']))
+            # 4. Quota de l'adhérent
+            AdherentModel.decrementer_emprunts(emprunt['idAdherent'])
+            
+            # 5. Exemplaire mis de côté pour la réservation suivante, sinon
+            #    rendu disponible (livre lu avec l'emprunt)
+            if not ReservationService.mettre_de_cote({emprunt['idLivre']: 1}):
+                LivreModel.incrementer_disponibilite(emprunt['idLivre'])
         
-        # 3. Marquer l'emprunt comme retourné
-        if not Emprunt.retourner(emprunt['idEmprunt']):
+        if not tx.committed:
             return False, "Erreur lors du retour", None
         
-        # 4. Incrémenter la disponibilité
-        livre = Livre.get_by_isbn(isbn)
-        if not LivreModel.incrementer_disponibilite(livre['idLivre']):
-            return False, "Erreur lors de la mise à jour de la disponibilité", None
-        
-        # 5. Vérifier s'il y a des réservations en attente
-        EmpruntService._notifier_reservations(livre['idLivre'])
-        
         # Message de confirmation
         if jours_retard > 0:
             message = f"Retour enregistré. RETARD : {jours_retard} jour(s) - Pénalité : {montant_penalite:.2f}€"
@@ -106,27 +266,92 @@ class EmpruntService:
         return True, message, montant_penalite
     
     @staticmethod
-    def _notifier_reservations(idLivre):
-        """Vérifier et notifier les réservations en attente (privé)"""
-        query = """
-            SELECT r.*, CONCAT(a.nom, ' ', a.prenom) as adherent
-            FROM Reservation r
-            JOIN Adherent a ON r.idAdherent = a.idAdherent
-            WHERE r.idLivre = %s AND r.statut = 'EN_ATTENTE'
-            ORDER BY r.position
-            LIMIT 1
+    def retourner_livres(isbns, taille_lot=RETOUR_BATCH):
         """
-        reservation = db.fetch_one(query, (idLivre,))
+        Retourner une série de livres scannés (boîte de retour)
+        - isbns : itérable d'ISBN, lu en flux ; un ISBN répété retourne
+                  autant d'exemplaires
+        Retourne un résultat par ISBN, dans l'ordre :
+        {isbn, success, message, penalite, idEmprunt}
+        Une transaction par lot de `taille_lot` ISBN : une requête trouve les
+        emprunts en cours du lot, une autre les clôt, puis pénalités,
+        compteurs des adhérents et disponibilités sont écrits en une requête
+        chacun. Les exemplaires attendus par une réservation sont mis de côté
+        plutôt que rendus disponibles.
+        """
+        resultats = []
+        isbns = (str(isbn).strip() for isbn in isbns)
+        while True:
+            lot = list(islice(isbns, taille_lot))
+            if not lot:
+                return resultats
+            resultats.extend(EmpruntService._retourner_lot([isbn for isbn in lot if isbn]))
+    
+    @staticmethod
+    def _retourner_lot(isbns):
+        """Retours d'un lot d'ISBN, en une transaction (privé)"""
+        resultats = [{'isbn': isbn, 'success': False, 'message': None,
+                      'penalite': None, 'idEmprunt': None} for isbn in isbns]
+        if not resultats:
+            return resultats
+        
+        with db.transaction() as tx:
+            # 1. Emprunts en cours des livres scannés (un par scan, le plus ancien d'abord)
+            en_cours = defaultdict(deque)
+            for emprunt in Emprunt.get_en_cours_par_isbn(set(isbns)):
+                en_cours[emprunt['isbn']].append(emprunt)
+            retours = []
+            for resultat in resultats:
+                if en_cours[resultat['isbn']]:
+                    retours.append((resultat, en_cours[resultat['isbn']].popleft()))
+                else:
+                    resultat['message'] = "Aucun emprunt en cours pour ce livre"
+            if not retours:
+                tx.rollback_only()
+                return resultats
+            
+            # 2. Retards, à la même heure pour tout le lot
+            maintenant = datetime.now()
+            penalites = []
+            for resultat, emprunt in retours:
+                jours_retard = Emprunt.calculer_retard(emprunt['dateRetourPrevue'], maintenant)
+                resultat['penalite'] = 0
+                resultat['message'] = "Retour enregistré avec succès"
+                if jours_retard > 0:
+                    montant = jours_retard * PENALITE_PAR_JOUR
+                    motif = f"Retard de {jours_retard} jour(s) à {PENALITE_PAR_JOUR}€/jour"
+                    penalites.append((emprunt['idEmprunt'], montant, motif))
+                    resultat['penalite'] = montant
+                    resultat['message'] = (f"Retour enregistré. RETARD : {jours_retard} jour(s)"
+                                           f" - Pénalité : {montant:.2f}€")
+            
+            # 3. Retours, pénalités et quotas : une requête chacun
+            emprunts = [emprunt for _, emprunt in retours]
+            if not (Emprunt.retourner_lot(e['idEmprunt'] for e in emprunts)
+                    and Penalite.creer_lot(penalites)
+                    and AdherentModel.decrementer_emprunts_lot(
+                        Counter(e['idAdherent'] for e in emprunts))):
+                tx.rollback_only()
+            Statistiques.ajuster(empruntsEnRetard=-sum(
+                1 for e in emprunts if Emprunt.est_en_retard(e['dateRetourPrevue'], maintenant)))
+            
+            # 4. Exemplaires mis de côté pour les réservations, les autres rendus disponibles
+            rendus = Counter(e['idLivre'] for e in emprunts)
+            rendus -= ReservationService.mettre_de_cote(rendus)
+            if not LivreModel.incrementer_disponibilites(rendus):
+                tx.rollback_only()
         
-        if reservation:
-            print(f"📢 NOTIFICATION : Le livre est réservé par {reservation['adherent']}")
-            # TODO: Marquer la réservation comme notifiée
-            # TODO: Envoyer email/SMS (optionnel pour projet étudiant)
+        for resultat, emprunt in retours:
+            if tx.committed:
+                resultat.update(success=True, idEmprunt=emprunt['idEmprunt'])
+            else:
+                resultat.update(message="Erreur lors du retour", penalite=None)
+        return resultats
     
     @staticmethod
-    def get_emprunts_adherent(idAdherent):
-        """Récupérer l'historique des emprunts d'un adhérent"""
-        return Emprunt.get_by_adherent(idAdherent)
+    def get_emprunts_adherent(idAdherent, archives=False):
+        """Récupérer l'historique des emprunts d'un adhérent (archives comprises si demandé)"""
+        return Emprunt.get_by_adherent(idAdherent, archives)
     
     @staticmethod
     def prolonger_emprunt(idEmprunt, jours=7):
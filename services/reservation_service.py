@@ -0,0 +1,151 @@
+# services/reservation_service.py
+"""
+Réservations des livres dont aucun exemplaire n'est disponible
+Un exemplaire rendu va au premier de la file du livre : il est mis de côté
+(réservation DISPONIBLE) pendant RESERVATION_DELAI_RETRAIT jours au lieu
+d'être rendu disponible. Retiré à temps, il devient un emprunt
+(EmpruntService.emprunter_reservation) ; sinon la commande de maintenance
+`expirer-reservations` le passe au suivant de la file, ou le rend
+disponible si la file est vide.
+Ordre des verrous, le même que celui des retours : Livre puis Reservation.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from models import Adherent, Livre, Reservation
+from database import db
+from config import RESERVATION_DELAI_RETRAIT
+
+
+class ReservationService:
+    """Service gérant les files d'attente des réservations"""
+
+    @staticmethod
+    def notifier_mise_de_cote(idLivre, idAdherent, expiration):
+        """
+        Prévenir l'adhérent qu'un exemplaire l'attend (appelée après le COMMIT)
+        Affichage par défaut ; à remplacer pour envoyer un email ou un SMS :
+        ReservationService.notifier_mise_de_cote = envoyer_email
+        """
+        print(f"📢 NOTIFICATION : Livre {idLivre} mis de côté pour l'adhérent {idAdherent} "
+              f"jusqu'au {expiration.strftime('%d/%m/%Y')}")
+
+    @staticmethod
+    def reserver(idLivre, idAdherent):
+        """
+        Réserver un livre pour un adhérent
+        Les identifiants peuvent arriver en chaîne ("12") : convertis en entiers
+        (ValueError si non numériques), car Livre.verrouiller indexe par entier.
+        Retourne : (success: bool, message: str, idReservation: int ou None)
+        """
+        idLivre, idAdherent = int(idLivre), int(idAdherent)
+        adherent = Adherent.get_by_id(idAdherent)
+        if not adherent:
+            return False, "Adhérent introuvable", None
+        if adherent['statut'] != 'ACTIF':
+            return False, f"Adhérent {adherent['statut'].lower()} - Réservation impossible", None
+
+        with db.transaction() as tx:
+            # Ligne du livre verrouillée : la position en fin de file est unique
+            livre = Livre.verrouiller([idLivre]).get(idLivre)
+            if not livre:
+                tx.rollback_only()
+                return False, "Livre introuvable", None
+            if livre['nombreDisponibles'] > 0:
+                tx.rollback_only()
+                return False, "Un exemplaire est disponible - Empruntez-le directement", None
+            if Reservation.get_en_cours(idLivre, idAdherent):
+                tx.rollback_only()
+                return False, "Ce livre est déjà réservé par cet adhérent", None
+            idReservation = Reservation.creer(idLivre, idAdherent)
+            if idReservation is None:
+                tx.rollback_only()
+
+        if not tx.committed:
+            return False, "Erreur lors de la réservation", None
+        rang = Reservation.rang(idLivre, idReservation)
+        return True, f"Réservation enregistrée (rang {rang} dans la file d'attente)", idReservation
+
+    @staticmethod
+    def annuler(idReservation):
+        """
+        Annuler une réservation en attente ou mise de côté
+        Un exemplaire mis de côté passe au suivant de la file (ou redevient
+        disponible). Retourne : (success: bool, message: str)
+        """
+        reservation = Reservation.get_by_id(idReservation)
+        if not reservation:
+            return False, "Réservation introuvable"
+        statut = reservation['statut']
+        if statut not in ('EN_ATTENTE', 'DISPONIBLE'):
+            return False, f"Réservation déjà {statut.lower()}"
+
+        with db.transaction() as tx:
+            if statut == 'DISPONIBLE':
+                Livre.verrouiller([reservation['idLivre']])
+            if not Reservation.changer_statut(reservation, statut, 'ANNULEE'):
+                tx.rollback_only()
+                return False, "Réservation modifiée entre-temps - Réessayez"
+            if statut == 'DISPONIBLE' \
+                    and not ReservationService.mettre_de_cote({reservation['idLivre']: 1}):
+                Livre.incrementer_disponibilite(reservation['idLivre'])
+
+        if not tx.committed:
+            return False, "Erreur lors de l'annulation"
+        return True, "Réservation annulée"
+
+    @staticmethod
+    def mettre_de_cote(nombres):
+        """
+        Mettre de côté des exemplaires rendus {idLivre: nombre} pour les
+        premiers de leur file, dans la transaction de l'appelant
+        Retourne un Counter {idLivre: exemplaires mis de côté} ; les autres
+        sont à rendre disponibles par l'appelant.
+        La file est lue en mémoire (Reservation.suivante) : un livre sans
+        réservation ne coûte aucune requête.
+        """
+        mis_de_cote = Counter()
+        reserves = [idLivre for idLivre in nombres if Reservation.suivante(idLivre)]
+        if not reserves:
+            return mis_de_cote
+
+        Livre.verrouiller(reserves)
+        expiration = datetime.now() + timedelta(days=RESERVATION_DELAI_RETRAIT)
+        for idLivre in reserves:
+            servies = set()
+            while mis_de_cote[idLivre] < nombres[idLivre]:
+                suivante = Reservation.suivante(idLivre, servies)
+                if suivante is None:
+                    break
+                idReservation, idAdherent = suivante
+                servies.add(idReservation)
+                # Entrée périmée (réservation changée ailleurs) : écartée, on passe à la suivante
+                if Reservation.mettre_de_cote(idLivre, idReservation, expiration):
+                    mis_de_cote[idLivre] += 1
+                    # Prévenu une fois la mise de côté validée, jamais pour un lot annulé
+                    db.after_commit(lambda l=idLivre, a=idAdherent:
+                                    ReservationService.notifier_mise_de_cote(l, a, expiration))
+        return mis_de_cote
+
+    @staticmethod
+    def expirer():
+        """
+        Expirer les exemplaires mis de côté et non retirés à temps
+        Retourne le nombre de réservations expirées (None en cas d'erreur).
+        """
+        with db.transaction() as tx:
+            ids_livres = {r['idLivre'] for r in Reservation.get_expirees()}
+            if not ids_livres:
+                tx.rollback_only()
+                return 0
+            # Livres d'abord, puis relecture verrouillée des réservations
+            Livre.verrouiller(ids_livres)
+            expirees = Reservation.get_expirees(verrouiller=True)
+            rendus = Counter(r['idLivre'] for r in expirees)
+            if not Reservation.expirer(r['idReservation'] for r in expirees):
+                tx.rollback_only()
+            else:
+                rendus -= ReservationService.mettre_de_cote(rendus)
+                if not Livre.incrementer_disponibilites(rendus):
+                    tx.rollback_only()
+
+        return len(expirees) if tx.committed else None
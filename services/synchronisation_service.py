@@ -0,0 +1,291 @@
+# services/synchronisation_service.py
+"""
+Synchronisation des adhérents avec l'export semestriel de la scolarité
+L'export (CSV : nom, prenom, email, telephone, type) est la liste complète
+des étudiants et enseignants. Il est comparé en mémoire aux adhérents
+existants, par email (casse ignorée), en une seule lecture de la table :
+- email inconnu              -> adhérent créé (ACTIF)
+- email connu, fiche changée -> fiche mise à jour (un adhérent INACTIF
+                                présent dans l'export redevient ACTIF)
+- adhérent ACTIF absent      -> statut passé à INACTIF
+Les adhérents SUSPENDU gardent leur statut : la suspension relève de la
+bibliothèque, pas de la scolarité.
+Les écritures sont ensuite faites par lots, une transaction par lot.
+En simulation, seul le rapport est produit.
+"""
+import time
+from itertools import islice
+from database import db
+from models import Adherent, Statistiques
+from config import SYNCHRO_ADHERENTS_BATCH
+from services.catalogue_service import lire_csv
+
+
+_COLONNES = {
+    'nom': 'nom', 'last_name': 'nom', 'lastname': 'nom', 'surname': 'nom',
+    'prenom': 'prenom', 'prénom': 'prenom', 'first_name': 'prenom',
+    'firstname': 'prenom',
+    'email': 'email', 'mail': 'email', 'courriel': 'email', 'e-mail': 'email',
+    'telephone': 'telephone', 'téléphone': 'telephone', 'tel': 'telephone',
+    'phone': 'telephone',
+    'type': 'typeAdherent', 'typeadherent': 'typeAdherent', 'role': 'typeAdherent',
+    'rôle': 'typeAdherent', 'categorie': 'typeAdherent', 'catégorie': 'typeAdherent',
+}
+
+_TYPES = {
+    'etudiant': 'ETUDIANT', 'étudiant': 'ETUDIANT', 'student': 'ETUDIANT',
+    'enseignant': 'ENSEIGNANT', 'teacher': 'ENSEIGNANT', 'faculty': 'ENSEIGNANT',
+    'professeur': 'ENSEIGNANT',
+}
+
+# Colonnes comparées et écrites (dans l'ordre des paramètres des requêtes)
+_CHAMPS = ('nom', 'prenom', 'email', 'telephone', 'typeAdherent', 'statut')
+
+
+def lire_export(fichier):
+    """Générateur de (numéro de ligne, fiche) pour un export CSV de la scolarité"""
+    return lire_csv(fichier, _COLONNES)
+
+
+class RapportSynchro:
+    """Compteurs d'une synchronisation, et les premiers cas de chaque sorte"""
+
+    EXEMPLES_GARDES = 1000
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.lus = 0
+        self.inchanges = 0
+        self.rejets = []
+        self.rejetes = 0
+        self.crees = []
+        self.modifies = []
+        self.desactives = []
+        self.nb_crees = 0
+        self.nb_modifies = 0
+        self.nb_desactives = 0
+        self.debut = time.perf_counter()
+
+    def _garder(self, liste, element):
+        if len(liste) < self.EXEMPLES_GARDES:
+            liste.append(element)
+
+    def rejeter(self, ligne, motif):
+        self.rejetes += 1
+        self._garder(self.rejets, (ligne, motif))
+
+    @property
+    def duree(self):
+        return time.perf_counter() - self.debut
+
+    def to_dict(self):
+        return {
+            'simulation': self.simulation,
+            'lus': self.lus,
+            'crees': self.nb_crees,
+            'modifies': self.nb_modifies,
+            'desactives': self.nb_desactives,
+            'inchanges': self.inchanges,
+            'rejetes': self.rejetes,
+            'dureeSecondes': round(self.duree, 2),
+            'detailCrees': [f['email'] for f in self.crees],
+            'detailModifies': [{'idAdherent': i, 'email': e, 'changements': c}
+                               for i, e, c in self.modifies],
+            'detailDesactives': [{'idAdherent': i, 'email': e}
+                                 for i, e in self.desactives],
+            'rejets': [{'ligne': l, 'motif': m} for l, m in self.rejets],
+        }
+
+
+class SynchronisationService:
+    """Synchronisation en masse des adhérents"""
+
+    @staticmethod
+    def synchroniser_fichier(fichier, **options):
+        """Synchroniser depuis un export CSV (cf. synchroniser())"""
+        return SynchronisationService.synchroniser(lire_export(fichier), **options)
+
+    @staticmethod
+    def synchroniser(fiches, simulation=False, desactiver=True,
+                     taille_lot=SYNCHRO_ADHERENTS_BATCH):
+        """
+        Aligner la table Adherent sur l'export
+        - fiches     : itérable de (numéro de ligne, fiche), lu en flux
+        - simulation : calculer le rapport sans rien écrire
+        - desactiver : passer à INACTIF les adhérents ACTIF absents de l'export
+                       (False pour un export partiel)
+        Retourne un RapportSynchro.
+        """
+        rapport = RapportSynchro(simulation)
+        existants = SynchronisationService._charger_existants()
+        vus = set()
+        nouveaux, modifications = [], []
+
+        for ligne, fiche in fiches:
+            rapport.lus += 1
+            fiche, motif = SynchronisationService._valider(fiche)
+            cle = fiche['email'].lower() if fiche else None
+            if motif is None and cle in vus:
+                motif = f"Email en double dans l'export : {fiche['email']}"
+            if motif is not None:
+                rapport.rejeter(ligne, motif)
+                continue
+            vus.add(cle)
+
+            existant = existants.get(cle)
+            if existant is None:
+                nouveaux.append(fiche)
+                rapport._garder(rapport.crees, fiche)
+                continue
+
+            # L'email est la clé de comparaison : seule sa casse peut différer,
+            # elle n'est pas réécrite
+            cible = dict(existant)
+            for champ in ('nom', 'prenom', 'telephone', 'typeAdherent'):
+                if fiche.get(champ) is not None:
+                    cible[champ] = fiche[champ]
+            if cible['statut'] == 'INACTIF':
+                cible['statut'] = 'ACTIF'
+            changements = {champ: [existant[champ], cible[champ]]
+                           for champ in _CHAMPS if existant[champ] != cible[champ]}
+            if changements:
+                modifications.append({'idAdherent': existant['idAdherent'],
+                                      'email': existant['email'],
+                                      'champs': {champ: cible[champ] for champ in changements}})
+                rapport._garder(rapport.modifies,
+                                (existant['idAdherent'], existant['email'], changements))
+            else:
+                rapport.inchanges += 1
+
+        desactivations = []
+        if desactiver:
+            desactivations = [a for cle, a in existants.items()
+                              if cle not in vus and a['statut'] == 'ACTIF']
+            for adherent in desactivations:
+                rapport._garder(rapport.desactives,
+                                (adherent['idAdherent'], adherent['email']))
+
+        rapport.nb_crees = len(nouveaux)
+        rapport.nb_modifies = len(modifications)
+        rapport.nb_desactives = len(desactivations)
+        if simulation:
+            return rapport
+
+        SynchronisationService._ecrire(nouveaux, modifications, desactivations,
+                                       taille_lot, rapport)
+        if nouveaux or modifications or desactivations:
+            Statistiques.recalculer(['adherentsActifs'])
+            Adherent.charger_index()
+        return rapport
+
+    @staticmethod
+    def _charger_existants():
+        """Tous les adhérents, indexés par email en minuscules (une seule requête)"""
+        query = f"SELECT {', '.join(Adherent._COLONNES)} FROM Adherent"
+        existants = {}
+        for row in db.fetch_iter(query):
+            existants.setdefault(row['email'].lower(), row)
+        return existants
+
+    @staticmethod
+    def _valider(fiche):
+        """(fiche normalisée, None) ou (None, motif de rejet)"""
+        nom = ' '.join((fiche.get('nom') or '').split())
+        prenom = ' '.join((fiche.get('prenom') or '').split())
+        email = (fiche.get('email') or '').strip()
+        if not email:
+            return None, "Email absent"
+        if '@' not in email or ' ' in email:
+            return None, f"Email invalide : {email}"
+        if not nom or not prenom:
+            return None, f"Nom ou prénom absent : {email}"
+
+        type_brut = fiche.get('typeAdherent')
+        typeAdherent = None
+        if type_brut is not None and type_brut.strip():
+            typeAdherent = _TYPES.get(type_brut.strip().lower(),
+                                      type_brut.strip().upper())
+            if typeAdherent not in ('ETUDIANT', 'ENSEIGNANT'):
+                return None, f"Type d'adhérent inconnu : {type_brut}"
+
+        return {
+            'nom': nom[:50],
+            'prenom': prenom[:50],
+            'email': email[:100],
+            # Colonne absente de l'export : la valeur en base est conservée
+            'telephone': fiche['telephone'][:20] if 'telephone' in fiche else None,
+            'typeAdherent': typeAdherent,
+        }, None
+
+    @staticmethod
+    def _lots(elements, taille_lot):
+        elements = iter(elements)
+        while True:
+            lot = list(islice(elements, taille_lot))
+            if not lot:
+                return
+            yield lot
+
+    @staticmethod
+    def _ecrire(nouveaux, modifications, desactivations, taille_lot, rapport):
+        """Écritures groupées : une transaction et une requête par sorte et par lot"""
+        for lot in SynchronisationService._lots(nouveaux, taille_lot):
+            with db.transaction() as tx:
+                db.execute_many("""
+                    INSERT INTO Adherent (nom, prenom, email, telephone,
+                                          typeAdherent, statut)
+                    VALUES (%s, %s, %s, %s, %s, 'ACTIF')
+                """, [(f['nom'], f['prenom'], f['email'], f['telephone'] or '',
+                       f['typeAdherent'] or 'ETUDIANT') for f in lot])
+            if not tx.committed:
+                rapport.nb_crees -= len(lot)
+                for fiche in lot:
+                    rapport.rejeter(None, f"Erreur d'écriture (création) : {fiche['email']}")
+
+        for lot in SynchronisationService._lots(modifications, taille_lot):
+            # Un seul UPDATE par lot. Seules les colonnes changées par l'export
+            # sont écrites (une modification faite au guichet pendant la
+            # synchronisation est gardée) ; le statut n'est touché que pour
+            # réactiver un adhérent encore INACTIF : un adhérent suspendu
+            # entre-temps le reste
+            colonnes, params = [], []
+            for champ in _CHAMPS:
+                if champ == 'statut':
+                    continue
+                valeurs = [(a['idAdherent'], a['champs'][champ])
+                           for a in lot if champ in a['champs']]
+                if valeurs:
+                    cas = ' '.join(['WHEN %s THEN %s'] * len(valeurs))
+                    colonnes.append(f"{champ} = CASE idAdherent {cas} ELSE {champ} END")
+                    params.extend(v for valeur in valeurs for v in valeur)
+            reactives = [a['idAdherent'] for a in lot if 'statut' in a['champs']]
+            if reactives:
+                colonnes.append("statut = CASE WHEN statut = 'INACTIF' AND idAdherent IN ("
+                                + ', '.join(['%s'] * len(reactives))
+                                + ") THEN 'ACTIF' ELSE statut END")
+                params.extend(reactives)
+            colonnes = ', '.join(colonnes)
+            placeholders = ', '.join(['%s'] * len(lot))
+            with db.transaction() as tx:
+                db.execute_query(
+                    f"UPDATE Adherent SET {colonnes} WHERE idAdherent IN ({placeholders})",
+                    tuple(params) + tuple(a['idAdherent'] for a in lot)
+                )
+            if not tx.committed:
+                rapport.nb_modifies -= len(lot)
+                for adherent in lot:
+                    rapport.rejeter(None, f"Erreur d'écriture (mise à jour) : {adherent['email']}")
+
+        for lot in SynchronisationService._lots(desactivations, taille_lot):
+            ids = tuple(a['idAdherent'] for a in lot)
+            placeholders = ', '.join(['%s'] * len(ids))
+            with db.transaction() as tx:
+                # statut revérifié : un adhérent suspendu entre-temps le reste
+                db.execute_query(f"""
+                    UPDATE Adherent SET statut = 'INACTIF'
+                    WHERE idAdherent IN ({placeholders}) AND statut = 'ACTIF'
+                """, ids)
+            if not tx.committed:
+                rapport.nb_desactives -= len(lot)
+                for adherent in lot:
+                    rapport.rejeter(None, f"Erreur d'écriture (désactivation) : {adherent['email']}")
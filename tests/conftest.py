@@ -0,0 +1,49 @@
+# tests/conftest.py
+"""
+Configuration des tests (python -m pytest depuis la racine du projet)
+Par défaut, une base SQLite jetable ; BIBLIO_TEST_BACKEND=mysql utilise le
+serveur de DB_CONFIG avec la base nommée par BIBLIO_TEST_DATABASE, qui doit
+être une base de test migrée (python maintenance.py migrer) : les tests y
+écrivent.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+# Avant tout import de `database` : le moteur est choisi à l'import
+import config  # noqa: E402
+
+config.SLOW_QUERY_LOG = None
+if os.environ.get('BIBLIO_TEST_BACKEND', 'sqlite') == 'mysql':
+    config.DB_BACKEND = 'mysql'
+    config.DB_CONFIG = {**config.DB_CONFIG, 'database': os.environ['BIBLIO_TEST_DATABASE']}
+else:
+    config.DB_BACKEND = 'sqlite'
+    config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix='biblio-tests-'), 'biblio.db')
+
+import pytest  # noqa: E402
+from database import db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def base():
+    """Connexion à la base de test pour toute la session"""
+    if not db.connect():
+        pytest.skip("Base de test inaccessible")
+    yield db
+    db.disconnect()
+
+
+@pytest.fixture(scope='session')
+def bibliothecaire(base):
+    """Id d'un bibliothécaire pour enregistrer des emprunts"""
+    login = f"tests-{uuid.uuid4().hex[:8]}"
+    db.execute_query(
+        "INSERT INTO Bibliothecaire (nom, prenom, login, motDePasse) VALUES (%s, %s, %s, %s)",
+        ('Test', 'Guichet', login, 'secret')
+    )
+    return db.get_last_insert_id()
@@ -0,0 +1,88 @@
+# tests/test_adherents.py
+"""
+Recherche des adhérents (index trigrammes en mémoire)
+"""
+import uuid
+
+from database import db
+from models import Adherent, Livre, Referentiel
+from services.emprunt_service import EmpruntService
+
+
+def test_pages_de_recherche_dans_l_ordre_du_classement(base):
+    s = uuid.uuid4().hex[:6]
+    for i, nom in enumerate([f'Zorglub{s}', f'Zorglub{s}', f'Zorglu{s}', f'Zorlgub{s}',
+                             f'Zorglub{s}x', f'Zorglub{s}']):
+        assert Adherent(nom=nom, prenom=f'P{i % 2}', email=f'z{i}-{s}@test.fr').save()
+
+    attendus = [a['idAdherent'] for a in Adherent.search_with_quota(f'Zorglub{s}', limit=None)]
+    assert len(attendus) >= 5
+
+    lus, after = [], None
+    while True:
+        page, after = Adherent.search_page_with_quota(f'Zorglub{s}', limit=2, after=after)
+        assert len(page) <= 2
+        lus.extend(a['idAdherent'] for a in page)
+        if not after:
+            break
+    assert lus == attendus
+    assert all('quotaDisponible' in a for a in page)
+
+
+def test_recherche_tolere_une_faute_de_frappe(base):
+    s = uuid.uuid4().hex[:6]
+    assert Adherent(nom=f'Dumoulin{s}', prenom='Ana', email=f'd-{s}@test.fr').save()
+    resultats = Adherent.search(f'Dumoulni{s}')
+    assert resultats and resultats[0]['nom'] == f'Dumoulin{s}'
+
+
+def test_suppression_refusee_si_un_emprunt_s_intercale(bibliothecaire, monkeypatch):
+    s = uuid.uuid4().hex[:8]
+    adherent = Adherent(nom=f'Supprime{s}', prenom='Test', email=f'supprime-{s}@test.fr')
+    livre = Livre(isbn=f"S{s}", titre="Suppression", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=1,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert adherent.save() and livre.save()
+    # Vérification faite avant l'emprunt, suppression après
+    verrouiller = Adherent.verrouiller
+
+    def verrouiller_puis_emprunt(idAdherent):
+        ligne = verrouiller(idAdherent)
+        db.execute_query("UPDATE Adherent SET empruntsEnCours = 1 WHERE idAdherent = %s",
+                         (idAdherent,))
+        return ligne
+    monkeypatch.setattr(Adherent, 'verrouiller', staticmethod(verrouiller_puis_emprunt))
+    assert not Adherent.delete(adherent.idAdherent)
+    monkeypatch.undo()
+    assert Adherent.get_by_id(adherent.idAdherent)
+
+    db.execute_query("UPDATE Adherent SET empruntsEnCours = 0 WHERE idAdherent = %s",
+                     (adherent.idAdherent,))
+    ok, message, _ = EmpruntService.emprunter_livre(
+        livre.idLivre, adherent.idAdherent, bibliothecaire)
+    assert ok, message
+    assert not Adherent.delete(adherent.idAdherent)
+
+
+def test_decrement_groupe_sans_compteur_negatif(base):
+    s = uuid.uuid4().hex[:8]
+    ids = []
+    for i, compteur in enumerate((3, 1)):
+        adherent = Adherent(nom=f'Compteur{s}', prenom=f'P{i}', email=f'compteur{i}-{s}@test.fr')
+        assert adherent.save()
+        db.execute_query("UPDATE Adherent SET empruntsEnCours = %s WHERE idAdherent = %s",
+                         (compteur, adherent.idAdherent))
+        ids.append(adherent.idAdherent)
+    assert Adherent.decrementer_emprunts_lot({ids[0]: 2, ids[1]: 2})
+    assert [Adherent.get_emprunts_en_cours(i) for i in ids] == [1, 0]
+
+
+def test_fiche_avec_quota(base):
+    s = uuid.uuid4().hex[:8]
+    adherent = Adherent(nom=f'Quota{s}', prenom='Test', email=f'quota-{s}@test.fr',
+                        typeAdherent='ENSEIGNANT')
+    assert adherent.save()
+    fiche = Adherent.get_with_quota(adherent.idAdherent)
+    assert (fiche['quotaMax'], fiche['quotaDisponible']) == (Adherent.get_quota_max('ENSEIGNANT'),
+                                                             Adherent.get_quota_max('ENSEIGNANT'))
+    assert Adherent.get_with_quota(-1) is None
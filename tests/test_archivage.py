@@ -0,0 +1,60 @@
+# tests/test_archivage.py
+"""
+Archivage des emprunts rendus (services/archivage_service.py)
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from database import db
+from models import Adherent, Livre, Penalite, Referentiel, Statistiques
+from services.archivage_service import ArchivageService
+from services.emprunt_service import EmpruntService
+
+
+def _emprunt_rendu(idBibliothecaire, en_retard=False):
+    """(idEmprunt, idPenalite ou None) d'un emprunt rendu il y a 400 jours"""
+    s = uuid.uuid4().hex[:8]
+    adherent = Adherent(nom=f'Archive{s}', prenom='Test', email=f'archive-{s}@test.fr')
+    livre = Livre(isbn=f"A{s}", titre="Archive", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=1,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert adherent.save() and livre.save()
+    ok, message, idEmprunt = EmpruntService.emprunter_livre(
+        livre.idLivre, adherent.idAdherent, idBibliothecaire)
+    assert ok, message
+    if en_retard:
+        assert EmpruntService.prolonger_emprunt(idEmprunt, -60)[0]
+    ok, message, _ = EmpruntService.retourner_livre(livre.isbn)
+    assert ok, message
+    db.execute_query("UPDATE Emprunt SET dateRetourEffective = %s WHERE idEmprunt = %s",
+                     (datetime.now() - timedelta(days=400), idEmprunt))
+    penalite = db.fetch_one("SELECT idPenalite FROM Penalite WHERE idEmprunt = %s", (idEmprunt,))
+    return idEmprunt, penalite['idPenalite'] if penalite else None
+
+
+def _compte(table, idEmprunt):
+    return db.fetch_one(f"SELECT COUNT(*) AS n FROM {table} WHERE idEmprunt = %s",
+                        (idEmprunt,))['n']
+
+
+def test_archiver_deplace_les_emprunts_rendus_et_leurs_penalites_payees(bibliothecaire):
+    sans_penalite, _ = _emprunt_rendu(bibliothecaire)
+    paye, idPenalite = _emprunt_rendu(bibliothecaire, en_retard=True)
+    impaye, _ = _emprunt_rendu(bibliothecaire, en_retard=True)
+    assert idPenalite and Penalite.payer(idPenalite)
+    Statistiques.recalculer()
+    avant = Statistiques.get()
+
+    rapport = ArchivageService.archiver(365, taille_lot=1, pause=0)
+    assert not rapport['erreur'] and rapport['emprunts'] >= 2 and rapport['lots'] >= 2
+
+    for idEmprunt in (sans_penalite, paye):
+        assert (_compte('Emprunt', idEmprunt), _compte('EmpruntArchive', idEmprunt)) == (0, 1)
+    assert (_compte('Penalite', paye), _compte('PenaliteArchive', paye)) == (0, 1)
+    # pénalité impayée : l'emprunt reste en place
+    assert (_compte('Emprunt', impaye), _compte('EmpruntArchive', impaye)) == (1, 0)
+    assert ArchivageService.compter(365) == {'emprunts': 0, 'penalites': 0}
+
+    # Les emprunts archivés comptent toujours dans le total et les retours
+    Statistiques.recalculer()
+    assert Statistiques.get() == avant
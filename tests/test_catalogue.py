@@ -0,0 +1,73 @@
+# tests/test_catalogue.py
+"""
+Import du catalogue (services/catalogue_service.py)
+"""
+import random
+
+import pytest
+
+from database import db
+from models import Livre, Referentiel
+from services.catalogue_service import CatalogueService, normaliser_isbn
+
+
+@pytest.mark.parametrize('valeur, attendu', [
+    ('9780306406157', '9780306406157'),
+    ('978-0-306-40615-7', '9780306406157'),
+    (' 978 0 306 40615 7 ', '9780306406157'),
+    ('0-306-40615-2', '9780306406157'),     # ISBN-10 converti
+    ('0-8044-2957-X', '9780804429573'),     # clé X
+    ('080442957x', '9780804429573'),
+    ('978-0-306-40615-8', None),            # clé fausse
+    ('0306406153', None),
+    ('9770306406157', None),                # ni 978 ni 979
+    ('12345', None),
+    ('', None),
+    (None, None),
+])
+def test_normaliser_isbn(valeur, attendu):
+    assert normaliser_isbn(valeur) == attendu
+
+
+def _isbn13():
+    isbn12 = '979' + ''.join(random.choice('0123456789') for _ in range(9))
+    total = sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(isbn12))
+    return isbn12 + str((10 - total % 10) % 10)
+
+
+def _livre(isbn, exemplaires, disponibles):
+    livre = Livre(isbn=isbn, titre="Ancien titre", auteur="Ancien auteur",
+                  nombreExemplaires=exemplaires, nombreDisponibles=disponibles,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert livre.save()
+    return livre.idLivre
+
+
+def test_un_isbn_enregistre_avec_tirets_est_mis_a_jour(base):
+    isbn = _isbn13()
+    tirets = f"{isbn[:3]}-{isbn[3]}-{isbn[4:7]}-{isbn[7:12]}-{isbn[12]}"
+    idLivre = _livre(tirets, 1, 1)
+    rapport = CatalogueService.importer([
+        (2, {'isbn': isbn, 'titre': 'Nouveau titre', 'auteur': 'Auteur', 'categorie': 'Tests'}),
+    ])
+    assert (rapport.inseres, rapport.mis_a_jour) == (0, 1)
+    lignes = db.fetch_all("SELECT idLivre, titre FROM Livre WHERE isbn IN (%s, %s)",
+                          (isbn, tirets))
+    assert lignes == [{'idLivre': idLivre, 'titre': 'Nouveau titre'}]
+
+
+def test_mise_a_jour_groupee_livre_par_livre(base):
+    isbns = [_isbn13() for _ in range(3)]
+    # 3 exemplaires dont 2 sortis, 2 dont 0 sorti, 4 dont 4 sortis
+    ids = [_livre(isbns[0], 3, 1), _livre(isbns[1], 2, 2), _livre(isbns[2], 4, 0)]
+    rapport = CatalogueService.importer([
+        (i + 2, {'isbn': isbn, 'titre': f'Titre {i}', 'auteur': f'Auteur {i}',
+                 'categorie': f'Tests {i}', 'exemplaires': str(exemplaires)})
+        for i, (isbn, exemplaires) in enumerate(zip(isbns, (5, 1, 2)))
+    ])
+    assert rapport.mis_a_jour == 3 and not rapport.rejetes
+    for i, (idLivre, exemplaires, disponibles) in enumerate(zip(ids, (5, 1, 2), (3, 1, 0))):
+        livre = Livre.get_by_id(idLivre)
+        assert (livre['titre'], livre['auteur']) == (f'Titre {i}', f'Auteur {i}')
+        assert livre['idCategorie'] == Referentiel.id_categorie(f'Tests {i}')
+        assert (livre['nombreExemplaires'], livre['nombreDisponibles']) == (exemplaires, disponibles)
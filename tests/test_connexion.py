@@ -0,0 +1,69 @@
+# tests/test_connexion.py
+"""
+Comportement de la couche d'accès (database/connection.py)
+"""
+import time
+import uuid
+
+from database import db
+from database.metrics import QueryMetrics, normalize
+
+
+def test_fetch_iter_dans_une_transaction_voit_ses_ecritures(base):
+    nom = f"Flux {uuid.uuid4().hex[:8]}"
+    query = "SELECT nomCategorie FROM Categorie WHERE nomCategorie = %s"
+    with db.transaction() as tx:
+        assert db.execute_query("INSERT INTO Categorie (nomCategorie) VALUES (%s)", (nom,))
+        empruntees = db.pool_status()
+        lignes = list(db.fetch_iter(query, (nom,)))
+        # même connexion que la transaction : aucune autre empruntée au pool
+        assert db.pool_status() == empruntees
+        tx.rollback_only()
+    assert lignes == [{'nomCategorie': nom}]
+    assert db.fetch_one(query, (nom,)) is None
+
+
+def test_fetch_iter_dans_une_transaction_permet_d_ecrire_pendant_le_parcours(base):
+    noms = [f"Flux {uuid.uuid4().hex[:8]}" for _ in range(3)]
+    db.execute_many("INSERT INTO Categorie (nomCategorie) VALUES (%s)", [(n,) for n in noms])
+    placeholders = ', '.join(['%s'] * len(noms))
+    with db.transaction() as tx:
+        for ligne in db.fetch_iter(
+                f"SELECT idCategorie, nomCategorie FROM Categorie WHERE nomCategorie IN ({placeholders})",
+                noms, batch_size=1):
+            assert db.execute_query("UPDATE Categorie SET nomCategorie = %s WHERE idCategorie = %s",
+                                    (ligne['nomCategorie'] + ' lu', ligne['idCategorie']))
+    assert tx.committed
+    lus = db.fetch_all(f"SELECT nomCategorie FROM Categorie WHERE nomCategorie IN ({placeholders})",
+                       [n + ' lu' for n in noms])
+    assert len(lus) == len(noms)
+
+
+def test_fetch_iter_ne_mesure_pas_le_temps_de_l_appelant(base):
+    db.execute_many("INSERT INTO Categorie (nomCategorie) VALUES (%s)",
+                    [(f"Flux {uuid.uuid4().hex[:8]}",) for _ in range(3)])
+    query = f"SELECT nomCategorie FROM Categorie /* {uuid.uuid4().hex} */"
+    for _ in db.fetch_iter(query, batch_size=1):
+        time.sleep(0.05)
+    stats = next(r for r in db.metrics.snapshot()['requetes'] if r['requete'].endswith('*/'))
+    assert stats['appels'] == 1 and stats['lignes'] >= 3
+    assert stats['totalMs'] < 50
+
+
+def test_journal_des_requetes_lentes_ouvert_a_la_connexion(tmp_path):
+    chemin = tmp_path / 'lentes.log'
+    QueryMetrics(slow_log_path=str(chemin))
+    assert not chemin.exists()
+
+
+def test_une_seule_cle_par_requete_quelle_que_soit_la_taille_du_lot():
+    def requete(n):
+        return normalize(
+            "UPDATE Livre SET nombreDisponibles = CASE idLivre "
+            + ' '.join(['WHEN %s THEN %s'] * n)
+            + f" END WHERE idLivre IN ({', '.join(['%s'] * n)}) AND titre <> 'x'")
+    assert requete(1) == requete(2) == requete(50)
+    assert requete(3) == ("UPDATE Livre SET nombreDisponibles = CASE idLivre WHEN ? THEN ? ... "
+                          "END WHERE idLivre IN (...) AND titre <> ?")
+    assert normalize("SELECT * FROM Livre WHERE idLivre IN (1, 2, 3)") == \
+        normalize("SELECT * FROM Livre WHERE idLivre IN (%s)")
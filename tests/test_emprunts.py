@@ -0,0 +1,81 @@
+# tests/test_emprunts.py
+"""
+Emprunts et retours : disponibilités et compteurs cohérents
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models import Adherent, Livre, Referentiel, Statistiques
+from services.emprunt_service import EmpruntService
+
+
+def _en_parallele(fonction, arguments):
+    """Résultats de fonction(*args) lancée dans un thread par args, départ simultané"""
+    depart = threading.Barrier(len(arguments))
+    resultats = [None] * len(arguments)
+
+    def lancer(i, args):
+        depart.wait()
+        resultats[i] = fonction(*args)
+
+    threads = [threading.Thread(target=lancer, args=(i, args)) for i, args in enumerate(arguments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultats
+
+
+def test_emprunts_concurrents_du_dernier_exemplaire(bibliothecaire):
+    s = uuid.uuid4().hex[:8]
+    livre = Livre(isbn=f"C{s}", titre="Concurrence", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=1,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert livre.save()
+    adherents = []
+    for i in range(4):
+        adherent = Adherent(nom=f'Concurrent{s}', prenom=f'P{i}', email=f'c{i}-{s}@test.fr')
+        assert adherent.save()
+        adherents.append(adherent.idAdherent)
+    Statistiques.recalculer()
+    en_cours = Statistiques.get()['empruntsEnCours']
+
+    resultats = _en_parallele(EmpruntService.emprunter_livre,
+                              [(livre.idLivre, a, bibliothecaire) for a in adherents])
+
+    assert sum(1 for ok, _, _ in resultats if ok) == 1
+    assert Livre.get_by_id(livre.idLivre)['nombreDisponibles'] == 0
+    Statistiques.invalider()
+    assert Statistiques.get()['empruntsEnCours'] == en_cours + 1
+    ecarts = Adherent.recalculer_emprunts_en_cours(appliquer=False)
+    assert not [e for e in ecarts if e['idAdherent'] in adherents]
+
+
+@pytest.mark.parametrize('par_lot', [False, True])
+def test_retour_en_retard_de_quelques_heures(bibliothecaire, par_lot):
+    s = uuid.uuid4().hex[:8]
+    adherent = Adherent(nom=f'Retard{s}', prenom='Test', email=f'retard-{s}@test.fr')
+    livre = Livre(isbn=f"H{s}", titre="Retard", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=1,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert adherent.save() and livre.save()
+    ok, message, idEmprunt = EmpruntService.emprunter_livre(
+        livre.idLivre, adherent.idAdherent, bibliothecaire)
+    assert ok, message
+    # En retard depuis 3 heures : compté dans les retards, sans pénalité
+    db.execute_query("UPDATE Emprunt SET dateRetourPrevue = %s WHERE idEmprunt = %s",
+                     (datetime.now() - timedelta(hours=3), idEmprunt))
+    Statistiques.recalculer(['empruntsEnRetard'])
+
+    if par_lot:
+        assert EmpruntService.retourner_livres([livre.isbn])[0]['penalite'] == 0
+    else:
+        assert EmpruntService.retourner_livre(livre.isbn)[2] == 0
+    Statistiques.invalider()
+    retards = Statistiques.get()['empruntsEnRetard']
+    Statistiques.recalculer(['empruntsEnRetard'])
+    assert Statistiques.get()['empruntsEnRetard'] == retards
@@ -0,0 +1,55 @@
+# tests/test_livres.py
+"""
+Livres : cache des lectures par id / ISBN
+"""
+import uuid
+
+import pytest
+
+from database import db
+from models import Livre, Referentiel
+
+
+def _livre(base):
+    livre = Livre(isbn=f"T{uuid.uuid4().hex[:12]}", titre="Cache", auteur="Test",
+                  nombreExemplaires=2, nombreDisponibles=2,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert livre.save()
+    return livre
+
+
+def test_une_ecriture_invalide_le_cache(base):
+    livre = _livre(base)
+    assert Livre.get_by_id(livre.idLivre)['nombreDisponibles'] == 2
+    assert Livre.get_by_isbn(livre.isbn)['nombreDisponibles'] == 2  # en cache
+    assert Livre.decrementer_disponibilite(livre.idLivre)
+    assert Livre.get_by_id(livre.idLivre)['nombreDisponibles'] == 1
+    assert Livre.get_by_isbn(livre.isbn)['nombreDisponibles'] == 1
+
+
+def test_le_cache_se_remplit_sur_le_primaire(base, monkeypatch):
+    livre = _livre(base)
+    Livre._invalider(livre.idLivre)
+
+    def replica():
+        pytest.fail("lecture mise en cache envoyée à un réplica")
+    monkeypatch.setattr(db, '_use_replica', replica)
+    assert Livre.get_by_id(livre.idLivre)['titre'] == "Cache"
+    assert Livre.get_by_isbn(livre.isbn)['titre'] == "Cache"
+
+
+def test_une_ecriture_pendant_la_lecture_n_est_pas_masquee(base, monkeypatch):
+    livre = _livre(base)
+    Livre._invalider(livre.idLivre)
+    fetch_one = db.fetch_one
+
+    # Un autre guichet emprunte un exemplaire entre la lecture et la mise en cache
+    def lire_puis_ecriture(query, *args, **kwargs):
+        row = fetch_one(query, *args, **kwargs)
+        monkeypatch.setattr(db, 'fetch_one', fetch_one)
+        assert Livre.decrementer_disponibilite(livre.idLivre)
+        return row
+    monkeypatch.setattr(db, 'fetch_one', lire_puis_ecriture)
+    assert Livre.get_by_id(livre.idLivre)['nombreDisponibles'] == 2
+    assert Livre.get_by_id(livre.idLivre)['nombreDisponibles'] == 1
+    assert Livre.get_by_isbn(livre.isbn)['nombreDisponibles'] == 1
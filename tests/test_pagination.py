@@ -0,0 +1,50 @@
+# tests/test_pagination.py
+"""
+Pagination par curseur (database/pagination.py)
+"""
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from database import db, keyset_page
+from database.pagination import decode_cursor, encode_cursor
+from models import Livre, Referentiel
+
+
+def test_curseur_aller_retour():
+    valeurs = [datetime(2024, 3, 1, 14, 30, 5), date(2024, 3, 1), Decimal('12.50'),
+               'Zoé', 42, None]
+    jeton = encode_cursor(valeurs)
+    assert '=' not in jeton
+    assert decode_cursor(jeton, len(valeurs)) == valeurs
+
+
+@pytest.mark.parametrize('jeton', ['pas un jeton', encode_cursor([1, 2]), ''])
+def test_curseur_invalide(jeton):
+    with pytest.raises(ValueError):
+        decode_cursor(jeton, 3)
+
+
+@pytest.mark.parametrize('sens', ['ASC', 'DESC'])
+def test_pages_successives_sans_doublon_ni_trou(base, sens):
+    auteur = f"Pagination {uuid.uuid4().hex[:8]}"
+    idCategorie = Referentiel.id_categorie("Tests", creer=True)
+    for titre in ['B', 'A', 'B', 'A', 'C', 'B', 'A']:  # titres égaux : départagés par l'id
+        assert Livre(isbn='', titre=titre, auteur=auteur, idCategorie=idCategorie).save()
+
+    select = "SELECT idLivre, titre FROM Livre"
+    ordre = [('titre', 'titre', sens), ('idLivre', 'idLivre', sens)]
+    attendus = db.fetch_all(f"{select} WHERE auteur = %s ORDER BY titre {sens}, idLivre {sens}",
+                            (auteur,))
+
+    lus, after = [], None
+    while True:
+        page, after = keyset_page(select, ordre, params=(auteur,), where="auteur = %s",
+                                  limit=2, after=after)
+        assert len(page) <= 2
+        lus.extend(page)
+        if not after:
+            break
+    assert lus == attendus
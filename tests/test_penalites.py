@@ -0,0 +1,75 @@
+# tests/test_penalites.py
+"""
+Pénalités : paiement et compteur penalitesImpayees
+"""
+import threading
+import uuid
+
+from database import db
+from models import Adherent, Livre, Penalite, Referentiel, Statistiques
+from services.emprunt_service import EmpruntService
+
+
+def _penalite(idBibliothecaire, montant):
+    """Id d'une pénalité impayée sur un nouvel emprunt"""
+    s = uuid.uuid4().hex[:8]
+    adherent = Adherent(nom=f'Penalite{s}', prenom='Test', email=f'penalite-{s}@test.fr')
+    livre = Livre(isbn=f"P{s}", titre="Pénalité", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=1,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert adherent.save() and livre.save()
+    ok, message, idEmprunt = EmpruntService.emprunter_livre(
+        livre.idLivre, adherent.idAdherent, idBibliothecaire)
+    assert ok, message
+    assert Penalite.creer(idEmprunt, montant, "Retard")
+    return db.fetch_one("SELECT idPenalite FROM Penalite WHERE idEmprunt = %s",
+                        (idEmprunt,))['idPenalite']
+
+
+def _impayees():
+    Statistiques.invalider()
+    return Statistiques.get()['penalitesImpayees']
+
+
+def test_un_double_paiement_ne_decompte_le_montant_qu_une_fois(bibliothecaire):
+    idPenalite = _penalite(bibliothecaire, 4.5)
+    avant = _impayees()
+    assert Penalite.payer(idPenalite)
+    assert not Penalite.payer(idPenalite)  # déjà payée
+    assert _impayees() == avant - 4.5
+    statut = db.fetch_one("SELECT statut FROM Penalite WHERE idPenalite = %s", (idPenalite,))
+    assert statut['statut'] == 'PAYEE'
+
+
+def test_paiement_concurrent_lu_avant_le_premier_commit(bibliothecaire, monkeypatch):
+    idPenalite = _penalite(bibliothecaire, 3.0)
+    avant = _impayees()
+    assert Penalite.payer(idPenalite)
+    # Second guichet : a lu la pénalité encore impayée avant le premier COMMIT
+    fetch_one = db.fetch_one
+    monkeypatch.setattr(db, 'fetch_one', lambda query, *args, **kwargs: (
+        {'montant': 3.0} if query.lstrip().startswith("SELECT montant FROM Penalite")
+        else fetch_one(query, *args, **kwargs)))
+    assert not Penalite.payer(idPenalite)
+    monkeypatch.undo()
+    assert _impayees() == avant - 3.0
+
+
+def test_paiements_simultanes(bibliothecaire):
+    idPenalite = _penalite(bibliothecaire, 2.5)
+    avant = _impayees()
+    depart = threading.Barrier(3)
+
+    payees = []
+
+    def payer():
+        depart.wait()
+        payees.append(Penalite.payer(idPenalite))
+
+    threads = [threading.Thread(target=payer) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(payees) == [False, False, True]
+    assert _impayees() == avant - 2.5
@@ -0,0 +1,441 @@
+# tests/test_plans_requetes.py
+"""
+Non-régression des plans d'exécution
+Un scénario complet (routes de l'API, méthodes des modèles et des services)
+est joué sur la base de test ; chaque requête SQL exécutée est capturée avec
+ses paramètres, puis passée à EXPLAIN (db.explain). Le test échoue :
+- si une requête écrite dans models/, services/ ou api.py n'a pas été
+  exécutée par le scénario (à compléter pour toute nouvelle requête) ;
+- si une requête lit toute une table faute d'index, hors des parcours
+  complets voulus listés dans PARCOURS_ATTENDUS ;
+- si une requête clé n'utilise plus l'index créé pour elle (INDEX_ATTENDUS).
+La base est d'abord peuplée de quelques centaines de lignes par table, pour
+que MySQL choisisse ses index comme en production.
+"""
+import ast
+import glob
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import pytest
+
+from database import db
+from database.backends import backend
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FICHIERS_SQL = (sorted(glob.glob(os.path.join(RACINE, 'models', '*.py')))
+                + sorted(glob.glob(os.path.join(RACINE, 'services', '*.py')))
+                + [os.path.join(RACINE, 'api.py')])
+
+# Tables de référence de quelques lignes : les lire en entier est normal
+PETITES_TABLES = {'Categorie', 'Bibliothecaire', 'Statistique', 'SchemaMigration'}
+
+# Parcours complets voulus : fragment de la requête -> raison
+PARCOURS_ATTENDUS = {
+    "SELECT idAdherent, nom, prenom, email, telephone, typeAdherent, statut FROM Adherent":
+        "chargement complet de l'index de recherche et de la synchronisation",
+    "UPDATE Statistique SET valeur = (":
+        "recalcul complet des statistiques (horaire ou à la demande)",
+    "HAVING a.empruntsEnCours <> COUNT(e.idEmprunt)":
+        "recalcul des compteurs d'emprunts (maintenance)",
+}
+
+# Requêtes clés : fragment de la requête -> index qui doit apparaître dans le plan
+# (les emprunts en cours, `statut IN (...)`, sont servis aussi bien par tout
+# index commençant par statut : seul l'absence de parcours complet est vérifiée)
+INDEX_ATTENDUS = {
+    "WHERE e.statut = 'EN_COURS' AND e.dateRetourPrevue < NOW()": {'idx_emprunt_statut_retour'},
+    "WHERE e.idAdherent = %s": {'idx_emprunt_adherent_statut'},
+    "WHERE e.idLivre IN (SELECT idLivre FROM Livre WHERE isbn = %s) AND e.statut = 'EN_COURS'":
+        {'idx_livre_isbn', 'idx_emprunt_livre_statut'},
+    "WHERE p.statut = 'IMPAYEE' ORDER BY p.dateCreation DESC": {'idx_penalite_statut_date'},
+    "WHERE r.idLivre = %s AND r.statut IN ('DISPONIBLE', 'EN_ATTENTE')":
+        {'idx_reservation_livre_statut_position'},
+    "WHERE statut = 'DISPONIBLE' AND dateExpiration < NOW()": {'idx_reservation_statut_expiration'},
+    "FROM Livre l WHERE l.isbn = %s": {'idx_livre_isbn'},
+    "WHERE REPLACE(REPLACE(isbn, '-', ''), ' ', '') IN": {'idx_livre_isbn_chiffres'},
+    "WHERE e.statut = 'RETOURNE' AND e.dateRetourEffective < %s": {'idx_emprunt_statut_rendu'},
+    "FROM EmpruntArchive ea LEFT JOIN Livre l": {'idx_emprunt_archive_adherent'},
+}
+
+# Requêtes propres à un moteur : fragment -> le moteur les exécute-t-il ?
+REQUETES_CONDITIONNELLES = {
+    "AGAINST (%s IN BOOLEAN MODE)": backend.supports_fulltext,
+}
+
+_RE_SQL = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE)\s')
+_RE_GABARIT = re.compile(r'\{\w*\}')
+
+
+def _normaliser(texte):
+    return ' '.join(texte.split())
+
+
+# ------------------------------------------------------------
+# Requêtes écrites dans le code
+# ------------------------------------------------------------
+
+def _requetes_du_code():
+    """[(fichier:ligne, fragments)] : les morceaux constants de chaque requête SQL"""
+    requetes = []
+    for fichier in FICHIERS_SQL:
+        with open(fichier, encoding='utf-8') as f:
+            arbre = ast.parse(f.read(), fichier)
+        sous_chaines = {id(v) for n in ast.walk(arbre) if isinstance(n, ast.JoinedStr)
+                        for v in n.values}
+        for noeud in ast.walk(arbre):
+            if isinstance(noeud, ast.JoinedStr):
+                morceaux = [v.value for v in noeud.values
+                            if isinstance(v, ast.Constant) and isinstance(v.value, str)]
+            elif (isinstance(noeud, ast.Constant) and isinstance(noeud.value, str)
+                    and id(noeud) not in sous_chaines):
+                morceaux = _RE_GABARIT.split(noeud.value)  # gabarits str.format()
+            else:
+                continue
+            if not morceaux or not _RE_SQL.match(morceaux[0]):
+                continue
+            fragments = [_normaliser(m) for m in morceaux if _normaliser(m)]
+            if any(f in ' '.join(fragments) and not executee
+                   for f, executee in REQUETES_CONDITIONNELLES.items()):
+                continue
+            origine = f"{os.path.relpath(fichier, RACINE)}:{noeud.lineno}"
+            requetes.append((origine, fragments))
+    return requetes
+
+
+# ------------------------------------------------------------
+# Scénario
+# ------------------------------------------------------------
+
+def _pages(client, url):
+    """Première et deuxième page d'une liste paginée (condition de curseur comprise)"""
+    separateur = '&' if '?' in url else '?'
+    reponse = client.get(f"{url}{separateur}limit=1")
+    assert reponse.status_code == 200, url
+    suivant = reponse.get_json()['next']
+    if suivant:
+        assert client.get(f"{url}{separateur}limit=1&after={suivant}").status_code == 200, url
+
+
+def _lister(client, url):
+    reponse = client.get(url)
+    assert reponse.status_code == 200, url
+    reponse.get_data()  # consommer les réponses en flux
+    _pages(client, url)
+
+
+def _isbn13(prefixe12):
+    total = sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(prefixe12))
+    return prefixe12 + str((10 - total % 10) % 10)
+
+
+def _scenario():
+    import api
+    from models import Adherent, Emprunt, Livre, Penalite, Referentiel, Reservation, Statistiques
+    from services.archivage_service import ArchivageService
+    from services.catalogue_service import CatalogueService
+    from services.emprunt_service import EmpruntService
+    from services.reservation_service import ReservationService
+    from services.synchronisation_service import SynchronisationService
+
+    client = api.app.test_client()
+    s = uuid.uuid4().hex[:8]
+    chiffres = str(int(s, 16) % 10**8).zfill(8)
+
+    db.execute_query(
+        "INSERT INTO Bibliothecaire (nom, prenom, login, motDePasse) VALUES (%s, %s, %s, %s)",
+        ('Test', 'Plan', f'plan-{s}', 'secret')
+    )
+    idBibliothecaire = db.get_last_insert_id()
+    Referentiel.charger()
+    Adherent.charger_index()
+    Reservation.charger_index()
+    idCategorie = Referentiel.id_categorie(f"Tests {s}", creer=True)
+    assert client.post('/api/auth/login',
+                       json={'login': f'plan-{s}', 'motDePasse': 'secret'}).status_code == 200
+
+    # Adhérents
+    ids_adherents = []
+    for i, type_adherent in enumerate(('ETUDIANT', 'ENSEIGNANT', 'ETUDIANT')):
+        reponse = client.post('/api/adherents', json={
+            'nom': f'Plan{s}', 'prenom': f'P{i}', 'email': f'plan{i}-{s}@test.fr',
+            'telephone': '0100000000', 'typeAdherent': type_adherent
+        })
+        assert reponse.status_code == 201
+        ids_adherents.append(reponse.get_json()['id'])
+    _lister(client, '/api/adherents')
+    _lister(client, f'/api/adherents/search?q=Plan{s}')
+    assert client.get(f'/api/adherents/{ids_adherents[0]}').status_code == 200
+    assert client.put(f'/api/adherents/{ids_adherents[0]}',
+                      json={'telephone': '0200000000'}).status_code == 200
+
+    # Livres
+    isbns, ids_livres = [], []
+    for i in range(3):
+        isbn = _isbn13(f'979{chiffres}{i}')
+        reponse = client.post('/api/livres', json={
+            'isbn': isbn, 'titre': f'Plan {s} tome {i}', 'auteur': 'Auteur Plan',
+            'nombreExemplaires': 2, 'nombreDisponibles': 2, 'idCategorie': idCategorie
+        })
+        assert reponse.status_code == 201
+        isbns.append(isbn)
+        ids_livres.append(reponse.get_json()['id'])
+    _lister(client, '/api/livres')
+    _lister(client, '/api/livres/disponibles')
+    _lister(client, f'/api/livres/search?q={quote("Plan " + s)}')
+    assert client.get(f'/api/livres/search?q={isbns[0]}').status_code == 200
+    assert client.get(f'/api/livres/{ids_livres[0]}').status_code == 200
+    assert client.get(f'/api/livres/isbn/{isbns[1]}').status_code == 200  # hors cache
+    assert client.put(f'/api/livres/{ids_livres[0]}',
+                      json={'nombreExemplaires': 3, 'nombreDisponibles': 3}).status_code == 200
+    list(Livre.get_all(objets=True))
+
+    # Emprunts : un en cours, un en retard rendu avec pénalité
+    assert client.post('/api/emprunts', json={
+        'idLivre': ids_livres[0], 'idAdherent': ids_adherents[0],
+        'idBibliothecaire': idBibliothecaire
+    }).status_code == 201
+    ok, message, idEmprunt = EmpruntService.emprunter_livre(
+        ids_livres[1], ids_adherents[1], idBibliothecaire)
+    assert ok, message
+    assert EmpruntService.prolonger_emprunt(idEmprunt, -60)[0]
+    # Paniers : partiel (doublon et livre inconnu refusés), tout ou rien refusé
+    reponse = client.post('/api/emprunts/batch', json={
+        'idLivres': [ids_livres[0], ids_livres[0], 10**9], 'idAdherent': ids_adherents[1],
+        'idBibliothecaire': idBibliothecaire, 'partiel': True
+    })
+    assert reponse.status_code == 201 and reponse.get_json()['resultats'][0]['idEmprunt']
+    idEmpruntPanier = reponse.get_json()['resultats'][0]['idEmprunt']
+    assert client.post('/api/emprunts/batch', json={
+        'idLivres': [ids_livres[0], 10**9], 'idAdherent': ids_adherents[1],
+        'idBibliothecaire': idBibliothecaire
+    }).status_code == 400
+
+    _lister(client, '/api/emprunts')
+    _lister(client, '/api/emprunts/en-cours')
+    _lister(client, '/api/emprunts/retards')
+    _lister(client, f'/api/emprunts/adherent/{ids_adherents[0]}')
+    list(Emprunt.get_all(objets=True))
+    Emprunt.get_statistiques()
+
+    assert client.post('/api/emprunts/retour', json={'isbn': isbns[1]}).status_code == 200
+    _lister(client, '/api/penalites')
+    _lister(client, '/api/penalites/impayees')
+    penalite = Penalite.get_impayees()[0]
+    assert client.put(f"/api/penalites/{penalite['idPenalite']}/payer").status_code == 200
+    assert client.put(f"/api/penalites/{penalite['idPenalite']}/payer").status_code == 409
+
+    # Archivage de l'emprunt rendu (vieilli), historique avec archives
+    db.execute_query("UPDATE Emprunt SET dateRetourEffective = %s WHERE idEmprunt = %s",
+                     (datetime.now() - timedelta(days=400), idEmprunt))
+    assert ArchivageService.compter(365)['emprunts'] >= 1
+    rapport = ArchivageService.archiver(365, pause=0)
+    assert rapport['emprunts'] >= 1 and not rapport['erreur']
+    _lister(client, f'/api/emprunts/adherent/{ids_adherents[1]}?archives=1')
+
+    # Retours en lot : deux exemplaires du même livre (dont un en retard), un inconnu
+    assert EmpruntService.prolonger_emprunt(idEmpruntPanier, -60)[0]
+    reponse = client.post('/api/emprunts/retour/batch', json={'isbns': [isbns[0], isbns[0], 'inconnu']})
+    assert reponse.status_code == 200 and reponse.get_json()['retournes'] == 2
+
+    # Réservations : livre sans exemplaire disponible, doublon, annulation,
+    # mises de côté au retour (unitaire et en lot), emprunt, expiration
+    for idAdherent in ids_adherents[:2]:
+        assert EmpruntService.emprunter_livre(ids_livres[1], idAdherent, idBibliothecaire)[0]
+    reservations = []
+    for idAdherent in (ids_adherents[0], ids_adherents[2], ids_adherents[2]):
+        reponse = client.post('/api/reservations',
+                              json={'idLivre': ids_livres[1], 'idAdherent': idAdherent})
+        if reponse.status_code == 201:
+            reservations.append(reponse.get_json()['id'])
+        else:  # déjà réservé : annuler puis réserver de nouveau
+            assert client.put(f'/api/reservations/{reservations[-1]}/annuler').status_code == 200
+            reponse = client.post('/api/reservations',
+                                  json={'idLivre': ids_livres[1], 'idAdherent': idAdherent})
+            assert reponse.status_code == 201
+            reservations.append(reponse.get_json()['id'])
+    assert client.post('/api/reservations', json={
+        'idLivre': ids_livres[0], 'idAdherent': ids_adherents[2]}).status_code == 400
+    assert client.get(f'/api/reservations/livre/{ids_livres[1]}').status_code == 200
+    assert client.get(f'/api/reservations/adherent/{ids_adherents[2]}').status_code == 200
+    assert EmpruntService.retourner_livre(isbns[1])[0]
+    reponse = client.post('/api/emprunts/retour/batch', json={'isbns': [isbns[1]]})
+    assert reponse.status_code == 200 and reponse.get_json()['retournes'] == 1
+    assert client.get('/api/reservations/disponibles').status_code == 200
+    assert client.post(f'/api/reservations/{reservations[0]}/honorer',
+                       json={'idBibliothecaire': idBibliothecaire}).status_code == 201
+    db.execute_query("UPDATE Reservation SET dateExpiration = %s WHERE idReservation = %s",
+                     (datetime.now() - timedelta(days=1), reservations[-1]))
+    assert ReservationService.expirer() == 1
+    assert Reservation.get_by_id(reservations[-1])['statut'] == 'EXPIREE'
+
+    # Tableau de bord, maintenance
+    for url in ('/api/stats', '/api/categories', '/api/metrics/queries', '/api/health', '/'):
+        assert client.get(url).status_code == 200, url
+    Statistiques.recalculer()
+    db.execute_query("UPDATE Adherent SET empruntsEnCours = 2 WHERE idAdherent = %s",
+                     (ids_adherents[2],))
+    assert Adherent.recalculer_emprunts_en_cours()
+    list(Adherent.get_all(objets=True))
+    Adherent(**Adherent.get_by_id(ids_adherents[0])).peut_emprunter()
+
+    # Imports en masse : une notice nouvelle, une déjà connue
+    CatalogueService.importer([
+        (1, {'isbn': _isbn13(f'979{chiffres}8'), 'titre': 'Import', 'auteur': 'Plan',
+             'categorie': f"Tests {s}"}),
+        (2, {'isbn': isbns[2], 'titre': f'Plan {s} tome 2', 'auteur': 'Auteur Plan',
+             'categorie': f"Tests {s}", 'exemplaires': '3'}),
+    ])
+    SynchronisationService.synchroniser([
+        (2, {'nom': f'Plan{s}', 'prenom': 'P0 modifié', 'email': f'plan0-{s}@test.fr'}),
+        (3, {'nom': f'Plan{s}', 'prenom': 'Nouveau', 'email': f'plan9-{s}@test.fr'}),
+    ])
+
+    # Suppressions
+    assert client.delete(f'/api/livres/{ids_livres[2]}').status_code == 200
+    assert client.delete(f'/api/adherents/{ids_adherents[2]}').status_code in (200, 400)
+
+
+# Lignes de remplissage par table : sur quelques lignes, MySQL lit toute la
+# table plutôt que l'index ; le plan doit être celui d'une vraie bibliothèque
+LIGNES_REMPLISSAGE = 500
+
+
+def _peupler(n=LIGNES_REMPLISSAGE):
+    """Livres, adhérents, emprunts rendus, pénalités payées, réservations annulées et archives"""
+    from models import Referentiel, Statistiques
+    s = uuid.uuid4().hex[:8]
+    db.execute_query(
+        "INSERT INTO Bibliothecaire (nom, prenom, login, motDePasse) VALUES (%s, %s, %s, %s)",
+        ('Remplissage', 'Plan', f'remplissage-{s}', 'secret')
+    )
+    idBibliothecaire = db.get_last_insert_id()
+    idCategorie = Referentiel.id_categorie("Remplissage", creer=True)
+    db.execute_many("""
+        INSERT INTO Livre (isbn, titre, auteur, nombreExemplaires, nombreDisponibles, idCategorie)
+        VALUES (%s, %s, %s, 1, 1, %s)
+    """, [(f'F{s}{i:05d}', f'Remplissage {s} {i:05d}', 'Remplissage', idCategorie)
+          for i in range(n)])
+    db.execute_many("""
+        INSERT INTO Adherent (nom, prenom, email, telephone, typeAdherent, statut)
+        VALUES (%s, %s, %s, '', 'ETUDIANT', 'ACTIF')
+    """, [(f'Remplissage{s}', f'P{i:05d}', f'remplissage{i}-{s}@test.fr') for i in range(n)])
+    livres = [r['idLivre'] for r in db.fetch_all(
+        "SELECT idLivre FROM Livre WHERE titre LIKE %s ORDER BY idLivre", (f'Remplissage {s} %',))]
+    adherents = [r['idAdherent'] for r in db.fetch_all(
+        "SELECT idAdherent FROM Adherent WHERE nom = %s ORDER BY idAdherent", (f'Remplissage{s}',))]
+    rendu = datetime.now() - timedelta(days=10)
+    lignes = [(rendu - timedelta(days=14), rendu - timedelta(days=1), rendu, livre, adherent,
+               idBibliothecaire) for livre, adherent in zip(livres, adherents)]
+    db.execute_many("""
+        INSERT INTO Emprunt (dateEmprunt, dateRetourPrevue, dateRetourEffective, statut,
+                             idLivre, idAdherent, idBibliothecaire)
+        VALUES (%s, %s, %s, 'RETOURNE', %s, %s, %s)
+    """, lignes)
+    emprunts = [r['idEmprunt'] for r in db.fetch_all(
+        "SELECT idEmprunt FROM Emprunt WHERE idBibliothecaire = %s", (idBibliothecaire,))]
+    db.execute_many("""
+        INSERT INTO Penalite (montant, motif, statut, idEmprunt)
+        VALUES (1, 'Remplissage', 'PAYEE', %s)
+    """, [(e,) for e in emprunts])
+    db.execute_many("""
+        INSERT INTO Reservation (statut, position, idLivre, idAdherent)
+        VALUES ('ANNULEE', 1, %s, %s)
+    """, list(zip(livres, adherents)))
+    base_archive = 10**9 + int(s[:4], 16) * n  # hors des identifiants d'Emprunt
+    db.execute_many("""
+        INSERT INTO EmpruntArchive (idEmprunt, dateEmprunt, dateRetourPrevue, dateRetourEffective,
+                                    statut, idLivre, idAdherent, idBibliothecaire, dateArchivage)
+        VALUES (%s, %s, %s, %s, 'RETOURNE', %s, %s, %s, NOW())
+    """, [(base_archive + i,) + ligne for i, ligne in enumerate(lignes)])
+    if backend.name == 'mysql':
+        db.fetch_all("ANALYZE TABLE Livre, Adherent, Emprunt, Penalite, Reservation, EmpruntArchive")
+    Statistiques.recalculer()
+
+
+@pytest.fixture(scope='module')
+def requetes(base):
+    """{requête normalisée: (requête, paramètres)} de toutes les requêtes du scénario"""
+    _peupler()
+    capturees = {}
+    enregistrer = db.metrics.record
+    execute_many = db.execute_many
+
+    def capturer(query, params, *args):
+        capturees.setdefault(_normaliser(query), (query, params))
+        return enregistrer(query, params, *args)
+
+    def capturer_lot(query, params_list):
+        params_list = list(params_list)
+        if params_list:
+            capturees[_normaliser(query)] = (query, params_list[0])
+        return execute_many(query, params_list)
+
+    db.metrics.record = capturer
+    db.execute_many = capturer_lot
+    try:
+        _scenario()
+    finally:
+        db.metrics.record = enregistrer
+        db.execute_many = execute_many
+    return capturees
+
+
+def _plans(requetes):
+    """{requête normalisée: plan} des requêtes qui lisent des tables"""
+    plans = {}
+    for normalisee, (query, params) in requetes.items():
+        if not _RE_SQL.match(normalisee) or re.match(r'INSERT .* VALUES', normalisee):
+            continue
+        plans[normalisee] = db.explain(query, params)
+    return plans
+
+
+# ------------------------------------------------------------
+# Tests
+# ------------------------------------------------------------
+
+def test_chaque_requete_du_code_est_executee(requetes):
+    executees = list(requetes)
+    manquantes = [
+        origine for origine, fragments in _requetes_du_code()
+        if not any(all(f in q for f in fragments) for q in executees)
+    ]
+    assert not manquantes, (
+        "Requêtes jamais exécutées par le scénario (compléter _scenario()) : "
+        + ', '.join(manquantes)
+    )
+
+
+def test_aucun_parcours_complet(requetes):
+    regressions = []
+    for normalisee, plan in _plans(requetes).items():
+        if any(fragment in normalisee for fragment in PARCOURS_ATTENDUS):
+            continue
+        for entree in plan:
+            if entree['parcoursComplet'] and entree['table'] not in PETITES_TABLES:
+                regressions.append(f"{entree['table']} ({entree['detail']}) : {normalisee}")
+    assert not regressions, "Parcours complets :\n" + '\n'.join(regressions)
+
+
+def test_parcours_attendus_toujours_presents(requetes):
+    """Une entrée de PARCOURS_ATTENDUS qui ne correspond plus à rien est à retirer"""
+    inutiles = [f for f in PARCOURS_ATTENDUS if not any(f in q for q in requetes)]
+    assert not inutiles, f"Entrées de PARCOURS_ATTENDUS sans requête : {inutiles}"
+
+
+def test_index_attendus(requetes):
+    plans = _plans(requetes)
+    erreurs = []
+    for fragment, index in INDEX_ATTENDUS.items():
+        trouvees = [q for q in plans if fragment in q]
+        if not trouvees:
+            erreurs.append(f"aucune requête ne contient « {fragment} »")
+        for q in trouvees:
+            utilises = {entree['index'] for entree in plans[q]}
+            if not index <= utilises:
+                erreurs.append(f"{sorted(index - utilises)} absent(s) du plan {plans[q]} : {q}")
+    assert not erreurs, '\n'.join(erreurs)
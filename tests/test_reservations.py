@@ -0,0 +1,57 @@
+# tests/test_reservations.py
+"""
+Réservations : mise de côté d'un exemplaire rendu et notification
+"""
+import uuid
+
+import api
+from database import db
+from models import Adherent, Livre, Referentiel
+from services.emprunt_service import EmpruntService
+from services.reservation_service import ReservationService
+
+
+def test_le_reservataire_est_prevenu_apres_le_commit(bibliothecaire, monkeypatch):
+    s = uuid.uuid4().hex[:8]
+    emprunteur = Adherent(nom=f'Resa{s}', prenom='A', email=f'resa-a-{s}@test.fr')
+    reservataire = Adherent(nom=f'Resa{s}', prenom='B', email=f'resa-b-{s}@test.fr')
+    livre = Livre(isbn=f"R{s}", titre="Réservé", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=1,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert emprunteur.save() and reservataire.save() and livre.save()
+    ok, message, _ = EmpruntService.emprunter_livre(
+        livre.idLivre, emprunteur.idAdherent, bibliothecaire)
+    assert ok, message
+    ok, message, _ = ReservationService.reserver(livre.idLivre, reservataire.idAdherent)
+    assert ok, message
+
+    notifications = []
+
+    def notifier(idLivre, idAdherent, expiration):
+        assert not db.in_transaction()
+        notifications.append((idLivre, idAdherent))
+    monkeypatch.setattr(ReservationService, 'notifier_mise_de_cote', notifier)
+
+    ok, message, _ = EmpruntService.retourner_livre(livre.isbn)
+    assert ok, message
+    assert notifications == [(livre.idLivre, reservataire.idAdherent)]
+
+
+def test_reservation_avec_identifiants_en_chaine(bibliothecaire):
+    s = uuid.uuid4().hex[:8]
+    emprunteur = Adherent(nom=f'Resa{s}', prenom='A', email=f'resa-a-{s}@test.fr')
+    reservataire = Adherent(nom=f'Resa{s}', prenom='B', email=f'resa-b-{s}@test.fr')
+    livre = Livre(isbn=f"R{s}", titre="Réservé", auteur="Test",
+                  nombreExemplaires=1, nombreDisponibles=0,
+                  idCategorie=Referentiel.id_categorie("Tests", creer=True))
+    assert emprunteur.save() and reservataire.save() and livre.save()
+    client = api.app.test_client()
+
+    reponse = client.post('/api/reservations', json={
+        'idLivre': 'douze', 'idAdherent': str(reservataire.idAdherent)})
+    assert reponse.status_code == 400
+    reponse = client.post('/api/reservations', json={
+        'idLivre': str(livre.idLivre), 'idAdherent': str(reservataire.idAdherent)})
+    assert reponse.status_code == 201, reponse.get_json()
+    ok, message, _ = ReservationService.reserver(str(livre.idLivre), str(emprunteur.idAdherent))
+    assert ok, message
@@ -0,0 +1,58 @@
+# tests/test_statistiques.py
+"""
+Compteurs du tableau de bord (table Statistique)
+"""
+import threading
+import uuid
+
+import pytest
+
+from database import db
+from models import Adherent, Statistiques
+
+
+def test_get_ne_fait_que_lire(base, monkeypatch):
+    db.execute_query("UPDATE Statistique SET dateMaj = NULL")
+    Statistiques.invalider()
+
+    def recalcul(*args):
+        pytest.fail("recalcul lancé par une lecture du tableau de bord")
+    monkeypatch.setattr(Statistiques, 'recalculer', recalcul)
+    assert set(Statistiques.get()) == set(Statistiques._CALCULS)
+
+
+def test_recalcul_depuis_les_tables(base):
+    db.execute_query("UPDATE Statistique SET valeur = -1, dateMaj = NULL")
+    assert set(Statistiques.recalculer_si_du()) == set(Statistiques._CALCULS)
+    adherents = db.fetch_one("SELECT COUNT(*) AS n FROM Adherent WHERE statut = 'ACTIF'")['n']
+    assert Statistiques.get()['adherentsActifs'] == adherents
+    assert all(valeur >= 0 for valeur in Statistiques.get().values())
+    # dateMaj vient d'être écrite : rien n'est dû
+    assert Statistiques.recalculer_si_du() == []
+
+
+def test_recalcul_n_ecrase_pas_un_ajustement_concurrent(base, monkeypatch):
+    def nouvel_adherent():
+        s = uuid.uuid4().hex[:8]
+        assert Adherent(nom=f'Stats{s}', prenom='Test', email=f'stats-{s}@test.fr').save()
+
+    # Un guichet valide une inscription (et son ajuster) pendant le recalcul,
+    # juste avant l'écriture du compteur
+    execute_query = db.execute_query
+    deja = []
+
+    def execute_pendant_le_recalcul(query, params=None, *args, **kwargs):
+        if 'UPDATE Statistique SET valeur' in query and params == ('adherentsActifs',) and not deja:
+            deja.append(True)
+            guichet = threading.Thread(target=nouvel_adherent)
+            guichet.start()
+            guichet.join()
+        return execute_query(query, params, *args, **kwargs)
+    monkeypatch.setattr(db, 'execute_query', execute_pendant_le_recalcul)
+
+    Statistiques.recalculer(['adherentsActifs'])
+    monkeypatch.undo()
+    assert deja
+    Statistiques.invalider()
+    actifs = db.fetch_one("SELECT COUNT(*) AS n FROM Adherent WHERE statut = 'ACTIF'")['n']
+    assert Statistiques.get()['adherentsActifs'] == actifs
@@ -0,0 +1,85 @@
+# tests/test_synchronisation.py
+"""
+Synchronisation des adhérents avec l'export de la scolarité
+"""
+import uuid
+
+from database import db
+from models import Adherent
+from services.synchronisation_service import SynchronisationService
+
+
+def _adherents(s, n):
+    for i in range(n):
+        assert Adherent(nom=f'Synchro{s}', prenom=f'P{i}', email=f'synchro{i}-{s}@test.fr',
+                        telephone='0100000000').save()
+    return db.fetch_all("SELECT * FROM Adherent WHERE nom = %s ORDER BY idAdherent",
+                        (f'Synchro{s}',))
+
+
+def test_mises_a_jour_groupees_adherent_par_adherent(base):
+    s = uuid.uuid4().hex[:8]
+    avant = _adherents(s, 3)
+    db.execute_query("UPDATE Adherent SET statut = 'INACTIF' WHERE idAdherent = %s",
+                     (avant[2]['idAdherent'],))
+    rapport = SynchronisationService.synchroniser([
+        (2, {'nom': f'Synchro{s}', 'prenom': 'Anne', 'email': f'synchro0-{s}@test.fr',
+             'telephone': '0600000000'}),
+        (3, {'nom': f'Synchro{s}', 'prenom': 'Paul', 'email': f'synchro1-{s}@test.fr',
+             'typeAdherent': 'enseignant'}),
+        (4, {'nom': f'Synchro{s}', 'prenom': 'P2', 'email': f'synchro2-{s}@test.fr'}),
+    ], desactiver=False, taille_lot=2)
+    assert rapport.nb_modifies == 3 and not rapport.rejetes
+
+    apres = {a['idAdherent']: a for a in db.fetch_all(
+        "SELECT * FROM Adherent WHERE nom = %s", (f'Synchro{s}',))}
+    a0, a1, a2 = (apres[a['idAdherent']] for a in avant)
+    assert (a0['prenom'], a0['telephone'], a0['typeAdherent']) == ('Anne', '0600000000', 'ETUDIANT')
+    assert (a1['prenom'], a1['telephone'], a1['typeAdherent']) == ('Paul', '0100000000', 'ENSEIGNANT')
+    assert (a2['prenom'], a2['statut']) == ('P2', 'ACTIF')
+
+
+def test_simulation_n_ecrit_rien(base):
+    s = uuid.uuid4().hex[:8]
+    _adherents(s, 2)
+    avant = db.fetch_all("SELECT * FROM Adherent ORDER BY idAdherent")
+    rapport = SynchronisationService.synchroniser([
+        (2, {'nom': f'Synchro{s}', 'prenom': 'Modifié', 'email': f'synchro0-{s}@test.fr'}),
+        (3, {'nom': f'Synchro{s}', 'prenom': 'Nouveau', 'email': f'synchro9-{s}@test.fr'}),
+        (4, {'nom': f'Synchro{s}', 'prenom': 'Sans email'}),
+    ], simulation=True)
+    assert (rapport.nb_crees, rapport.nb_modifies, rapport.rejetes) == (1, 1, 1)
+    # export complet simulé : tous les autres adhérents actifs seraient désactivés
+    assert rapport.nb_desactives >= 1
+    assert db.fetch_all("SELECT * FROM Adherent ORDER BY idAdherent") == avant
+
+
+def test_un_adherent_suspendu_pendant_la_synchronisation_le_reste(base, monkeypatch):
+    s = uuid.uuid4().hex[:8]
+    adherents = _adherents(s, 2)
+    suspendu, modifie = (a['idAdherent'] for a in adherents)
+    db.execute_query("UPDATE Adherent SET statut = 'INACTIF' WHERE idAdherent = %s", (suspendu,))
+
+    # Au guichet, après la lecture des adhérents : une suspension et un
+    # téléphone corrigé
+    charger = SynchronisationService._charger_existants
+
+    def charger_puis_guichet():
+        existants = charger()
+        db.execute_query("UPDATE Adherent SET statut = 'SUSPENDU' WHERE idAdherent = %s",
+                         (suspendu,))
+        db.execute_query("UPDATE Adherent SET telephone = '0700000000' WHERE idAdherent = %s",
+                         (modifie,))
+        return existants
+    monkeypatch.setattr(SynchronisationService, '_charger_existants', charger_puis_guichet)
+
+    rapport = SynchronisationService.synchroniser([
+        (2, {'nom': f'Synchro{s}', 'prenom': 'Réinscrit', 'email': f'synchro0-{s}@test.fr'}),
+        (3, {'nom': f'Synchro{s}', 'prenom': 'Renommé', 'email': f'synchro1-{s}@test.fr'}),
+    ], desactiver=False)
+    assert rapport.nb_modifies == 2
+
+    a0 = db.fetch_one("SELECT * FROM Adherent WHERE idAdherent = %s", (suspendu,))
+    a1 = db.fetch_one("SELECT * FROM Adherent WHERE idAdherent = %s", (modifie,))
+    assert (a0['prenom'], a0['statut']) == ('Réinscrit', 'SUSPENDU')
+    assert (a1['prenom'], a1['telephone'], a1['statut']) == ('Renommé', '0700000000', 'ACTIF')
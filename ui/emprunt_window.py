@@ -144,8 +144,8 @@ class EmpruntWindow:
         for widget in self.adherent_result_frame.winfo_children():
             widget.destroy()
         
-        # Rechercher
-        resultats = Adherent.search(keyword)
+        # Rechercher (index en mémoire, quotas en une requête)
+        resultats = Adherent.search_with_quota(keyword, limit=5)
         
         if not resultats:
             tk.Label(
@@ -158,15 +158,14 @@ class EmpruntWindow:
             return
         
         # Afficher les résultats
-        for adh in resultats[:5]:  # Max 5 résultats
+        for adh in resultats:  # Max 5 résultats, les plus proches
             self.create_adherent_card(adh)
     
     def create_adherent_card(self, adherent):
         """Créer une carte adhérent cliquable"""
         # Vérifier si peut emprunter
-        emprunts_en_cours = Adherent.get_emprunts_en_cours(adherent['idAdherent'])
-        quota_max = 5 if adherent['typeAdherent'] == 'ENSEIGNANT' else 3
-        quota_dispo = quota_max - emprunts_en_cours
+        quota_max = adherent['quotaMax']
+        quota_dispo = adherent['quotaDisponible']
         peut_emprunter = adherent['statut'] == 'ACTIF' and quota_dispo > 0
         
         # Couleur selon statut
@@ -243,7 +242,7 @@ class EmpruntWindow:
             widget.destroy()
         
         # Rechercher
-        resultats = Livre.search(keyword)
+        resultats = Livre.search(keyword, limit=5)
         
         if not resultats:
             tk.Label(
@@ -256,7 +255,7 @@ class EmpruntWindow:
             return
         
         # Afficher les résultats
-        for livre in resultats[:5]:  # Max 5 résultats
+        for livre in resultats:  # Max 5 résultats, les plus pertinents
             self.create_livre_card(livre)
     
     def create_livre_card(self, livre):
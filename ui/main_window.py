@@ -2,7 +2,7 @@
 import tkinter as tk
 from tkinter import messagebox
 from database import db
-from models import Emprunt
+from models import Adherent, Referentiel, Statistiques
 
 class MainWindow:
     """Fenêtre principale de l'application"""
@@ -14,9 +14,15 @@ class MainWindow:
         
         self.bibliothecaire_id = bibliothecaire_id
         
-        # Récupérer les infos du bibliothécaire
-        query = "SELECT * FROM Bibliothecaire WHERE idBibliothecaire = %s"
-        self.bibliothecaire = db.fetch_one(query, (bibliothecaire_id,))
+        # Infos du bibliothécaire (référentiel chargé en mémoire)
+        Referentiel.charger()
+        self.bibliothecaire = Referentiel.get_bibliothecaire(bibliothecaire_id)
+        
+        # Index de recherche des adhérents (recherche au guichet sans requête SQL)
+        Adherent.charger_index()
+        
+        # Recalcul des statistiques en fond (retards, dérive des compteurs)
+        Statistiques.demarrer_recalcul()
         
         # Centrer la fenêtre
         self.center_window()
@@ -131,17 +137,14 @@ class MainWindow:
         for widget in self.stats_frame.winfo_children():
             widget.destroy()
         
-        # Récupérer les stats
-        stats = Emprunt.get_statistiques()
-        retards = db.fetch_one("SELECT COUNT(*) as count FROM Emprunt WHERE statut = 'EN_COURS' AND dateRetourPrevue < NOW()")
-        livres_dispo = db.fetch_one("SELECT SUM(nombreDisponibles) as count FROM Livre")
-        adherents_actifs = db.fetch_one("SELECT COUNT(*) as count FROM Adherent WHERE statut = 'ACTIF'")
+        # Récupérer les stats (compteurs de la table Statistique)
+        stats = Statistiques.get()
         
         stats_data = [
-            ("Emprunts en cours", stats['en_cours'], "#3498db"),
-            ("Livres en retard", retards['count'], "#e74c3c"),
-            ("Livres disponibles", livres_dispo['count'], "#27ae60"),
-            ("Adhérents actifs", adherents_actifs['count'], "#9b59b6"),
+            ("Emprunts en cours", stats['empruntsEnCours'], "#3498db"),
+            ("Livres en retard", stats['empruntsEnRetard'], "#e74c3c"),
+            ("Livres disponibles", stats['livresDisponibles'], "#27ae60"),
+            ("Adhérents actifs", stats['adherentsActifs'], "#9b59b6"),
         ]
         
         for label, value, color in stats_data:
@@ -190,6 +193,7 @@ class MainWindow:
     def logout(self):
         """Déconnexion"""
         if messagebox.askyesno("Confirmation", "Voulez-vous vraiment vous déconnecter ?"):
+            Statistiques.arreter_recalcul()
             db.disconnect()
             self.root.destroy()
     